@@ -0,0 +1,56 @@
+"""
+measure how fast block sized load requests are written to a file.
+a seek and a write per request is how FileLoader wrote before positioned writes, it is kept here to compare against.
+the memory mapped backend is measured with the same writes.
+
+run from the repository root:
+    python -m benchmarks.bench_file_writes
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.download.file_loading.mmap_os_wrapper import MmapOsWrapper
+from torrent_client.download.file_loading.os_file import AbstractOsFile, OsFile
+
+FILE_SIZE = 256 * 2 ** 20
+# how many requests wait in the queue when the loader takes them
+PENDING_REQUESTS = [1, 16, 64]
+
+
+async def seek_and_write(path: str, data: bytes) -> float:
+    start = time.perf_counter()
+    async with OsFile(path) as file:
+        for offset in range(0, FILE_SIZE, len(data)):
+            await file.seek(offset)
+            await file.write(data)
+    return time.perf_counter() - start
+
+
+async def write_at(file: AbstractOsFile, data: bytes, pending: int) -> float:
+    start = time.perf_counter()
+    async with file:
+        for offset in range(0, FILE_SIZE, len(data) * pending):
+            await file.write_at(offset, [data] * pending)
+    return time.perf_counter() - start
+
+
+def main():
+    data = os.urandom(BLOCK_SIZE)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "file")
+        with open(path, "wb") as file:
+            file.truncate(FILE_SIZE)
+        mib = FILE_SIZE / 2 ** 20
+        print(f"seek and write: {mib / asyncio.run(seek_and_write(path, data)):8.0f} MiB/s")
+        for pending in PENDING_REQUESTS:
+            threads = asyncio.run(write_at(OsFile(path), data, pending))
+            mapped = asyncio.run(write_at(MmapOsWrapper().make_file(path, FILE_SIZE), data, pending))
+            print(f"write_at, {pending:>3} pending requests: "
+                  f"threads {mib / threads:8.0f} MiB/s, mmap {mib / mapped:8.0f} MiB/s")
+
+
+if __name__ == "__main__":
+    main()
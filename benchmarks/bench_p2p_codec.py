@@ -0,0 +1,45 @@
+"""
+measure how many messages per second P2PCodec encodes and decodes on one core.
+
+run from the repository root:
+    python -m benchmarks.bench_p2p_codec
+"""
+import time
+from typing import Any, Callable
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.p2p_messages_handling.message_id import MessageID
+from torrent_client.peer.p2p_messages_handling.p2p_codec import P2PCodec
+from torrent_client.peer.p2p_messages_handling.p2p_messages import RequestMessage, HaveMessage, CancelMessage, \
+    PieceMessage
+
+ITERATIONS = 200_000
+
+MESSAGES = [
+    ("request", RequestMessage(1, BLOCK_SIZE, BLOCK_SIZE), MessageID.Request),
+    ("have", HaveMessage(7), MessageID.Have),
+    ("cancel", CancelMessage(1, BLOCK_SIZE, BLOCK_SIZE), MessageID.Cancel),
+    ("piece", PieceMessage(1, BLOCK_SIZE, bytes(BLOCK_SIZE)), MessageID.Piece),
+]
+
+
+def messages_per_second(action: Callable[[], Any]) -> float:
+    start = time.process_time()
+    for _ in range(ITERATIONS):
+        action()
+    return ITERATIONS / (time.process_time() - start)
+
+
+def main():
+    codec = P2PCodec(0)
+    for name, message, message_id in MESSAGES:
+        encoded = codec.encode(message, message_id)
+        # the socket decodes views of its receive buffer
+        view = memoryview(bytearray(encoded))
+        encode_rate = messages_per_second(lambda: codec.encode(message, message_id))
+        decode_rate = messages_per_second(lambda: codec.decode_response_not_handshake(view))
+        print(f"{name:>8}: encode {encode_rate / 1000:8.0f}k msg/s, decode {decode_rate / 1000:8.0f}k msg/s per core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+measure how many MB/s of piece messages P2PSocket parses on one core,
+and how long every small message costs when it is read alone and when it is read in a batch.
+the bytes buffer is the receive path before the ring buffer, it is kept here to compare against.
+
+run from the repository root:
+    python -m benchmarks.bench_p2p_socket
+"""
+import asyncio
+import time
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.p2p_messages_handling.message_id import MessageID
+from torrent_client.peer.p2p_messages_handling.p2p_codec import P2PCodec
+from torrent_client.peer.p2p_messages_handling.p2p_messages import PieceMessage, HaveMessage
+from torrent_client.peer.p2p_net.p2p_socket import P2PSocket
+from torrent_client.peer.p2p_net.receive_buffer import ReceiveBuffer
+from torrent_client.peer.p2p_net.tcp_client import AbstractTcpClient
+
+MESSAGES = 4000
+SMALL_MESSAGES = 200_000
+SEGMENT_SIZE = 64 * 1024
+
+
+class BytesBuffer(ReceiveBuffer):
+    def __init__(self):
+        super().__init__(0)
+        self._data = b""
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def write(self, data: bytes) -> None:
+        self._data += data
+
+    def peek(self, size: int) -> bytes:
+        return self._data[:size]
+
+    def consume(self, size: int) -> None:
+        self._data = self._data[size:]
+
+
+class StreamClient(AbstractTcpClient):
+    def __init__(self, stream: bytes, segment_size: int):
+        self._stream = memoryview(stream)
+        self._position = 0
+        self._segment_size = segment_size
+
+    async def init(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def recv(self, size: int) -> bytes:
+        # the stream reader hands out new bytes objects, never more than the segment it received
+        end = self._position + min(size, self._segment_size)
+        packet = bytes(self._stream[self._position:end])
+        self._position = end
+        return packet
+
+    async def send(self, payload: bytes) -> None:
+        pass
+
+
+def create_stream() -> bytes:
+    codec = P2PCodec(0)
+    block = bytes(BLOCK_SIZE)
+    return b"".join(
+        codec.encode(PieceMessage(index, 0, block), MessageID.Piece) for index in range(MESSAGES)
+    )
+
+
+async def parse_stream(stream: bytes, receive_buffer: ReceiveBuffer) -> float:
+    client = StreamClient(stream, SEGMENT_SIZE)
+    socket = P2PSocket(None, None, 0, client=client, receive_buffer=receive_buffer)
+    start = time.process_time()
+    for _ in range(MESSAGES):
+        await socket.read()
+    return time.process_time() - start
+
+
+def create_small_messages_stream() -> bytes:
+    codec = P2PCodec(0)
+    return b"".join(codec.encode(HaveMessage(index), MessageID.Have) for index in range(SMALL_MESSAGES))
+
+
+async def parse_small_messages(stream: bytes, batch: bool) -> float:
+    client = StreamClient(stream, SEGMENT_SIZE)
+    socket = P2PSocket(None, None, 0, client=client)
+    parsed = 0
+    start = time.process_time()
+    while parsed < SMALL_MESSAGES:
+        parsed += len(await socket.read_batch()) if batch else len([await socket.read()])
+    return time.process_time() - start
+
+
+def run_small_messages(name: str, batch: bool) -> None:
+    cpu_time = asyncio.run(parse_small_messages(create_small_messages_stream(), batch))
+    print(f"{name:>16}: {cpu_time / SMALL_MESSAGES * 10 ** 6:10.2f} us per have message")
+
+
+def run(name: str, receive_buffer: ReceiveBuffer) -> None:
+    stream = create_stream()
+    cpu_time = asyncio.run(parse_stream(stream, receive_buffer))
+    print(f"{name:>16}: {len(stream) / cpu_time / 2 ** 20:10.1f} MB/s per core")
+
+
+def main():
+    run("bytes buffer", BytesBuffer())
+    run("receive buffer", ReceiveBuffer())
+    run_small_messages("read", False)
+    run_small_messages("read batch", True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+measure how long hashing a piece blocks the event loop.
+the whole piece hash in one call is how pieces were checked before the incremental hash, it is kept here to compare against.
+
+run from the repository root:
+    python -m benchmarks.bench_piece_hash
+"""
+import asyncio
+import time
+from hashlib import sha1
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.downloading.buffer_pool import BufferPool
+from torrent_client.peer.downloading.piece_progress import PieceProgress
+
+PIECE_LENGTHS = [2 ** 20, 4 * 2 ** 20, 16 * 2 ** 20]
+PIECES = 10
+
+
+def whole_piece_hash(piece: bytes) -> float:
+    progress = PieceProgress(len(piece), BufferPool())
+    for begin in range(0, len(piece), BLOCK_SIZE):
+        progress.add_block(begin, piece[begin:begin + BLOCK_SIZE])
+    start = time.perf_counter()
+    sha1(progress.buffer).digest()
+    return time.perf_counter() - start
+
+
+async def incremental_hash(piece: bytes, in_order: bool) -> float:
+    """:return the longest time the event loop was blocked by one call"""
+    progress = PieceProgress(len(piece), BufferPool())
+    offsets = list(range(0, len(piece), BLOCK_SIZE))
+    if not in_order:
+        # the first block arrives last, so nothing can be hashed before the piece is complete
+        offsets = offsets[1:] + offsets[:1]
+    longest = 0
+    for begin in offsets:
+        start = time.perf_counter()
+        progress.add_block(begin, piece[begin:begin + BLOCK_SIZE])
+        longest = max(longest, time.perf_counter() - start)
+    start = time.perf_counter()
+    digest = asyncio.ensure_future(progress.digest())
+    longest = max(longest, time.perf_counter() - start)
+    await digest
+    return longest
+
+
+def run(piece_length: int) -> None:
+    piece = bytes(piece_length)
+    whole = max(whole_piece_hash(piece) for _ in range(PIECES))
+    in_order = max(asyncio.run(incremental_hash(piece, True)) for _ in range(PIECES))
+    out_of_order = max(asyncio.run(incremental_hash(piece, False)) for _ in range(PIECES))
+    print(f"{piece_length // 2 ** 20:>3} MiB piece, longest event loop stall: "
+          f"whole piece {whole * 1000:7.3f} ms, "
+          f"in order {in_order * 1000:7.3f} ms, "
+          f"out of order {out_of_order * 1000:7.3f} ms")
+
+
+def main():
+    for piece_length in PIECE_LENGTHS:
+        run(piece_length)
+
+
+if __name__ == "__main__":
+    main()
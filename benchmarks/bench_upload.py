@@ -0,0 +1,67 @@
+"""
+measure the cpu time this process spends to upload 1 GiB of blocks to a peer on localhost,
+when the blocks are read from the file and sent as bytes and when they are sent with sendfile.
+the peer runs in another process so only the uploading side is measured.
+
+run from the repository root:
+    python -m benchmarks.bench_upload
+"""
+import asyncio
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.p2p_messages_handling.message_id import MessageID
+from torrent_client.peer.p2p_messages_handling.p2p_messages import PieceMessage
+from torrent_client.peer.p2p_net.file_block import FileBlock
+from torrent_client.peer.p2p_net.p2p_socket import P2PSocket
+from torrent_client.peer.p2p_net.tcp_client import TcpClient
+
+FILE_SIZE = 64 * 2 ** 20
+UPLOAD_SIZE = 2 ** 30
+
+
+def sink(server: socket.socket) -> None:
+    while True:
+        connection, _ = server.accept()
+        with connection:
+            while connection.recv(2 ** 20):
+                pass
+
+
+async def upload(port: int, file, from_file: bool) -> float:
+    p2p_socket = P2PSocket("127.0.0.1", port, 0, client=TcpClient("127.0.0.1", port))
+    await p2p_socket.__aenter__()
+    start = time.process_time()
+    for block_index in range(UPLOAD_SIZE // BLOCK_SIZE):
+        offset = block_index * BLOCK_SIZE % FILE_SIZE
+        if from_file:
+            await p2p_socket.send_file_block(0, offset, FileBlock(file, offset, BLOCK_SIZE))
+        else:
+            block = await asyncio.to_thread(os.pread, file.fileno(), BLOCK_SIZE, offset)
+            await p2p_socket.send(PieceMessage(0, offset, block), MessageID.Piece)
+    # at most the send high watermark is still queued, it is small next to the uploaded size
+    cpu_time = time.process_time() - start
+    await p2p_socket.__aexit__(None, None, None)
+    return cpu_time
+
+
+def main():
+    server = socket.create_server(("127.0.0.1", 0))
+    port = server.getsockname()[1]
+    process = multiprocessing.Process(target=sink, args=(server,), daemon=True)
+    process.start()
+    with tempfile.TemporaryFile() as file:
+        file.write(os.urandom(FILE_SIZE))
+        file.flush()
+        for name, from_file in (("read and send", False), ("sendfile", True)):
+            cpu_time = asyncio.run(upload(port, file, from_file))
+            print(f"{name:>14}: {cpu_time:6.2f} cpu seconds per GiB uploaded")
+    process.terminate()
+
+
+if __name__ == "__main__":
+    main()
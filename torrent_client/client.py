@@ -1,9 +1,15 @@
 import asyncio
 import logging
 
+from torrent_client.constants import PEER_DEFAULT_PORT
+from torrent_client.download.file_loading.allocation_policy import AllocationPolicy
+from torrent_client.download.file_loading.os_wrapper import AbstractOsWrapper
+from torrent_client.download.storage_manager import StorageManager
+from torrent_client.peer.p2p_net.rate_limiter import GLOBAL_BANDWIDTH
+from torrent_client.swarm.peer_listener import AbstractPeerListener, PeerListener
+from torrent_client.swarm.swarm_manager import AbstractSwarmManager, SwarmManager
 from torrent_client.torrent_file.decoder import AbstractDecoder, Decoder
 from torrent_client import log_config
-from torrent_client.tracker.test.fakes.fake_tracker_bridge import FakeTrackerBridge
 from torrent_client.tracker.tracker_manager import AbstractTrackerManager, TrackerManager
 from torrent_client.utils import generate_peer_id
 
@@ -13,18 +19,61 @@ logger = logging.getLogger(__name__)
 class Client:
     def __init__(self, file_name=None,
                  decoder: AbstractDecoder = None,
-                 tracker_manager: AbstractTrackerManager = None):
+                 tracker_manager: AbstractTrackerManager = None,
+                 swarm_manager: AbstractSwarmManager = None,
+                 peer_listener: AbstractPeerListener = None,
+                 upload_rate: float = 0,
+                 download_rate: float = 0,
+                 os_wrapper: AbstractOsWrapper = None,
+                 allocation: AllocationPolicy = AllocationPolicy.Sparse):
+        """
+        upload_rate and download_rate limit this torrent in bytes per second, 0 is not limited.
+        os_wrapper is the storage backend of the torrent files, the default reads and writes them in threads.
+        allocation is how the files are created, preallocated files are not fragmented
+        """
         self._peer_id = generate_peer_id()
         self.file_name = file_name
         self.decoder = decoder if decoder else Decoder(file_name)
         self.tracker_manager = tracker_manager if tracker_manager else TrackerManager()
+        self.swarm_manager = swarm_manager if swarm_manager else SwarmManager(
+            limits=GLOBAL_BANDWIDTH.child(upload_rate, download_rate)
+        )
+        self.peer_listener = peer_listener if peer_listener else PeerListener()
         self._peer_que = asyncio.Queue()
+        self._os_wrapper = os_wrapper
+        self._allocation = allocation
 
     async def download(self):
         logger.info("************* start download *************")
         file = self.decoder.decode()
         logger.info(f"the file {self.file_name} was decoded successfully")
         logger.debug(f"decoded file: {file}")
-        await self.tracker_manager.start_trackers(self._peer_que, self._peer_id, FakeTrackerBridge(), file)
+        storage_manager = StorageManager(file, os_wrapper=self._os_wrapper, allocation=self._allocation)
+        swarm_task = asyncio.create_task(
+            self.swarm_manager.start(self._peer_que, self._peer_id, storage_manager, file)
+        )
+        self.peer_listener.register(file.info_hash, self.swarm_manager)
+        listener_task = asyncio.create_task(self.peer_listener.serve(PEER_DEFAULT_PORT))
+        download_task = asyncio.gather(
+            self.tracker_manager.start_trackers(self._peer_que, self._peer_id, storage_manager, file),
+            storage_manager.download()
+        )
+        try:
+            # the swarm and the listener run until the download is done, an error of theirs stops it
+            done, _ = await asyncio.wait(
+                (download_task, swarm_task, listener_task), return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                task.result()
+            await download_task
+        finally:
+            self.peer_listener.unregister(file.info_hash)
+            download_task.cancel()
+            listener_task.cancel()
+            swarm_task.cancel()
+            for result in await asyncio.gather(
+                    download_task, swarm_task, listener_task, return_exceptions=True):
+                if isinstance(result, Exception):
+                    raise result
         logger.info("************* end client *************")
         return file
@@ -4,3 +4,7 @@ class PieceAllReadyOccupiedError(Exception):
 
 class UnoccupiedPieceError(Exception):
     pass
+
+
+class NotEnoughSpaceError(Exception):
+    pass
@@ -0,0 +1,8 @@
+from enum import Enum, auto
+
+
+class AllocationPolicy(Enum):
+    # the files get their full length without taking disk space, the space is taken when the pieces are written
+    Sparse = auto()
+    # all the disk space is taken at start, so writes at random offsets don't fragment the files
+    Preallocate = auto()
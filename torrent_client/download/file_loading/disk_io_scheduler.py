@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Optional, Tuple, TypeVar
+
+from torrent_client.peer.p2p_net.clock import AbstractClock, Clock
+
+logger = logging.getLogger(__name__)
+
+Result_ = TypeVar("Result_")
+
+DISK_IO_WORKERS = 4
+# pieces that wait to be written take at most this much memory, storing more pieces waits until some are written
+MAX_QUEUED_BYTES = 64 * 2 ** 20
+LATENCY_SMOOTHING = 1 / 8
+
+
+class DiskIoScheduler:
+    """
+    runs the blocking file operations of all the torrents in a fixed pool of threads,
+    and bounds the bytes that were handed to the disk and are not written yet.
+    the writes of one file stay in order because its file loader waits for every write before the next one
+    """
+    def __init__(self,
+                 workers: int = DISK_IO_WORKERS,
+                 max_queued_bytes: int = MAX_QUEUED_BYTES,
+                 clock: AbstractClock = None):
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="disk-io")
+        self._max_queued_bytes = max_queued_bytes
+        self._clock = clock if clock else Clock()
+        # writes that wait for room in the queue, in the order they came
+        self._waiting: Deque[Tuple[int, asyncio.Future]] = deque()
+        self.queued_bytes = 0
+        self.queue_depth = 0
+        # smoothed seconds from the time a write entered the queue until it was on disk
+        self.write_latency: Optional[float] = None
+
+    async def run(self, func: Callable[..., Result_], *args: Any) -> Result_:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def queue_write(self, size: int) -> float:
+        """
+        waits until the queue has room for size bytes and counts them.
+        a write bigger than the queue is let in when the queue is empty
+        :return the time the write entered the queue, for write_done
+        """
+        if self._waiting or not self._has_room(size):
+            logger.debug(f"disk queue is full with {self.queued_bytes} bytes, waiting")
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiting.append((size, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if not waiter.cancelled():
+                    # the room was given to this write already
+                    self._remove(size)
+                    raise
+                if (size, waiter) in self._waiting:
+                    self._waiting.remove((size, waiter))
+                self._let_waiting_in()
+                raise
+        else:
+            self._add(size)
+        return self._clock.get_time()
+
+    def write_done(self, size: int, queued_at: float) -> None:
+        latency = self._clock.get_time() - queued_at
+        if self.write_latency is None:
+            self.write_latency = latency
+        else:
+            self.write_latency += LATENCY_SMOOTHING * (latency - self.write_latency)
+        self._remove(size)
+
+    def _has_room(self, size: int) -> bool:
+        return not self.queued_bytes or self.queued_bytes + size <= self._max_queued_bytes
+
+    def _add(self, size: int) -> None:
+        self.queued_bytes += size
+        self.queue_depth += 1
+
+    def _remove(self, size: int) -> None:
+        self.queued_bytes -= size
+        self.queue_depth -= 1
+        self._let_waiting_in()
+
+    def _let_waiting_in(self) -> None:
+        while self._waiting and self._has_room(self._waiting[0][0]):
+            size, waiter = self._waiting.popleft()
+            if waiter.cancelled():
+                continue
+            self._add(size)
+            waiter.set_result(None)
+
+
+# shared by all the torrents, so the threads and the memory of the queue are bounded for the whole client
+DISK_IO_SCHEDULER = DiskIoScheduler()
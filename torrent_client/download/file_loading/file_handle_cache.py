@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict
+
+from torrent_client.download.file_loading.os_file import AbstractOsFile
+from torrent_client.download.file_loading.os_wrapper import AbstractOsWrapper
+
+logger = logging.getLogger(__name__)
+
+# far below the usual limit of 1024 descriptors, the sockets of the peers need descriptors too
+MAX_OPEN_FILES = 128
+
+
+@dataclass
+class _OpenFile:
+    file: AbstractOsFile
+    opened: asyncio.Future
+    # handles that are used now are not closed
+    users: int = 0
+
+
+class FileHandleCache:
+    """
+    the open files of the torrents by path. a file is opened when it is first used,
+    and the least recently used files that are not in use are closed when more than max_open_files are open
+    """
+    def __init__(self, max_open_files: int = MAX_OPEN_FILES):
+        self._max_open_files = max_open_files
+        self._files: Dict[str, _OpenFile] = OrderedDict()
+
+    @property
+    def open_files(self) -> int:
+        return len(self._files)
+
+    @asynccontextmanager
+    async def open(self, os_wrapper: AbstractOsWrapper, path: str, size: int) -> AsyncIterator[AbstractOsFile]:
+        """the file is open while the context is, the handle is shared so the file position must not be used"""
+        file = await self.acquire(os_wrapper, path, size)
+        try:
+            yield file
+        finally:
+            self.release(path)
+            await self._close_unused()
+
+    async def acquire(self, os_wrapper: AbstractOsWrapper, path: str, size: int) -> AbstractOsFile:
+        """the file is not closed until it is released, for users that keep it after they returned"""
+        entry = self._files.get(path)
+        if entry is None:
+            file = os_wrapper.make_file(path, size)
+            # not tied to the task that opens it, the other users of the file wait for it too
+            entry = _OpenFile(file, asyncio.ensure_future(file.__aenter__()))
+            self._files[path] = entry
+        self._files.move_to_end(path)
+        entry.users += 1
+        try:
+            await asyncio.shield(entry.opened)
+        except BaseException:
+            entry.users -= 1
+            failed = entry.opened.done() and (entry.opened.cancelled() or entry.opened.exception())
+            if failed and self._files.get(path) is entry:
+                del self._files[path]
+            raise
+        # the files that were released since the last open are closed when a file is opened
+        await self._close_unused()
+        return entry.file
+
+    def release(self, path: str) -> None:
+        self._files[path].users -= 1
+
+    async def _close_unused(self) -> None:
+        while len(self._files) > self._max_open_files:
+            path = next((path for path, entry in self._files.items() if not entry.users), None)
+            if path is None:
+                # all the open files are in use, they are closed when they are not
+                return
+            entry = self._files.pop(path)
+            logger.debug(f"too many open files, closing {path}")
+            await entry.file.__aexit__(None, None, None)
+
+    async def close(self) -> None:
+        for path in [path for path, entry in self._files.items() if not entry.users]:
+            await self._files.pop(path).file.__aexit__(None, None, None)
+
+
+# shared by all the torrents, so the descriptors of the client are bounded and not only those of one torrent
+FILE_HANDLE_CACHE = FileHandleCache()
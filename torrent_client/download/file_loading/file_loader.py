@@ -1,16 +1,20 @@
 import asyncio
+import logging
 import os
 from abc import abstractmethod, ABC
-from asyncio import Queue
-from typing import List, AsyncIterable
+from typing import Callable, List, Optional, Set
 
 from torrent_client.constants import output_files_path
+from torrent_client.download.file_loading.allocation_policy import AllocationPolicy
+from torrent_client.download.file_loading.file_handle_cache import FileHandleCache, FILE_HANDLE_CACHE
 from torrent_client.download.file_loading.load_listener import LoadListener
 from torrent_client.download.file_loading.load_request import LoadRequest
 from torrent_client.download.file_loading.os_wrapper import AbstractOsWrapper, OsWrapper
 from torrent_client.download.part import Part
+from torrent_client.peer.p2p_net.file_block import FileBlock
 from torrent_client.torrent_file.file_to_download import FileToDownload
 
+logger = logging.getLogger(__name__)
 
 
 def join_path_list_with_output_dir(path: List[str]) -> str:
@@ -25,7 +29,31 @@ class AbstractFileLoader(ABC, LoadListener):
         pass
 
     @abstractmethod
-    async def listen_to_requests_and_download(self) -> None:
+    async def allocate(self, policy: AllocationPolicy) -> None:
+        pass
+
+    @abstractmethod
+    def get_missing_space(self) -> int:
+        pass
+
+    @abstractmethod
+    def set_ready_listener(self, listener: "ReadyListener") -> None:
+        pass
+
+    @abstractmethod
+    async def write_pending(self) -> None:
+        pass
+
+    @abstractmethod
+    def is_complete(self) -> bool:
+        pass
+
+    @abstractmethod
+    async def read(self, beginning_in_file: int, size: int) -> bytes:
+        pass
+
+    @abstractmethod
+    async def get_upload_block(self, beginning_in_file: int, size: int) -> FileBlock:
         pass
 
     @abstractmethod
@@ -33,40 +61,119 @@ class AbstractFileLoader(ABC, LoadListener):
         pass
 
 
+# called with a file loader that has requests to write, the loader is not given again until write_pending is called
+ReadyListener = Callable[[AbstractFileLoader], None]
+
+
 class FileLoader(AbstractFileLoader):
+    """
+    collects the load requests of one file until an io worker writes them.
+    the file is opened through the handle cache only when it is used, so it does not take a descriptor between writes
+    """
     def __init__(
             self,
             file: FileToDownload,
-            os_wrapper: AbstractOsWrapper):
-        self._loading_requests_queue: Queue[LoadRequest] = Queue()
+            os_wrapper: AbstractOsWrapper,
+            handle_cache: FileHandleCache = None):
+        self._pending: List[LoadRequest] = []
+        # the loader is given to the ready listener, or written by a worker
+        self._scheduled = False
+        self._ready_listener: Optional[ReadyListener] = None
+        self._size_written = 0
+        # where the written requests begin, a piece downloaded again is written again but counted once
+        self._written_beginnings: Set[int] = set()
         self._os_wrapper = os_wrapper if os_wrapper else OsWrapper()
+        self._handle_cache = handle_cache if handle_cache else FILE_HANDLE_CACHE
         self._parent_path = join_path_list_with_output_dir(file.path[:-1])
         self._path = join_path_list_with_output_dir(file.path)
         self._length = file.length
 
-    async def listen_to_requests_and_download(self):
+    async def allocate(self, policy: AllocationPolicy) -> None:
+        """creates the file with its full length before anything is written to it"""
         await self._handle_directory()
-        async with self._os_wrapper.make_file(self._path) as file:
-            async for req in self._loading_requests_iter():
-                await file.seek(req.beginning_in_file)
-                await file.write(req.data)
-
+        await self._os_wrapper.create_file(self._path, self._length, policy)
 
-    async def _handle_directory(self):
-        if not self._os_wrapper.is_dir_exist(self._parent_path):
-            await self._os_wrapper.makedir(self._parent_path)
+    def get_missing_space(self) -> int:
+        """:return the disk space the file still needs"""
+        return max(self._length - self._os_wrapper.get_allocated_size(self._path), 0)
 
-    async def _loading_requests_iter(self) -> AsyncIterable[LoadRequest]:
-        size_downloaded = 0
-        while size_downloaded < self._length:
-            req = await self._loading_requests_queue.get()
-            size_downloaded += req.size
-            yield req
+    def set_ready_listener(self, listener: ReadyListener) -> None:
+        self._ready_listener = listener
 
+    def is_complete(self) -> bool:
+        return self._size_written >= self._length
 
     async def add_load_request(self, load_req: LoadRequest):
-        await self._loading_requests_queue.put(load_req)
+        self._pending.append(load_req)
+        if not self._scheduled and self._ready_listener:
+            self._scheduled = True
+            self._ready_listener(self)
+
+    async def write_pending(self) -> None:
+        """writes all the requests that are waiting, the writes of one file are never done by two workers at once"""
+        try:
+            while self._pending:
+                requests, self._pending = self._pending, []
+                try:
+                    await self._write(requests)
+                except asyncio.CancelledError as error:
+                    # the worker is stopped, nothing writes the requests that are waiting
+                    self._fail_requests(requests + self._pending, error)
+                    self._pending = []
+                    raise
+                except Exception as error:
+                    # only the requests of the failed write fail, a request for the same data may be written later
+                    logger.error(f"failed to write {self._path}: {error!r}")
+                    self._fail_requests(requests, error)
+        finally:
+            self._scheduled = False
+
+    @staticmethod
+    def _fail_requests(requests: List[LoadRequest], error: BaseException) -> None:
+        for req in requests:
+            if not req.written or req.written.done():
+                continue
+            if isinstance(error, asyncio.CancelledError):
+                req.written.cancel()
+            else:
+                req.written.set_exception(error)
+
+    async def _write(self, requests: List[LoadRequest]) -> None:
+        async with self._handle_cache.open(self._os_wrapper, self._path, self._length) as file:
+            for run in self._adjacent_runs(requests):
+                await file.write_at(run[0].beginning_in_file, [req.data for req in run])
+                for req in run:
+                    if req.beginning_in_file not in self._written_beginnings:
+                        self._written_beginnings.add(req.beginning_in_file)
+                        self._size_written += req.size
+                    if req.written and not req.written.done():
+                        req.written.set_result(None)
+
+    async def _handle_directory(self):
+        if not self._os_wrapper.is_dir_exist(self._parent_path):
+            await self._os_wrapper.makedir(self._parent_path)
 
+    @staticmethod
+    def _adjacent_runs(requests: List[LoadRequest]) -> List[List[LoadRequest]]:
+        """groups requests that continue each other in the file, every group is written in one call"""
+        runs = []
+        for req in sorted(requests, key=lambda req: req.beginning_in_file):
+            if runs and runs[-1][-1].beginning_in_file + len(runs[-1][-1].data) == req.beginning_in_file:
+                runs[-1].append(req)
+            else:
+                runs.append([req])
+        return runs
+
+    async def read(self, beginning_in_file: int, size: int) -> bytes:
+        """reads data that was written already"""
+        async with self._handle_cache.open(self._os_wrapper, self._path, self._length) as file:
+            return await file.read_at(beginning_in_file, size)
+
+
+    async def get_upload_block(self, beginning_in_file: int, size: int) -> FileBlock:
+        """the block is sent from the file of the handle cache, the file is kept open until the block is released"""
+        file = await self._handle_cache.acquire(self._os_wrapper, self._path, self._length)
+        return FileBlock(file.file_object, beginning_in_file, size, lambda: self._handle_cache.release(self._path))
 
     def create_file_parts(self, start_part_size: int, normal_part_size: int) -> List[Part]:
         if start_part_size > self._length:
@@ -2,9 +2,18 @@ from abc import abstractmethod
 from typing import Protocol
 
 from torrent_client.download.file_loading.load_request import LoadRequest
+from torrent_client.peer.p2p_net.file_block import FileBlock
 
 
 class LoadListener(Protocol):
     @abstractmethod
     async def add_load_request(self, load_req: LoadRequest) -> None:
         ...
+
+    @abstractmethod
+    async def read(self, beginning_in_file: int, size: int) -> bytes:
+        ...
+
+    @abstractmethod
+    async def get_upload_block(self, beginning_in_file: int, size: int) -> FileBlock:
+        ...
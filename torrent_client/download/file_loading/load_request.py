@@ -1,4 +1,6 @@
+import asyncio
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -6,3 +8,5 @@ class LoadRequest:
     beginning_in_file: int
     data: bytes
     size: int
+    # resolved once the data is on disk
+    written: Optional[asyncio.Future] = None
@@ -0,0 +1,90 @@
+import mmap
+import os
+from typing import BinaryIO, Dict, List, Optional
+
+from torrent_client.download.file_loading.disk_io_scheduler import DiskIoScheduler, DISK_IO_SCHEDULER
+from torrent_client.download.file_loading.os_file import AbstractOsFile
+
+
+class FileMapping:
+    """a file sized to its full length and mapped to memory, shared by all the open handles of the file"""
+    def __init__(self, path: str, size: int):
+        self.file = open(path, "rb+") if os.path.exists(path) else open(path, "wb+")
+        if os.fstat(self.file.fileno()).st_size < size:
+            os.ftruncate(self.file.fileno(), size)
+        # an empty file can't be mapped
+        self._map: Optional[mmap.mmap] = mmap.mmap(self.file.fileno(), size) if size else None
+        self.view = memoryview(self._map) if self._map else memoryview(b"")
+        self.users = 0
+
+    def close(self) -> None:
+        self.view.release()
+        self.file.close()
+        if self._map:
+            try:
+                self._map.close()
+            except BufferError:
+                # slices that were read are still used, the mapping is unmapped when the last of them is gone
+                pass
+
+
+class MmapOsFile(AbstractOsFile):
+    """
+    reads and writes are copies to and from the mapping, done without a syscall or a thread.
+    what read and read_at return are views of the mapping and not copies
+    """
+    def __init__(self, path: str, size: int, mappings: Dict[str, FileMapping], scheduler: DiskIoScheduler = None):
+        self._path = path
+        self._scheduler = scheduler if scheduler else DISK_IO_SCHEDULER
+        self._size = size
+        self._mappings = mappings
+        self._mapping: Optional[FileMapping] = None
+        self._position = 0
+
+    async def __aenter__(self) -> AbstractOsFile:
+        mapping = self._mappings.get(self._path)
+        if mapping is None:
+            mapping = await self._scheduler.run(FileMapping, self._path, self._size)
+            # another handle may have mapped the file while this one waited
+            if self._path in self._mappings:
+                mapping.close()
+                mapping = self._mappings[self._path]
+            else:
+                self._mappings[self._path] = mapping
+        mapping.users += 1
+        self._mapping = mapping
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._mapping.users -= 1
+        if not self._mapping.users:
+            del self._mappings[self._path]
+            self._mapping.close()
+        self._mapping = None
+
+    async def write(self, data: bytes) -> None:
+        await self.write_at(self._position, [data])
+        self._position += len(data)
+
+    async def write_at(self, offset: int, buffers: List[bytes]) -> None:
+        view = self._mapping.view
+        for buffer in buffers:
+            size = len(memoryview(buffer).cast("B"))
+            view[offset:offset + size] = buffer
+            offset += size
+
+    async def read(self, size) -> memoryview:
+        data = self._mapping.view[self._position:self._position + size]
+        self._position += len(data)
+        return data
+
+    async def read_at(self, offset: int, size: int) -> memoryview:
+        # the handle cache may close the file while the view is used, the mapping is kept until the view is gone
+        return self._mapping.view[offset:offset + size]
+
+    async def seek(self, pos: int) -> None:
+        self._position = pos
+
+    @property
+    def file_object(self) -> BinaryIO:
+        return self._mapping.file
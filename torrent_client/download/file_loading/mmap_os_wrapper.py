@@ -0,0 +1,17 @@
+from typing import Dict
+
+from torrent_client.download.file_loading.disk_io_scheduler import DiskIoScheduler
+from torrent_client.download.file_loading.mmap_os_file import FileMapping, MmapOsFile
+from torrent_client.download.file_loading.os_file import AbstractOsFile
+from torrent_client.download.file_loading.os_wrapper import OsWrapper
+
+
+class MmapOsWrapper(OsWrapper):
+    """makes files that are accessed through a memory mapping instead of reads and writes in threads"""
+    def __init__(self, scheduler: DiskIoScheduler = None):
+        super().__init__(scheduler)
+        # the mappings of the files that are open, by path
+        self._mappings: Dict[str, FileMapping] = {}
+
+    def make_file(self, path: str, size: int) -> AbstractOsFile:
+        return MmapOsFile(path, size, self._mappings, self._scheduler)
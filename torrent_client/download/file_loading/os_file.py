@@ -1,5 +1,12 @@
-import asyncio
+import os
 from abc import ABC, abstractmethod
+from typing import BinaryIO, List
+
+from torrent_client.download.file_loading.disk_io_scheduler import DiskIoScheduler, DISK_IO_SCHEDULER
+from torrent_client.peer.p2p_net.file_block import position_lock, read_at
+
+# most buffers one vectored write takes
+IOV_MAX = os.sysconf("SC_IOV_MAX") if hasattr(os, "sysconf") else 1024
 
 
 class AbstractOsFile(ABC):
@@ -15,31 +22,90 @@ class AbstractOsFile(ABC):
     async def write(self, data: bytes) -> None:
         pass
 
+    @abstractmethod
+    async def write_at(self, offset: int, buffers: List[bytes]) -> None:
+        """writes the buffers one after the other from offset, without using or moving the file position"""
+        pass
+
     @abstractmethod
     async def read(self, size) -> bytes:
         pass
 
+    @abstractmethod
+    async def read_at(self, offset: int, size: int) -> bytes:
+        """reads from offset without using or moving the file position"""
+        pass
+
     @abstractmethod
     async def seek(self, pos: int) -> None:
         pass
 
+    @property
+    @abstractmethod
+    def file_object(self) -> BinaryIO:
+        """the open file, for sending it to a socket without reading it"""
+        pass
+
 
 class OsFile(AbstractOsFile):
-    def __init__(self, path):
+    def __init__(self, path, scheduler: DiskIoScheduler = None):
         self._path = path
+        # the blocking calls run in the threads of the scheduler
+        self._scheduler = scheduler if scheduler else DISK_IO_SCHEDULER
 
     async def __aenter__(self) -> AbstractOsFile:
-        self._file = await asyncio.to_thread(open, "rb+", self._path)
+        self._file = await self._scheduler.run(open, self._path, "rb+")
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await asyncio.to_thread(self._file.close)
+        await self._scheduler.run(self._file.close)
 
     async def read(self, size) -> bytes:
-        return await asyncio.to_thread(self._file.read, size)
+        return await self._scheduler.run(self._file.read, size)
+
+    async def read_at(self, offset: int, size: int) -> bytes:
+        return await self._scheduler.run(read_at, self._file, offset, size)
 
     async def write(self, data: bytes) -> None:
-        await asyncio.to_thread(self._file.write, data)
+        await self._scheduler.run(self._file.write, data)
+
+    async def write_at(self, offset: int, buffers: List[bytes]) -> None:
+        await self._scheduler.run(self._write_at, offset, buffers)
+
+    def _write_at(self, offset: int, buffers: List[bytes]) -> None:
+        views = [memoryview(buffer).cast("B") for buffer in buffers]
+        if not hasattr(os, "pwrite"):
+            self._seek_and_write(offset, views)
+            return
+        fd = self._file.fileno()
+        while views:
+            if hasattr(os, "pwritev"):
+                written = os.pwritev(fd, views[:IOV_MAX], offset)
+            else:
+                written = os.pwrite(fd, views[0], offset)
+            offset += written
+            views = _skip_written(views, written)
+
+    def _seek_and_write(self, offset: int, views: List[memoryview]) -> None:
+        # the position is shared with the peers that read the file for uploads
+        with position_lock(self._file):
+            self._file.seek(offset)
+            for view in views:
+                self._file.write(view)
+            self._file.flush()
 
     async def seek(self, pos: int, whence=0) -> None:
-        await asyncio.to_thread(self._file.seek, pos, whence)
+        await self._scheduler.run(self._file.seek, pos, whence)
+
+    @property
+    def file_object(self) -> BinaryIO:
+        return self._file
+
+
+def _skip_written(views: List[memoryview], written: int) -> List[memoryview]:
+    """:return what is left to write after a write that may have stopped in the middle of a buffer"""
+    for index, view in enumerate(views):
+        if written < len(view):
+            return [view[written:]] + views[index + 1:]
+        written -= len(view)
+    return []
@@ -1,9 +1,14 @@
-import asyncio
+import logging
 import os
+import shutil
 from abc import ABC, abstractmethod
 
+from torrent_client.download.file_loading.allocation_policy import AllocationPolicy
+from torrent_client.download.file_loading.disk_io_scheduler import DiskIoScheduler, DISK_IO_SCHEDULER
 from torrent_client.download.file_loading.os_file import OsFile, AbstractOsFile
 
+logger = logging.getLogger(__name__)
+
 
 class AbstractOsWrapper(ABC):
     @abstractmethod
@@ -11,21 +16,71 @@ class AbstractOsWrapper(ABC):
         pass
 
     @abstractmethod
-    def make_file(self, path: str) -> AbstractOsFile:
+    def make_file(self, path: str, size: int) -> AbstractOsFile:
+        """:param size: the length of the complete file"""
         pass
 
     @abstractmethod
     def is_dir_exist(self, path: str) -> bool:
         pass
 
+    @abstractmethod
+    async def create_file(self, path: str, size: int, policy: AllocationPolicy) -> None:
+        """creates the file with its full length, or makes an existing shorter file longer"""
+        pass
+
+    @abstractmethod
+    def get_allocated_size(self, path: str) -> int:
+        """:return the disk space the file takes, 0 if it doesn't exist"""
+        pass
+
+    @abstractmethod
+    def get_free_space(self, path: str) -> int:
+        """:return the free space of the disk the path is on, the path doesn't have to exist yet"""
+        pass
+
 
 class OsWrapper(AbstractOsWrapper):
+    def __init__(self, scheduler: DiskIoScheduler = None):
+        self._scheduler = scheduler if scheduler else DISK_IO_SCHEDULER
+
     async def makedir(self, path: str) -> None:
-        await asyncio.to_thread(os.makedirs, path)
+        await self._scheduler.run(os.makedirs, path)
 
 
-    def make_file(self, path: str) -> AbstractOsFile:
-        return OsFile(path)
+    def make_file(self, path: str, size: int) -> AbstractOsFile:
+        return OsFile(path, self._scheduler)
 
     def is_dir_exist(self, path: str) -> bool:
         return os.path.isdir(path)
+
+    async def create_file(self, path: str, size: int, policy: AllocationPolicy) -> None:
+        await self._scheduler.run(self._create_file, path, size, policy)
+
+    @staticmethod
+    def _create_file(path: str, size: int, policy: AllocationPolicy) -> None:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if policy == AllocationPolicy.Preallocate and size and hasattr(os, "posix_fallocate"):
+                # the parts that are allocated already, with the data of an earlier run, are kept
+                os.posix_fallocate(fd, 0, size)
+                return
+            if policy == AllocationPolicy.Preallocate and size:
+                logger.warning(f"can't preallocate {path} on this platform, the file is created sparse")
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+
+    def get_allocated_size(self, path: str) -> int:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return 0
+        # st_blocks counts 512 byte units on every platform that has it
+        return stat.st_blocks * 512 if hasattr(stat, "st_blocks") else stat.st_size
+
+    def get_free_space(self, path: str) -> int:
+        while not os.path.isdir(path):
+            path = os.path.dirname(path) or os.curdir
+        return shutil.disk_usage(path).free
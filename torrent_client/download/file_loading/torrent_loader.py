@@ -1,7 +1,11 @@
 import asyncio
 from abc import abstractmethod, ABC
-from typing import List, Optional
+from typing import List, Optional, Set
 
+from torrent_client.constants import output_files_path
+from torrent_client.download.exceptions import NotEnoughSpaceError
+from torrent_client.download.file_loading.allocation_policy import AllocationPolicy
+from torrent_client.download.file_loading.file_handle_cache import FileHandleCache
 from torrent_client.download.file_loading.file_loader import FileLoader, AbstractFileLoader
 from torrent_client.download.file_loading.os_wrapper import OsWrapper, AbstractOsWrapper
 from torrent_client.download.part import Part
@@ -9,8 +13,15 @@ from torrent_client.torrent_file.file_to_download import FileToDownload
 
 PieceInPart = List[Part]
 
+# the files with requests to write are written by this many tasks, not by a task for every file
+IO_WORKERS = 4
+
 
 class AbstractTorrentLoader(ABC):
+    @abstractmethod
+    async def allocate_files(self, policy: AllocationPolicy) -> None:
+        pass
+
     @abstractmethod
     async def listen_to_requests_and_download(self) -> None:
         pass
@@ -24,15 +35,55 @@ class TorrentLoader(AbstractTorrentLoader):
     def __init__(self,
                  files_info: Optional[List[FileToDownload]] = None,
                  os: Optional[AbstractOsWrapper] = None,
-                 files_loaders: Optional[List[AbstractFileLoader]] = None):
+                 files_loaders: Optional[List[AbstractFileLoader]] = None,
+                 handle_cache: Optional[FileHandleCache] = None,
+                 workers: int = IO_WORKERS):
         self._os = os if os else OsWrapper()
         self._files = files_loaders if files_loaders else \
-            [FileLoader(file_info, self._os) for file_info in files_info]
+            [FileLoader(file_info, self._os, handle_cache) for file_info in files_info]
+        self._workers = workers
+        # files that have requests to write, in the order their first request came
+        self._ready_files: asyncio.Queue[AbstractFileLoader] = asyncio.Queue()
+        for file in self._files:
+            file.set_ready_listener(self._ready_files.put_nowait)
+
+    async def allocate_files(self, policy: AllocationPolicy) -> None:
+        """creates all the files at start, after checking the disk has room for all of them"""
+        missing_space = sum(file.get_missing_space() for file in self._files)
+        free_space = self._os.get_free_space(output_files_path)
+        if missing_space > free_space:
+            raise NotEnoughSpaceError(f"the torrent needs {missing_space} more bytes, only {free_space} are free")
+        # one file after the other, so the disk can put every file in one place
+        for file in self._files:
+            await file.allocate(policy)
 
     async def listen_to_requests_and_download(self) -> None:
-        await asyncio.gather(
-            *[file.listen_to_requests_and_download() for file in self._files]
-        )
+        """writes the requests of all the files until every file is written"""
+        incomplete_files = {file for file in self._files if not file.is_complete()}
+        if not incomplete_files:
+            return
+        all_written = asyncio.Event()
+        workers = [asyncio.create_task(self._write_ready_files(incomplete_files, all_written))
+                   for _ in range(self._workers)]
+        all_written_wait = asyncio.create_task(all_written.wait())
+        try:
+            done, _ = await asyncio.wait(workers + [all_written_wait], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                # failed writes fail their requests, the workers only stop on an error nothing expected
+                task.result()
+        finally:
+            for task in workers + [all_written_wait]:
+                task.cancel()
+            await asyncio.gather(*workers, all_written_wait, return_exceptions=True)
+
+    async def _write_ready_files(self, incomplete_files: Set[AbstractFileLoader], all_written: asyncio.Event) -> None:
+        while True:
+            file = await self._ready_files.get()
+            await file.write_pending()
+            if file.is_complete():
+                incomplete_files.discard(file)
+                if not incomplete_files:
+                    all_written.set()
 
     def get_files_parts_in_pieces(self, piece_default_size: int) -> List[PieceInPart]:
         pieces_as_parts = []
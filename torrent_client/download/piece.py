@@ -1,9 +1,11 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
 
 from torrent_client.download.exceptions import PieceAllReadyOccupiedError, UnoccupiedPieceError
 from torrent_client.download.file_loading.load_request import LoadRequest
 from torrent_client.download.part import Part
+from torrent_client.peer.p2p_net.file_block import FileBlock
 from torrent_client.peer.downloading.piece_bitfield_info import PieceBitfieldInfo
 
 
@@ -16,14 +18,34 @@ class AbstractPiece(ABC):
     def occupy(self) -> PieceBitfieldInfo:
         pass
 
+    @abstractmethod
+    def share(self) -> PieceBitfieldInfo:
+        pass
+
     @abstractmethod
     def release(self) -> None:
         pass
 
+    @abstractmethod
+    def get_owners_count(self) -> int:
+        pass
+
+    @abstractmethod
+    def has_unrequested_blocks(self) -> bool:
+        pass
+
     @abstractmethod
     async def download(self, data: bytes) -> None:
         pass
 
+    @abstractmethod
+    async def read(self) -> bytes:
+        pass
+
+    @abstractmethod
+    async def get_block_file(self, begin: int, length: int) -> Optional[FileBlock]:
+        pass
+
     @abstractmethod
     def get_size(self) -> int:
         pass
@@ -32,43 +54,91 @@ class AbstractPiece(ABC):
     def is_downloaded(self) -> bool:
         pass
 
+    @abstractmethod
+    def reset(self) -> None:
+        pass
+
 
 class Piece(AbstractPiece):
     def __init__(self, parts: List[Part], index: int, hash_: bytes):
         self._index = index
         self._hash = hash_
         self._size = sum(part.size for part in parts)
-        self._occupied = False
+        self._owners = 0
         self._downloaded = False
         self._parts = parts
+        # kept until the piece is downloaded so blocks received by a peer are not lost when it leaves the piece
+        self._info: Optional[PieceBitfieldInfo] = None
 
     def release(self) -> None:
-        if not self._occupied:
+        if not self._owners:
             raise UnoccupiedPieceError()
-        self._occupied = False
+        self._owners -= 1
+
+    def get_owners_count(self) -> int:
+        return self._owners
+
+    def has_unrequested_blocks(self) -> bool:
+        return self._info is not None and self._info.progress.has_unrequested_blocks()
 
 
     async def _download(self, data: bytes) -> None:
         data_all_ready_requested = 0
+        written = []
+        # the parts are views of the piece, not copies of it
+        data = memoryview(data)
         for part in self._parts:
             part_start_in_data, part_end_in_data = data_all_ready_requested,  part.size+data_all_ready_requested
-            request_to_load = LoadRequest(part.beginning, data[part_start_in_data: part_end_in_data], part.size)
+            request_to_load = LoadRequest(part.beginning, data[part_start_in_data: part_end_in_data], part.size,
+                                          asyncio.get_running_loop().create_future())
             await part.file.add_load_request(request_to_load)
+            written.append(request_to_load.written)
             data_all_ready_requested += part.size
+        await asyncio.gather(*written)
 
     async def download(self, data: bytes):
+        """returns when the piece is on disk"""
         self._downloaded = True
+        self._info = None
         await self._download(data)
 
+    async def read(self) -> bytes:
+        parts = [await part.file.read(part.beginning, part.size) for part in self._parts]
+        # a piece in one file is returned as the file gave it, it is a view of the mapping for mapped files
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+    async def get_block_file(self, begin: int, length: int) -> Optional[FileBlock]:
+        """:return where the block is in its file, None if the block is split between two files"""
+        part_start = 0
+        for part in self._parts:
+            if begin < part_start + part.size:
+                if begin + length > part_start + part.size:
+                    return None
+                return await part.file.get_upload_block(part.beginning + begin - part_start, length)
+            part_start += part.size
+        return None
+
 
     def is_available_to_download(self) -> bool:
-        return (not self._occupied) and (not self._downloaded)
+        return (not self._owners) and (not self._downloaded)
 
     def occupy(self) -> PieceBitfieldInfo:
-        if self._occupied:
+        if self._owners:
             raise PieceAllReadyOccupiedError()
-        self._occupied = True
-        return PieceBitfieldInfo(self._index, self._size, self._hash)
+        self._owners = 1
+        return self._get_info()
+
+    def share(self) -> PieceBitfieldInfo:
+        """another peer joins a piece that is already being downloaded, the blocks are split between them"""
+        if not self._owners or self._downloaded:
+            raise UnoccupiedPieceError()
+        self._owners += 1
+        return self._get_info()
+
+    def _get_info(self) -> PieceBitfieldInfo:
+        if self._info is None:
+            self._info = PieceBitfieldInfo(self._index, self._size, self._hash)
+        return self._info
 
 
     def get_size(self) -> int:
@@ -76,3 +146,8 @@ class Piece(AbstractPiece):
 
     def is_downloaded(self) -> bool:
         return self._downloaded
+
+    def reset(self) -> None:
+        """the piece was not stored, it is downloaded again from the start"""
+        self._downloaded = False
+        self._info = None
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+PIECE_CACHE_SIZE = 64 * 2 ** 20
+
+
+class PieceCache:
+    """
+    lru cache of whole pieces read from disk for uploading, bounded by their total size.
+    a piece is read once and all its blocks are served from memory, a piece that is being read is not read again
+    """
+    def __init__(self, read_piece: Callable[[int], Awaitable[bytes]], capacity: int = PIECE_CACHE_SIZE):
+        self._read_piece = read_piece
+        self._capacity = capacity
+        self._size = 0
+        self._pieces: OrderedDict[int, bytes] = OrderedDict()
+        self._loading: Dict[int, asyncio.Future] = {}
+
+    def __contains__(self, index: int) -> bool:
+        return index in self._pieces
+
+    def __len__(self) -> int:
+        return len(self._pieces)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    async def get(self, index: int) -> bytes:
+        piece = self._pieces.get(index)
+        if piece is not None:
+            self._pieces.move_to_end(index)
+            return piece
+        # shielded so a peer that stops waiting does not cancel the read for the others
+        return await asyncio.shield(self._load(index))
+
+    def read_ahead(self, index: int) -> None:
+        """starts reading a piece that is likely to be requested soon"""
+        if index in self._pieces or index in self._loading:
+            return
+        logger.debug(f"reading ahead piece {index}")
+        self._load(index).add_done_callback(self._log_read_ahead_error)
+
+    def discard(self, index: int) -> None:
+        piece = self._pieces.pop(index, None)
+        if piece is not None:
+            self._size -= len(piece)
+
+    def _load(self, index: int) -> asyncio.Future:
+        if index not in self._loading:
+            self._loading[index] = asyncio.ensure_future(self._read_and_store(index))
+        return self._loading[index]
+
+    async def _read_and_store(self, index: int) -> bytes:
+        try:
+            piece = await self._read_piece(index)
+        finally:
+            del self._loading[index]
+        self._store(index, piece)
+        return piece
+
+    def _store(self, index: int, piece: bytes) -> None:
+        if len(piece) > self._capacity:
+            return
+        self.discard(index)
+        while self._pieces and self._size + len(piece) > self._capacity:
+            _, evicted = self._pieces.popitem(last=False)
+            self._size -= len(evicted)
+        self._pieces[index] = piece
+        self._size += len(piece)
+
+    @staticmethod
+    def _log_read_ahead_error(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception():
+            logger.warning(f"read ahead failed: {future.exception()}")
@@ -0,0 +1,156 @@
+import random
+from abc import ABC, abstractmethod
+from typing import Iterable, List, Optional
+
+from torrent_client.peer.downloading.bitset import Bitset
+
+# pieces are picked at random until this many were downloaded, so we have something to share quickly
+RANDOM_FIRST_PIECES = 4
+# random pieces of a bucket that are tried before the bucket is scanned for the pieces the peer has
+RANDOM_TRIES = 4
+# the position of a piece that is not in a bucket
+_NOT_PICKABLE = -1
+
+
+class AbstractPiecePicker(ABC):
+    @abstractmethod
+    def add_peer_bitfield(self, bitfield: Bitset) -> None:
+        pass
+
+    @abstractmethod
+    def remove_peer_bitfield(self, bitfield: Bitset) -> None:
+        pass
+
+    @abstractmethod
+    def add_peer_piece(self, index: int) -> None:
+        pass
+
+    @abstractmethod
+    def remove_piece(self, index: int) -> None:
+        """the piece is not picked until it is added back, it was downloaded or a peer is downloading it"""
+        pass
+
+    @abstractmethod
+    def add_piece(self, index: int) -> None:
+        pass
+
+    @abstractmethod
+    def pick(self, peer_bitfield: Bitset, needed: Bitset) -> Optional[int]:
+        pass
+
+    @abstractmethod
+    def piece_completed(self) -> None:
+        pass
+
+
+class PiecePicker(AbstractPiecePicker):
+    """
+    rarest first picker shared by all the peers of a torrent.
+    the pieces that can be picked are kept in one bucket for every availability level (bucket n holds the pieces
+    n peers have), a piece moves to the next bucket when a peer gets or loses it, so a have is O(1) and a bitfield
+    is O(its pieces). downloaded and occupied pieces are taken out of the buckets, so they are never scanned.
+    a pick walks the pieces the peer can give when there are fewer of them than pieces in the lowest bucket,
+    otherwise it starts at the lowest bucket and stops at the first bucket with a piece the peer has
+    """
+    def __init__(self, pieces_count: int, random_generator: random.Random = None):
+        self._random = random_generator if random_generator else random.Random()
+        self._availability = [0] * pieces_count
+        self._buckets: List[List[int]] = [list(range(pieces_count))]
+        # where every piece is in its bucket, so it is removed from it in O(1)
+        self._positions = list(range(pieces_count))
+        # no bucket above 0 and below it has pieces
+        self._min_level = 1
+        self._completed = 0
+
+    def availability(self, index: int) -> int:
+        return self._availability[index]
+
+    def add_peer_bitfield(self, bitfield: Bitset) -> None:
+        for index in bitfield.set_indexes():
+            self._move(index, self._availability[index] + 1)
+
+    def remove_peer_bitfield(self, bitfield: Bitset) -> None:
+        for index in bitfield.set_indexes():
+            if self._availability[index]:
+                self._move(index, self._availability[index] - 1)
+
+    def add_peer_piece(self, index: int) -> None:
+        self._move(index, self._availability[index] + 1)
+
+    def remove_piece(self, index: int) -> None:
+        if self._positions[index] != _NOT_PICKABLE:
+            self._take_out(index)
+            self._positions[index] = _NOT_PICKABLE
+
+    def add_piece(self, index: int) -> None:
+        if self._positions[index] == _NOT_PICKABLE:
+            self._put(index, self._availability[index])
+
+    def pick(self, peer_bitfield: Bitset, needed: Bitset) -> Optional[int]:
+        candidates = peer_bitfield & needed
+        candidates_count = candidates.count()
+        if not candidates_count:
+            return None
+        if self._completed < RANDOM_FIRST_PIECES:
+            return self._random.choice(list(candidates.set_indexes()))
+        lowest = self._lowest_level()
+        if lowest < len(self._buckets) and candidates_count >= len(self._buckets[lowest]):
+            for level in range(lowest, len(self._buckets)):
+                index = self._random_candidate(self._buckets[level], candidates)
+                if index is not None:
+                    return index
+        # few candidates, or pieces of a peer whose bitfield is not counted
+        return self._rarest(candidates.set_indexes())
+
+    def piece_completed(self) -> None:
+        self._completed += 1
+
+    def _move(self, index: int, level: int) -> None:
+        if self._positions[index] != _NOT_PICKABLE:
+            self._take_out(index)
+            self._put(index, level)
+        self._availability[index] = level
+
+    def _take_out(self, index: int) -> None:
+        bucket = self._buckets[self._availability[index]]
+        position = self._positions[index]
+        last = bucket.pop()
+        if last != index:
+            bucket[position] = last
+            self._positions[last] = position
+
+    def _put(self, index: int, level: int) -> None:
+        while level >= len(self._buckets):
+            self._buckets.append([])
+        self._positions[index] = len(self._buckets[level])
+        self._buckets[level].append(index)
+        if level:
+            self._min_level = min(self._min_level, level)
+
+    def _lowest_level(self) -> int:
+        while self._min_level < len(self._buckets) and not self._buckets[self._min_level]:
+            self._min_level += 1
+        return self._min_level
+
+    def _random_candidate(self, bucket: List[int], candidates: Bitset) -> Optional[int]:
+        """:return a piece of the bucket that is a candidate, every one of them is as likely"""
+        if not bucket:
+            return None
+        # most of the time most pieces of the bucket are candidates, and a few tries find one
+        for _ in range(RANDOM_TRIES):
+            index = bucket[self._random.randrange(len(bucket))]
+            if candidates[index]:
+                return index
+        matching = [index for index in bucket if candidates[index]]
+        return self._random.choice(matching) if matching else None
+
+    def _rarest(self, indexes: Iterable[int]) -> int:
+        """:return one of the rarest pieces, every one of them is as likely"""
+        rarest, level = [], None
+        for index in indexes:
+            availability = self._availability[index]
+            if level is None or availability < level:
+                rarest, level = [index], availability
+            elif availability == level:
+                rarest.append(index)
+        return self._random.choice(rarest)
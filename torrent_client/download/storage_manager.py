@@ -1,13 +1,25 @@
+import asyncio
+import logging
 from abc import ABC, abstractmethod
-from typing import Tuple, List, Optional
+from typing import Callable, Iterable, Tuple, List, Optional, Set
 
+from torrent_client.download.file_loading.allocation_policy import AllocationPolicy
+from torrent_client.download.file_loading.disk_io_scheduler import DiskIoScheduler, DISK_IO_SCHEDULER
+from torrent_client.download.file_loading.os_wrapper import AbstractOsWrapper
 from torrent_client.download.file_loading.torrent_loader import TorrentLoader, AbstractTorrentLoader
 from torrent_client.download.piece import Piece, AbstractPiece
+from torrent_client.download.piece_cache import PieceCache
+from torrent_client.download.piece_picker import AbstractPiecePicker, PiecePicker
+from torrent_client.peer.downloading.bitset import Bitset
 from torrent_client.peer.downloading.peer_bridge import PeerBridge
 from torrent_client.peer.downloading.piece_bitfield_info import PieceBitfieldInfo
+from torrent_client.peer.exceptions import InvalidBlockRequestError
+from torrent_client.peer.p2p_net.file_block import FileBlock
 from torrent_client.torrent_file.torrent_file import TorrentFile
 from torrent_client.tracker.tracker_bridge import TrackerBridge
 
+logger = logging.getLogger(__name__)
+
 
 class AbstractStorageManager(PeerBridge, TrackerBridge, ABC):
     @abstractmethod
@@ -17,40 +29,189 @@ class AbstractStorageManager(PeerBridge, TrackerBridge, ABC):
 
 class StorageManager(AbstractStorageManager):
     def __init__(self,
-                 torrent_file: TorrentFile,
+                 torrent_file: Optional[TorrentFile] = None,
                  loader: Optional[AbstractTorrentLoader] = None,
-                 pieces: Optional[List[AbstractPiece]] = None
+                 pieces: Optional[List[AbstractPiece]] = None,
+                 picker: Optional[AbstractPiecePicker] = None,
+                 cache: Optional[PieceCache] = None,
+                 os_wrapper: Optional[AbstractOsWrapper] = None,
+                 allocation: AllocationPolicy = AllocationPolicy.Sparse,
+                 scheduler: Optional[DiskIoScheduler] = None
                  ):
-        self._loader = loader if loader else TorrentLoader(torrent_file.files)
+        """
+        :param os_wrapper: how the files of this torrent are accessed, MmapOsWrapper maps them to memory
+        :param allocation: how the files are created when the download starts
+        """
+        self._allocation = allocation
+        self._scheduler = scheduler if scheduler else DISK_IO_SCHEDULER
+        self._loader = loader if loader else TorrentLoader(torrent_file.files, os_wrapper)
+        self._pieces = pieces if pieces else self._create_pieces(torrent_file)
+        # missing: not downloaded yet, needed: missing and not downloaded by any peer, occupied: downloaded by a peer
+        self._missing = Bitset.from_bools(not piece.is_downloaded() for piece in self._pieces)
+        self._needed = Bitset.from_bools(piece.is_available_to_download() for piece in self._pieces)
+        self._occupied = self._missing - self._needed
+        self._picker = picker if picker else PiecePicker(len(self._pieces))
+        for index in (Bitset.full(len(self._pieces)) - self._needed).set_indexes():
+            self._picker.remove_piece(index)
+        # stored: the data is on disk, only these pieces are uploaded
+        self._stored = Bitset(len(self._pieces))
+        self._stored_listeners: Set[Callable[[], None]] = set()
+        self._cache = cache if cache else PieceCache(self._read_piece)
+        self._uploaded = 0
+
+    def _create_pieces(self, torrent_file: TorrentFile) -> List[AbstractPiece]:
         parts_with_hash = zip(
             self._loader.get_files_parts_in_pieces(torrent_file.piece_length), torrent_file.pieces
         )
-        self._pieces = pieces
-        if self._pieces:
-            self._pieces = [
-                Piece(parts, ind, hash_) for ind, (parts, hash_) in enumerate(parts_with_hash)
-            ]
-
+        return [Piece(parts, ind, hash_) for ind, (parts, hash_) in enumerate(parts_with_hash)]
 
     async def download(self) -> None:
+        await self._loader.allocate_files(self._allocation)
         await self._loader.listen_to_requests_and_download()
 
-    def store_piece(self, piece: bytes, piece_index: int) -> None:
-        self._pieces[piece_index].download(piece)
+    async def store_piece(self, piece: bytes, piece_index: int, on_stored: Optional[Callable[[], None]] = None) -> None:
+        self._missing.clear(piece_index)
+        self._clear_needed(piece_index)
+        self._picker.piece_completed()
+        # the peer that downloaded the piece stops reading while the disk is behind,
+        # the piece is still written if the peer is gone before the disk had room for it
+        await asyncio.shield(self._queue_piece(piece, piece_index, on_stored))
+
+    async def _queue_piece(self, piece: bytes, piece_index: int, on_stored: Optional[Callable[[], None]]) -> None:
+        queued_at = await self._scheduler.queue_write(len(piece))
+        download = asyncio.ensure_future(self._pieces[piece_index].download(piece))
+        download.add_done_callback(
+            lambda task: self._on_piece_stored(piece_index, len(piece), queued_at, task, on_stored)
+        )
+
+    def _on_piece_stored(self,
+                         index: int,
+                         size: int,
+                         queued_at: float,
+                         task: asyncio.Future,
+                         on_stored: Optional[Callable[[], None]]) -> None:
+        self._scheduler.write_done(size, queued_at)
+        if on_stored:
+            on_stored()
+        if task.cancelled() or task.exception():
+            logger.error(f"piece {index} was not stored, it will be downloaded again")
+            self._pieces[index].reset()
+            self._missing.set(index)
+            # a piece that peers still hold is needed again when the last of them releases it
+            if not self._pieces[index].get_owners_count():
+                self._set_needed(index)
+            return
+        self._stored.set(index)
+        for listener in list(self._stored_listeners):
+            listener()
 
     def get_needed_pieces_indexes(self) -> List[int]:
-        return [
-            ind for ind, piece in enumerate(self._pieces) if piece.is_available_to_download()
-        ]
+        return list(self._missing.set_indexes())
+
+    def get_needed_pieces(self) -> Bitset:
+        return self._missing
+
+    def is_downloading(self) -> bool:
+        return self._missing.any()
 
     def occupy_piece(self, index: int) -> PieceBitfieldInfo:
-        return self._pieces[index].occupy()
+        piece_info = self._pieces[index].occupy()
+        self._clear_needed(index)
+        self._occupied.set(index)
+        return piece_info
+
+    def is_endgame(self) -> bool:
+        return not self._needed.any()
+
+    def pick_piece(self, peer_bitfield: Bitset) -> Optional[PieceBitfieldInfo]:
+        """
+        started pieces that still have blocks nobody requested come first so pieces are completed fast,
+        then a new piece from the picker, and in endgame the piece shared with the fewest peers
+        """
+        started = self._least_shared_piece(
+            index for index in (peer_bitfield & self._occupied & self._missing).set_indexes()
+            if self._pieces[index].has_unrequested_blocks()
+        )
+        if started is not None:
+            return self._pieces[started].share()
+        index = self._picker.pick(peer_bitfield, self._needed)
+        if index is not None:
+            return self.occupy_piece(index)
+        if self.is_endgame():
+            index = self._least_shared_piece((peer_bitfield & self._occupied & self._missing).set_indexes())
+            if index is not None:
+                logger.debug(f"endgame, piece {index} is shared with another peer")
+                return self._pieces[index].share()
+        return None
+
+    def _least_shared_piece(self, indexes: Iterable[int]) -> Optional[int]:
+        return min(indexes, key=lambda index: self._pieces[index].get_owners_count(), default=None)
+
+    def add_peer_availability(self, bitfield: Bitset) -> None:
+        self._picker.add_peer_bitfield(bitfield)
+
+    def remove_peer_availability(self, bitfield: Bitset) -> None:
+        self._picker.remove_peer_bitfield(bitfield)
+
+    def add_piece_availability(self, index: int) -> None:
+        self._picker.add_peer_piece(index)
 
     def unlock_piece(self, index: int):
         self._pieces[index].release()
+        if self._pieces[index].get_owners_count():
+            return
+        self._occupied.clear(index)
+        if self._missing[index]:
+            self._set_needed(index)
+
+    def _set_needed(self, index: int) -> None:
+        self._needed.set(index)
+        self._picker.add_piece(index)
+
+    def _clear_needed(self, index: int) -> None:
+        self._needed.clear(index)
+        self._picker.remove_piece(index)
+
+    def get_downloaded_pieces(self) -> Bitset:
+        return self._stored
+
+    def add_stored_listener(self, listener: Callable[[], None]) -> None:
+        self._stored_listeners.add(listener)
+
+    def remove_stored_listener(self, listener: Callable[[], None]) -> None:
+        self._stored_listeners.discard(listener)
+
+    async def read_block(self, index: int, begin: int, length: int) -> bytes:
+        self._check_block_request(index, begin, length)
+        piece = await self._cache.get(index)
+        self._uploaded += length
+        return memoryview(piece)[begin:begin + length]
+
+    async def get_block_file(self, index: int, begin: int, length: int) -> Optional[FileBlock]:
+        self._check_block_request(index, begin, length)
+        # a piece that is in memory already is cheaper to send from there
+        if index in self._cache:
+            return None
+        block_file = await self._pieces[index].get_block_file(begin, length)
+        if block_file:
+            self._uploaded += length
+        return block_file
+
+    def _check_block_request(self, index: int, begin: int, length: int) -> None:
+        if not 0 <= index < len(self._pieces) or not self._stored[index]:
+            raise InvalidBlockRequestError(f"piece {index} is not downloaded")
+        if begin < 0 or length <= 0 or begin + length > self._pieces[index].get_size():
+            raise InvalidBlockRequestError(f"block {begin}:{begin + length} is out of piece {index}")
+
+    def read_ahead(self, index: int) -> None:
+        if 0 <= index < len(self._pieces) and self._stored[index]:
+            self._cache.read_ahead(index)
+
+    async def _read_piece(self, index: int) -> bytes:
+        return await self._pieces[index].read()
 
     def get_downloaded_uploaded(self) -> Tuple[int, int]:
         downloaded = sum(
             piece.get_size() for piece in self._pieces if piece.is_downloaded()
         )
-        return downloaded, 0
+        return downloaded, self._uploaded
@@ -1,8 +1,11 @@
+import io
 from typing import List
 
+from torrent_client.download.file_loading.allocation_policy import AllocationPolicy
 from torrent_client.download.file_loading.file_loader import AbstractFileLoader
 from torrent_client.download.file_loading.load_request import LoadRequest
 from torrent_client.download.part import Part
+from torrent_client.peer.p2p_net.file_block import FileBlock
 
 
 class FakeFileLoader(AbstractFileLoader):
@@ -10,14 +13,49 @@ class FakeFileLoader(AbstractFileLoader):
         self.parts = parts
         self.start_part_size = None
         self.normal_part_size = None
-        self.run_load = False
+        self.ready_listener = None
+        self.write_pending_calls = 0
+        self.complete = False
+        self.write_error = None
+        self.data = b""
+        self.load_requests = []
+        self.upload_file = io.BytesIO()
+        self.held_upload_blocks = 0
+        self.allocation_policy = None
+        self.missing_space = 0
 
     async def add_load_request(self, load_req: LoadRequest) -> None:
-        pass
+        self.load_requests.append(load_req)
+        if load_req.written:
+            load_req.written.set_result(None)
 
-    async def listen_to_requests_and_download(self) -> None:
-        self.run_load = True
+    async def read(self, beginning_in_file: int, size: int) -> bytes:
+        return self.data[beginning_in_file:beginning_in_file + size]
 
+    async def allocate(self, policy: AllocationPolicy) -> None:
+        self.allocation_policy = policy
+
+    def get_missing_space(self) -> int:
+        return self.missing_space
+
+    def set_ready_listener(self, listener) -> None:
+        self.ready_listener = listener
+
+    async def write_pending(self) -> None:
+        self.write_pending_calls += 1
+        if self.write_error:
+            raise self.write_error
+        self.complete = True
+
+    def is_complete(self) -> bool:
+        return self.complete
+
+    async def get_upload_block(self, beginning_in_file: int, size: int) -> FileBlock:
+        self.held_upload_blocks += 1
+        return FileBlock(self.upload_file, beginning_in_file, size, self._release_upload_block)
+
+    def _release_upload_block(self) -> None:
+        self.held_upload_blocks -= 1
 
     def create_file_parts(self, start_part_size: int, normal_part_size: int) -> List[Part]:
         self.start_part_size = start_part_size
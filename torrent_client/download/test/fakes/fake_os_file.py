@@ -1,9 +1,16 @@
+from typing import BinaryIO, List, Tuple
+
 from torrent_client.download.file_loading.os_file import AbstractOsFile
 
 
 class FakeOsFile(AbstractOsFile):
     def __init__(self):
         self.wrote_data = []
+        # offset and size of every positioned write
+        self.writes: List[Tuple[int, int]] = []
+        self.data = b""
+        self.position = 0
+        self.write_error = None
 
     async def __aenter__(self) -> "AbstractOsFile":
         return self
@@ -14,8 +21,22 @@ class FakeOsFile(AbstractOsFile):
     async def write(self, data: bytes) -> None:
         self.wrote_data.append(data)
 
+    async def write_at(self, offset: int, buffers: List[bytes]) -> None:
+        if self.write_error:
+            raise self.write_error
+        data = b"".join(buffers)
+        self.wrote_data.append(data)
+        self.writes.append((offset, len(data)))
+
     async def read(self, size) -> bytes:
-        pass
+        return self.data[self.position:self.position + size]
+
+    async def read_at(self, offset: int, size: int) -> bytes:
+        return self.data[offset:offset + size]
 
     async def seek(self, pos: int) -> None:
-        pass
+        self.position = pos
+
+    @property
+    def file_object(self) -> BinaryIO:
+        return self
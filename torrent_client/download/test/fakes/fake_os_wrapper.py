@@ -1,3 +1,4 @@
+from torrent_client.download.file_loading.allocation_policy import AllocationPolicy
 from torrent_client.download.file_loading.os_file import AbstractOsFile
 from torrent_client.download.file_loading.os_wrapper import AbstractOsWrapper
 
@@ -7,12 +8,24 @@ class FakeOsWrapper(AbstractOsWrapper):
         self.is_dir_exist_return = False
         self.created_dirs = []
         self.os_files_to_return = []
+        self.created_files = []
+        self.allocated_sizes = {}
+        self.free_space = 2 ** 40
 
     async def makedir(self, path: str) -> None:
         self.created_dirs.append(path)
 
-    def make_file(self, path: str) -> AbstractOsFile:
+    def make_file(self, path: str, size: int) -> AbstractOsFile:
         return self.os_files_to_return.pop()
 
     def is_dir_exist(self, path: str) -> bool:
         return self.is_dir_exist_return
+
+    async def create_file(self, path: str, size: int, policy: AllocationPolicy) -> None:
+        self.created_files.append((path, size, policy))
+
+    def get_allocated_size(self, path: str) -> int:
+        return self.allocated_sizes.get(path, 0)
+
+    def get_free_space(self, path: str) -> int:
+        return self.free_space
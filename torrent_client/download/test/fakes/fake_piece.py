@@ -1,22 +1,63 @@
+import asyncio
+from typing import Optional
+
 from torrent_client.download.piece import AbstractPiece
+from torrent_client.peer.p2p_net.file_block import FileBlock
 from torrent_client.peer.downloading.piece_bitfield_info import PieceBitfieldInfo
 
 
 class FakePiece(AbstractPiece):
+    def __init__(self, index: int = 0, size: int = 0):
+        self.index = index
+        self.size = size
+        self.owners = 0
+        self.downloaded = False
+        self.downloaded_data = None
+        self.info = PieceBitfieldInfo(index, size, b"")
+        self.file = None
+        self.allow_download = asyncio.Event()
+        self.allow_download.set()
+        self.download_error = None
+
     def is_available_to_download(self) -> bool:
-        pass
+        return not self.owners and not self.downloaded
 
     def occupy(self) -> PieceBitfieldInfo:
-        pass
+        self.owners = 1
+        return self.info
+
+    def share(self) -> PieceBitfieldInfo:
+        self.owners += 1
+        return self.info
 
     def release(self) -> None:
-        pass
+        self.owners -= 1
+
+    def get_owners_count(self) -> int:
+        return self.owners
+
+    def has_unrequested_blocks(self) -> bool:
+        return self.info.progress.has_unrequested_blocks()
 
     async def download(self, data: bytes) -> None:
-        pass
+        await self.allow_download.wait()
+        if self.download_error:
+            raise self.download_error
+        self.downloaded = True
+        self.downloaded_data = data
+
+    async def read(self) -> bytes:
+        return self.downloaded_data
+
+    async def get_block_file(self, begin: int, length: int) -> Optional[FileBlock]:
+        return FileBlock(self.file, begin, length) if self.file else None
 
     def get_size(self) -> int:
-        pass
+        return self.size
 
     def is_downloaded(self) -> bool:
-        pass
+        return self.downloaded
+
+    def reset(self) -> None:
+        self.downloaded = False
+        self.info = PieceBitfieldInfo(self.index, self.size, b"")
@@ -1,9 +1,16 @@
 from typing import List
 
+from torrent_client.download.file_loading.allocation_policy import AllocationPolicy
 from torrent_client.download.file_loading.torrent_loader import AbstractTorrentLoader, PieceInPart
 
 
 class FakeTorrentLoader(AbstractTorrentLoader):
+    def __init__(self):
+        self.allocation_policy = None
+
+    async def allocate_files(self, policy: AllocationPolicy) -> None:
+        self.allocation_policy = policy
+
     async def listen_to_requests_and_download(self) -> None:
         pass
 
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+
+import pytest
+
+from torrent_client.download.file_loading.disk_io_scheduler import DiskIoScheduler
+from torrent_client.peer.test.fakes.fake_clock import FakeClock
+
+
+async def settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestUnitDiskIoScheduler:
+    @pytest.mark.asyncio
+    async def test_run_in_worker_thread(self):
+        scheduler = DiskIoScheduler(workers=1)
+        assert await scheduler.run(threading.current_thread) != threading.current_thread()
+
+    @pytest.mark.asyncio
+    async def test_writes_wait_for_room_in_order(self):
+        scheduler = DiskIoScheduler(max_queued_bytes=10)
+        first = await scheduler.queue_write(8)
+        big = asyncio.create_task(scheduler.queue_write(5))
+        await settle()
+        small = asyncio.create_task(scheduler.queue_write(1))
+        await settle()
+        # the small write fits, but waits behind the write that came before it
+        assert not big.done() and not small.done()
+        scheduler.write_done(8, first)
+        await settle()
+        assert big.done() and small.done()
+        assert (scheduler.queue_depth, scheduler.queued_bytes) == (2, 6)
+
+    @pytest.mark.asyncio
+    async def test_write_bigger_than_queue_goes_alone(self):
+        scheduler = DiskIoScheduler(max_queued_bytes=10)
+        queued_at = await scheduler.queue_write(100)
+        waiting = asyncio.create_task(scheduler.queue_write(1))
+        await settle()
+        assert not waiting.done()
+        scheduler.write_done(100, queued_at)
+        await settle()
+        assert waiting.done()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_write_leaves_the_queue(self):
+        scheduler = DiskIoScheduler(max_queued_bytes=10)
+        queued_at = await scheduler.queue_write(10)
+        cancelled = asyncio.create_task(scheduler.queue_write(5))
+        waiting = asyncio.create_task(scheduler.queue_write(5))
+        await settle()
+        cancelled.cancel()
+        await settle()
+        scheduler.write_done(10, queued_at)
+        await settle()
+        assert waiting.done()
+        assert (scheduler.queue_depth, scheduler.queued_bytes) == (1, 5)
+
+    @pytest.mark.asyncio
+    async def test_write_latency(self):
+        clock = FakeClock()
+        scheduler = DiskIoScheduler(clock=clock)
+        assert scheduler.write_latency is None
+        queued_at = await scheduler.queue_write(1)
+        clock.current_time = 2
+        scheduler.write_done(1, queued_at)
+        assert scheduler.write_latency == 2
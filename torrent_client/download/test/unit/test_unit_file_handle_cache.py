@@ -0,0 +1,95 @@
+import pytest
+
+from torrent_client.download.file_loading.file_handle_cache import FileHandleCache
+from torrent_client.download.test.fakes.fake_os_file import FakeOsFile
+from torrent_client.download.test.fakes.fake_os_wrapper import FakeOsWrapper
+
+
+class TrackedOsFile(FakeOsFile):
+    def __init__(self):
+        super().__init__()
+        self.is_open = False
+
+    async def __aenter__(self):
+        self.is_open = True
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.is_open = False
+
+
+def create_os(files_number: int) -> tuple[FakeOsWrapper, list[TrackedOsFile]]:
+    os = FakeOsWrapper()
+    files = [TrackedOsFile() for _ in range(files_number)]
+    os.os_files_to_return = list(reversed(files))
+    return os, files
+
+
+class TestFileHandleCache:
+    @pytest.mark.asyncio
+    async def test_file_opened_on_first_use_and_kept_open(self):
+        os, (file,) = create_os(1)
+        cache = FileHandleCache(2)
+        assert not file.is_open
+        async with cache.open(os, "a", 10) as opened:
+            assert opened is file
+            assert file.is_open
+        assert file.is_open
+        assert cache.open_files == 1
+
+    @pytest.mark.asyncio
+    async def test_same_path_shares_the_handle(self):
+        os, (file,) = create_os(1)
+        cache = FileHandleCache(2)
+        async with cache.open(os, "a", 10) as first:
+            async with cache.open(os, "a", 10) as second:
+                assert first is second is file
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_closed(self):
+        os, files = create_os(3)
+        cache = FileHandleCache(2)
+        for path in ["a", "b"]:
+            async with cache.open(os, path, 10):
+                pass
+        async with cache.open(os, "a", 10):
+            pass
+        async with cache.open(os, "c", 10):
+            pass
+        assert [file.is_open for file in files] == [True, False, True]
+        assert cache.open_files == 2
+
+    @pytest.mark.asyncio
+    async def test_file_in_use_not_closed(self):
+        os, files = create_os(3)
+        cache = FileHandleCache(1)
+        async with cache.open(os, "a", 10):
+            async with cache.open(os, "b", 10):
+                async with cache.open(os, "c", 10):
+                    assert all(file.is_open for file in files)
+            assert files[0].is_open
+        assert cache.open_files == 1
+
+    @pytest.mark.asyncio
+    async def test_acquired_file_closed_after_released(self):
+        os, files = create_os(3)
+        cache = FileHandleCache(1)
+        await cache.acquire(os, "a", 10)
+        async with cache.open(os, "b", 10):
+            pass
+        assert files[0].is_open
+        cache.release("a")
+        await cache.acquire(os, "c", 10)
+        assert [file.is_open for file in files] == [False, False, True]
+        assert cache.open_files == 1
+
+    @pytest.mark.asyncio
+    async def test_close_all(self):
+        os, files = create_os(2)
+        cache = FileHandleCache(2)
+        for path in ["a", "b"]:
+            async with cache.open(os, path, 10):
+                pass
+        await cache.close()
+        assert not any(file.is_open for file in files)
+        assert cache.open_files == 0
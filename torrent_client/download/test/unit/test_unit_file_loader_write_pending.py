@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from torrent_client.download.file_loading.file_handle_cache import FileHandleCache
+from torrent_client.download.file_loading.file_loader import FileLoader
+from torrent_client.download.file_loading.load_request import LoadRequest
+from torrent_client.download.test.fakes.fake_os_file import FakeOsFile
+from torrent_client.download.test.fakes.fake_os_wrapper import FakeOsWrapper
+from torrent_client.torrent_file.file_to_download import FileToDownload
+
+
+def create_loader(file_length: int, file: FakeOsFile = None) -> FileLoader:
+    os = FakeOsWrapper()
+    if file:
+        os.os_files_to_return = [file]
+    return FileLoader(FileToDownload(file_length, []), os, FileHandleCache())
+
+
+class TestFileLoaderWritePending:
+    @pytest.mark.asyncio
+    async def test_file_not_opened_before_a_write(self):
+        f = create_loader(10)
+        ready = []
+        f.set_ready_listener(ready.append)
+        assert not ready
+        assert not f.is_complete()
+
+    @pytest.mark.asyncio
+    async def test_first_request_makes_the_file_ready_once(self):
+        f = create_loader(10)
+        ready = []
+        f.set_ready_listener(ready.append)
+        await f.add_load_request(LoadRequest(0, b"test1", 5))
+        await f.add_load_request(LoadRequest(5, b"test2", 5))
+        assert ready == [f]
+
+    @pytest.mark.asyncio
+    async def test_sending_one_full_request(self):
+        file = FakeOsFile()
+        f = create_loader(10, file)
+        await f.add_load_request(LoadRequest(0, b"test", 10))
+        await f.write_pending()
+        assert file.wrote_data[0] == b"test"
+        assert f.is_complete()
+
+    @pytest.mark.asyncio
+    async def test_sending_two_requests_full_file(self):
+        file = FakeOsFile()
+        f = create_loader(10, file)
+        await f.add_load_request(LoadRequest(0, b"test1", 5))
+        await f.write_pending()
+        assert not f.is_complete()
+        await f.add_load_request(LoadRequest(5, b"test2", 5))
+        await f.write_pending()
+        assert file.wrote_data == [b"test1", b"test2"]
+        assert f.is_complete()
+
+    @pytest.mark.asyncio
+    async def test_ready_again_after_written(self):
+        f = create_loader(10, FakeOsFile())
+        ready = []
+        f.set_ready_listener(ready.append)
+        await f.add_load_request(LoadRequest(0, b"test1", 5))
+        await f.write_pending()
+        await f.add_load_request(LoadRequest(5, b"test2", 5))
+        assert ready == [f, f]
+
+    @pytest.mark.asyncio
+    async def test_waiting_adjacent_requests_are_written_together(self):
+        file = FakeOsFile()
+        f = create_loader(12, file)
+        written = [asyncio.get_running_loop().create_future() for _ in range(4)]
+        await f.add_load_request(LoadRequest(3, b"def", 3, written[0]))
+        await f.add_load_request(LoadRequest(9, b"jkl", 3, written[1]))
+        await f.add_load_request(LoadRequest(0, b"abc", 3, written[2]))
+        await f.add_load_request(LoadRequest(6, b"ghi", 3, written[3]))
+        await f.write_pending()
+        assert file.writes == [(0, 12)]
+        assert file.wrote_data == [b"abcdefghijkl"]
+        assert all(future.done() for future in written)
+        assert f.is_complete()
+
+    @pytest.mark.asyncio
+    async def test_requests_with_a_gap_are_written_apart(self):
+        file = FakeOsFile()
+        f = create_loader(9, file)
+        await f.add_load_request(LoadRequest(6, b"ghi", 3))
+        await f.add_load_request(LoadRequest(0, b"abc", 3))
+        await f.write_pending()
+        assert file.writes == [(0, 3), (6, 3)]
+        await f.add_load_request(LoadRequest(3, b"def", 3))
+        await f.write_pending()
+        assert file.writes == [(0, 3), (6, 3), (3, 3)]
+        assert f.is_complete()
+
+    @pytest.mark.asyncio
+    async def test_read_from_the_shared_handle(self):
+        file = FakeOsFile()
+        file.data = b"abcdefghij"
+        f = create_loader(10, file)
+        await f.add_load_request(LoadRequest(0, b"abcde", 5))
+        await f.write_pending()
+        assert await f.read(2, 3) == b"cde"
+
+    @pytest.mark.asyncio
+    async def test_failed_write_fails_only_its_requests(self):
+        file = FakeOsFile()
+        file.write_error = OSError("no space left on device")
+        f = create_loader(9, file)
+        written = [asyncio.get_running_loop().create_future() for _ in range(2)]
+        await f.add_load_request(LoadRequest(0, b"abc", 3, written[0]))
+        await f.add_load_request(LoadRequest(6, b"ghi", 3, written[1]))
+        await f.write_pending()
+        for future in written:
+            with pytest.raises(OSError):
+                await future
+        assert not f.is_complete()
+        # the pieces are downloaded again and their new requests are written
+        file.write_error = None
+        rewritten = asyncio.get_running_loop().create_future()
+        await f.add_load_request(LoadRequest(0, b"abc", 3, rewritten))
+        await f.add_load_request(LoadRequest(3, b"def", 3))
+        await f.add_load_request(LoadRequest(6, b"ghi", 3))
+        await f.write_pending()
+        await rewritten
+        assert file.wrote_data == [b"abcdefghi"]
+        assert f.is_complete()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_write_cancels_the_waiting_requests(self):
+        file = FakeOsFile()
+        file.write_error = asyncio.CancelledError()
+        f = create_loader(6, file)
+        written = [asyncio.get_running_loop().create_future() for _ in range(2)]
+        await f.add_load_request(LoadRequest(0, b"abc", 3, written[0]))
+        await f.add_load_request(LoadRequest(3, b"def", 3, written[1]))
+        with pytest.raises(asyncio.CancelledError):
+            await f.write_pending()
+        assert all(future.cancelled() for future in written)
+
+    @pytest.mark.asyncio
+    async def test_data_written_again_counted_once(self):
+        file = FakeOsFile()
+        f = create_loader(9, file)
+        await f.add_load_request(LoadRequest(0, b"abc", 3))
+        await f.write_pending()
+        await f.add_load_request(LoadRequest(0, b"abc", 3))
+        await f.add_load_request(LoadRequest(6, b"ghi", 3))
+        await f.write_pending()
+        assert not f.is_complete()
+        await f.add_load_request(LoadRequest(3, b"def", 3))
+        await f.write_pending()
+        assert f.is_complete()
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from torrent_client.download.file_loading.file_handle_cache import FileHandleCache
+from torrent_client.download.file_loading.mmap_os_wrapper import MmapOsWrapper
+
+
+class TestUnitMmapOsFile:
+    @pytest.mark.asyncio
+    async def test_new_file_is_sized(self, tmp_path):
+        path = str(tmp_path / "file")
+        async with MmapOsWrapper().make_file(path, 100):
+            assert os.path.getsize(path) == 100
+
+    @pytest.mark.asyncio
+    async def test_write_and_read(self, tmp_path):
+        path = str(tmp_path / "file")
+        async with MmapOsWrapper().make_file(path, 10) as file:
+            await file.write_at(2, [b"ab", memoryview(b"cd")])
+            await file.seek(1)
+            await file.write(b"x")
+            await file.seek(1)
+            assert bytes(await file.read(5)) == b"xabcd"
+        with open(path, "rb") as written:
+            assert written.read() == b"\0xabcd" + bytes(4)
+
+    @pytest.mark.asyncio
+    async def test_open_handles_share_the_mapping(self, tmp_path):
+        path = str(tmp_path / "file")
+        wrapper = MmapOsWrapper()
+        async with wrapper.make_file(path, 10) as writer:
+            async with wrapper.make_file(path, 10) as reader:
+                await writer.write_at(0, [b"abc"])
+                data = await reader.read(3)
+            # the writer keeps the mapping open
+            assert bytes(data) == b"abc"
+            assert writer.file_object.fileno() >= 0
+
+    @pytest.mark.asyncio
+    async def test_read_view_outlives_the_file(self, tmp_path):
+        path = str(tmp_path / "file")
+        async with MmapOsWrapper().make_file(path, 10) as file:
+            await file.write_at(0, [b"abc"])
+            data = await file.read(3)
+        assert bytes(data) == b"abc"
+
+    @pytest.mark.asyncio
+    async def test_read_at_is_a_view_that_outlives_the_cache(self, tmp_path):
+        path = str(tmp_path / "file")
+        cache = FileHandleCache(1)
+        wrapper = MmapOsWrapper()
+        async with cache.open(wrapper, path, 10) as file:
+            await file.write_at(0, [b"abc"])
+            data = await file.read_at(1, 2)
+        async with cache.open(wrapper, str(tmp_path / "other"), 10):
+            pass
+        await cache.close()
+        assert isinstance(data, memoryview)
+        assert bytes(data) == b"bc"
+
+    @pytest.mark.asyncio
+    async def test_empty_file(self, tmp_path):
+        path = str(tmp_path / "file")
+        async with MmapOsWrapper().make_file(path, 0) as file:
+            assert bytes(await file.read(10)) == b""
+        assert os.path.getsize(path) == 0
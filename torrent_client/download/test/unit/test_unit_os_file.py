@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from torrent_client.download.file_loading.os_file import OsFile, _skip_written
+
+
+class TestUnitOsFile:
+    @pytest.mark.asyncio
+    async def test_write_at_does_not_move_position(self, tmp_path):
+        path = tmp_path / "file"
+        path.write_bytes(bytes(10))
+        async with OsFile(str(path)) as file:
+            await file.seek(1)
+            await file.write_at(4, [b"ab", bytearray(b"cd"), memoryview(b"e")])
+            assert await file.read(2) == bytes(2)
+        assert path.read_bytes() == bytes(4) + b"abcde" + bytes(1)
+
+    def test_skip_written_in_the_middle_of_a_buffer(self):
+        views = [memoryview(b"abc"), memoryview(b"def"), memoryview(b"g")]
+        assert [bytes(view) for view in _skip_written(views, 4)] == [b"ef", b"g"]
+        assert _skip_written(views, 7) == []
+
+    @pytest.mark.asyncio
+    async def test_without_positioned_io(self, tmp_path, monkeypatch):
+        for name in ["pread", "pwrite", "pwritev"]:
+            monkeypatch.delattr(os, name, raising=False)
+        path = tmp_path / "file"
+        path.write_bytes(bytes(10))
+        async with OsFile(str(path)) as file:
+            await file.write_at(4, [b"ab", memoryview(b"cde")])
+            assert await file.read_at(3, 4) == b"\x00abc"
+        assert path.read_bytes() == bytes(4) + b"abcde" + bytes(1)
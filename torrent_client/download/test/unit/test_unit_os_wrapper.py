@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from torrent_client.download.file_loading.allocation_policy import AllocationPolicy
+from torrent_client.download.file_loading.os_wrapper import OsWrapper
+
+FILE_SIZE = 2 ** 20
+
+
+class TestUnitOsWrapper:
+    @pytest.mark.asyncio
+    async def test_create_sparse_file(self, tmp_path):
+        path = str(tmp_path / "file")
+        wrapper = OsWrapper()
+        await wrapper.create_file(path, FILE_SIZE, AllocationPolicy.Sparse)
+        assert os.path.getsize(path) == FILE_SIZE
+        assert wrapper.get_allocated_size(path) < FILE_SIZE
+
+    @pytest.mark.asyncio
+    async def test_create_preallocated_file(self, tmp_path):
+        path = str(tmp_path / "file")
+        wrapper = OsWrapper()
+        await wrapper.create_file(path, FILE_SIZE, AllocationPolicy.Preallocate)
+        assert os.path.getsize(path) == FILE_SIZE
+        if hasattr(os, "posix_fallocate"):
+            assert wrapper.get_allocated_size(path) >= FILE_SIZE
+
+    @pytest.mark.asyncio
+    async def test_existing_data_is_kept(self, tmp_path):
+        path = tmp_path / "file"
+        path.write_bytes(b"data")
+        for policy in AllocationPolicy:
+            await OsWrapper().create_file(str(path), FILE_SIZE, policy)
+            assert path.read_bytes()[:4] == b"data"
+            assert os.path.getsize(path) == FILE_SIZE
+
+    def test_free_space_of_missing_directory(self, tmp_path):
+        wrapper = OsWrapper()
+        assert wrapper.get_free_space(str(tmp_path / "a" / "b")) > 0
+        assert wrapper.get_allocated_size(str(tmp_path / "a")) == 0
@@ -0,0 +1,34 @@
+import pytest
+
+from torrent_client.download.part import Part
+from torrent_client.download.piece import Piece
+from torrent_client.download.test.fakes.fake_file_loader import FakeFileLoader
+
+
+class TestUnitPieceBlockFile:
+    @pytest.mark.asyncio
+    async def test_block_in_one_file(self):
+        first, second = FakeFileLoader([]), FakeFileLoader([])
+        piece = Piece([Part(first, 10, 90), Part(second, 20, 0)], 0, b"")
+        block_file = await piece.get_block_file(2, 8)
+        assert (block_file.file, block_file.offset, block_file.size) == (first.upload_file, 92, 8)
+        block_file = await piece.get_block_file(15, 5)
+        assert (block_file.file, block_file.offset, block_file.size) == (second.upload_file, 5, 5)
+        # the file is held open until the block was sent
+        assert second.held_upload_blocks == 1
+        block_file.release()
+        block_file.release()
+        assert second.held_upload_blocks == 0
+
+    @pytest.mark.asyncio
+    async def test_block_split_between_files(self):
+        first, second = FakeFileLoader([]), FakeFileLoader([])
+        piece = Piece([Part(first, 10, 90), Part(second, 20, 0)], 0, b"")
+        assert await piece.get_block_file(5, 10) is None
+
+    @pytest.mark.asyncio
+    async def test_read_piece_from_files(self):
+        first, second = FakeFileLoader([]), FakeFileLoader([])
+        first.data, second.data = b"xxab", b"cdyy"
+        piece = Piece([Part(first, 2, 2), Part(second, 2, 0)], 0, b"")
+        assert await piece.read() == b"abcd"
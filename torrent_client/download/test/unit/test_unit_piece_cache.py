@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from torrent_client.download.piece_cache import PieceCache
+
+
+class PiecesDisk:
+    def __init__(self, piece_size: int):
+        self.piece_size = piece_size
+        self.reads = []
+
+    async def read_piece(self, index: int) -> bytes:
+        self.reads.append(index)
+        await asyncio.sleep(0)
+        return bytes([index]) * self.piece_size
+
+
+class TestUnitPieceCache:
+    @pytest.mark.asyncio
+    async def test_piece_is_read_once(self):
+        disk = PiecesDisk(4)
+        cache = PieceCache(disk.read_piece, 16)
+        pieces = await asyncio.gather(cache.get(1), cache.get(1))
+        assert pieces == [bytes([1]) * 4] * 2
+        assert await cache.get(1) == bytes([1]) * 4
+        assert disk.reads == [1]
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_piece_is_evicted(self):
+        disk = PiecesDisk(4)
+        cache = PieceCache(disk.read_piece, 8)
+        await cache.get(0)
+        await cache.get(1)
+        await cache.get(0)
+        await cache.get(2)
+        assert 0 in cache and 2 in cache and 1 not in cache
+        assert cache.size == 8
+
+    @pytest.mark.asyncio
+    async def test_piece_bigger_than_cache_is_not_kept(self):
+        disk = PiecesDisk(16)
+        cache = PieceCache(disk.read_piece, 8)
+        assert await cache.get(0) == bytes(16)
+        assert len(cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_read_ahead(self):
+        disk = PiecesDisk(4)
+        cache = PieceCache(disk.read_piece, 16)
+        cache.read_ahead(3)
+        cache.read_ahead(3)
+        await asyncio.sleep(0.01)
+        assert 3 in cache
+        await cache.get(3)
+        assert disk.reads == [3]
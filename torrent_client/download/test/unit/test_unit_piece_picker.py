@@ -0,0 +1,99 @@
+import random
+
+from torrent_client.download.piece_picker import PiecePicker, RANDOM_FIRST_PIECES
+from torrent_client.peer.downloading.bitset import Bitset
+
+
+def create_picker(pieces_count: int, completed: int = RANDOM_FIRST_PIECES) -> PiecePicker:
+    picker = PiecePicker(pieces_count, random.Random(0))
+    for _ in range(completed):
+        picker.piece_completed()
+    return picker
+
+
+class TestUnitPiecePicker:
+    def test_availability_from_bitfields_and_have(self):
+        picker = create_picker(4)
+        picker.add_peer_bitfield(Bitset.from_indexes(4, [0, 1]))
+        picker.add_peer_bitfield(Bitset.from_indexes(4, [1, 2]))
+        picker.add_peer_piece(1)
+        picker.add_peer_piece(3)
+        assert [picker.availability(index) for index in range(4)] == [1, 3, 1, 1]
+
+    def test_remove_peer_bitfield(self):
+        picker = create_picker(3)
+        first, second = Bitset.from_indexes(3, [0, 1]), Bitset.from_indexes(3, [1, 2])
+        picker.add_peer_bitfield(first)
+        picker.add_peer_bitfield(second)
+        picker.remove_peer_bitfield(first)
+        assert [picker.availability(index) for index in range(3)] == [0, 1, 1]
+        picker.remove_peer_bitfield(second)
+        assert [picker.availability(index) for index in range(3)] == [0, 0, 0]
+
+    def test_pick_rarest(self):
+        picker = create_picker(4)
+        peer = Bitset.full(4)
+        picker.add_peer_bitfield(peer)
+        picker.add_peer_bitfield(Bitset.from_indexes(4, [0, 1, 3]))
+        assert picker.pick(peer, Bitset.full(4)) == 2
+
+    def test_pick_only_needed_pieces_peer_has(self):
+        picker = create_picker(4)
+        peer = Bitset.from_indexes(4, [1, 2])
+        picker.add_peer_bitfield(peer)
+        assert picker.pick(peer, Bitset.from_indexes(4, [0, 2])) == 2
+        assert picker.pick(peer, Bitset.from_indexes(4, [0, 3])) is None
+
+    def test_random_tie_breaking(self):
+        picker = create_picker(100)
+        peer = Bitset.full(100)
+        picker.add_peer_bitfield(peer)
+        picks = {picker.pick(peer, Bitset.full(100)) for _ in range(20)}
+        assert len(picks) > 1
+
+    def test_random_first_ignore_rarity(self):
+        picker = create_picker(100, completed=0)
+        peer = Bitset.full(100)
+        picker.add_peer_bitfield(peer)
+        picker.add_peer_bitfield(Bitset.from_indexes(100, range(1, 100)))
+        picks = {picker.pick(peer, Bitset.full(100)) for _ in range(20)}
+        assert picks != {0}
+
+    def test_pick_uniform_among_rarest(self):
+        picker = create_picker(100)
+        peer = Bitset.from_indexes(100, [10, 11])
+        picker.add_peer_bitfield(Bitset.full(100))
+        picks = [picker.pick(peer, Bitset.full(100)) for _ in range(1000)]
+        assert 400 < picks.count(10) < 600
+        assert picks.count(10) + picks.count(11) == 1000
+
+    def test_rarest_bucket_without_peer_pieces_is_skipped(self):
+        picker = create_picker(4)
+        picker.add_peer_bitfield(Bitset.full(4))
+        picker.add_peer_bitfield(Bitset.from_indexes(4, [1, 2, 3]))
+        picker.add_peer_piece(3)
+        peer = Bitset.from_indexes(4, [1, 3])
+        assert picker.pick(peer, Bitset.full(4)) == 1
+        picker.remove_peer_bitfield(Bitset.full(4))
+        assert [picker.availability(index) for index in range(4)] == [0, 1, 1, 2]
+        assert picker.pick(peer, Bitset.from_indexes(4, [0, 3])) == 3
+
+    def test_removed_piece_keeps_its_availability(self):
+        picker = create_picker(3)
+        picker.add_peer_bitfield(Bitset.full(3))
+        picker.remove_piece(0)
+        picker.add_peer_piece(0)
+        picker.add_peer_piece(0)
+        assert picker.availability(0) == 3
+        picker.add_piece(0)
+        assert picker.pick(Bitset.full(3), Bitset.full(3)) in (1, 2)
+        picker.remove_piece(1)
+        picker.remove_piece(2)
+        assert picker.pick(Bitset.full(3), Bitset.from_indexes(3, [0])) == 0
+
+    def test_few_candidates_picked_rarest_first(self):
+        picker = create_picker(100)
+        picker.add_peer_bitfield(Bitset.full(100))
+        picker.add_peer_bitfield(Bitset.from_indexes(100, range(1, 100)))
+        peer = Bitset.from_indexes(100, [0, 50])
+        assert picker.pick(peer, Bitset.full(100)) == 0
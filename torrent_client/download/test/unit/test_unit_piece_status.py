@@ -1,5 +1,6 @@
 import pytest
 
+from torrent_client.download.exceptions import PieceAllReadyOccupiedError, UnoccupiedPieceError
 from torrent_client.download.piece import Piece
 
 
@@ -19,3 +20,18 @@ class TestUnitPieceStatus:
         p.release()
         assert p.is_available_to_download()
 
+
+    @pytest.mark.asyncio
+    async def test_share_piece(self):
+        p = Piece([], 0, b"")
+        with pytest.raises(UnoccupiedPieceError):
+            p.share()
+        info = p.occupy()
+        with pytest.raises(PieceAllReadyOccupiedError):
+            p.occupy()
+        assert p.share() is info
+        assert p.get_owners_count() == 2
+        p.release()
+        p.release()
+        assert p.is_available_to_download()
+        assert p.occupy() is info
@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.download.file_loading.disk_io_scheduler import DiskIoScheduler
+from torrent_client.download.storage_manager import StorageManager
+from torrent_client.download.test.fakes.fake_piece import FakePiece
+from torrent_client.download.test.fakes.fake_torrent_loader import FakeTorrentLoader
+from torrent_client.peer.downloading.bitset import Bitset
+from torrent_client.peer.exceptions import InvalidBlockRequestError
+
+
+def create_storage_manager(pieces_count: int, piece_size: int = 2 * BLOCK_SIZE, scheduler: DiskIoScheduler = None):
+    pieces = [FakePiece(index, piece_size) for index in range(pieces_count)]
+    return StorageManager(loader=FakeTorrentLoader(), pieces=pieces, scheduler=scheduler), pieces
+
+
+def request_all_blocks(info) -> None:
+    while info.progress.request_block(()) is not None:
+        pass
+
+
+class TestUnitStorageManager:
+    def test_pick_occupies_piece(self):
+        manager, pieces = create_storage_manager(2)
+        info = manager.pick_piece(Bitset.from_bools([False, True]))
+        assert info.index == 1
+        assert pieces[1].owners == 1
+        assert manager.get_needed_pieces() == Bitset.full(2)
+
+    def test_join_piece_with_unrequested_blocks(self):
+        manager, pieces = create_storage_manager(2)
+        info = manager.pick_piece(Bitset.from_bools([True, False]))
+        info.progress.request_block(())
+        assert manager.pick_piece(Bitset.full(2)) is info
+        assert pieces[0].owners == 2
+        assert not manager.is_endgame()
+
+    def test_start_new_piece_when_blocks_are_requested(self):
+        manager, pieces = create_storage_manager(2)
+        request_all_blocks(manager.pick_piece(Bitset.from_bools([True, False])))
+        assert manager.pick_piece(Bitset.from_bools([True, False])) is None
+        assert manager.pick_piece(Bitset.full(2)).index == 1
+        assert manager.is_endgame()
+
+    def test_endgame_shares_least_shared_piece(self):
+        manager, pieces = create_storage_manager(2)
+        request_all_blocks(manager.pick_piece(Bitset.from_bools([True, False])))
+        request_all_blocks(manager.pick_piece(Bitset.from_bools([False, True])))
+        info = manager.pick_piece(Bitset.from_bools([True, False]))
+        assert info is pieces[0].info
+        assert manager.pick_piece(Bitset.full(2)).index == 1
+        assert [piece.owners for piece in pieces] == [2, 2]
+
+    def test_unlock_piece(self):
+        manager, pieces = create_storage_manager(1)
+        info = manager.pick_piece(Bitset.full(1))
+        request_all_blocks(info)
+        manager.pick_piece(Bitset.full(1))
+        manager.unlock_piece(0)
+        assert manager.pick_piece(Bitset.full(1)).index == 0
+        manager.unlock_piece(0)
+        manager.unlock_piece(0)
+        assert pieces[0].is_available_to_download()
+        assert manager.pick_piece(Bitset.full(1)).index == 0
+
+    @pytest.mark.asyncio
+    async def test_picker_holds_only_needed_pieces(self):
+        manager, pieces = create_storage_manager(3)
+
+        def pickable():
+            return sorted(index for bucket in manager._picker._buckets for index in bucket)
+
+        manager.pick_piece(Bitset.from_bools([True, False, False]))
+        await manager.store_piece(b"data", 1)
+        assert pickable() == [2]
+        manager.unlock_piece(0)
+        assert pickable() == [0, 2]
+
+    @pytest.mark.asyncio
+    async def test_stored_piece_is_not_shared(self):
+        manager, pieces = create_storage_manager(1)
+        request_all_blocks(manager.pick_piece(Bitset.full(1)))
+        manager.pick_piece(Bitset.full(1))
+        await manager.store_piece(b"data", 0)
+        assert not manager.is_downloading()
+        assert manager.pick_piece(Bitset.full(1)) is None
+        manager.unlock_piece(0)
+        manager.unlock_piece(0)
+        assert manager.pick_piece(Bitset.full(1)) is None
+        assert manager.get_needed_pieces_indexes() == []
+
+    @pytest.mark.asyncio
+    async def test_on_stored_called_after_the_write(self):
+        manager, pieces = create_storage_manager(1, 4)
+        pieces[0].allow_download.clear()
+        stored = []
+        piece = bytearray(b"data")
+        await manager.store_piece(piece, 0, lambda: stored.append(True))
+        await asyncio.sleep(0.01)
+        assert not stored
+        pieces[0].allow_download.set()
+        await asyncio.sleep(0.01)
+        assert stored
+        assert pieces[0].downloaded_data is piece
+
+    @pytest.mark.asyncio
+    async def test_stored_listeners_called_when_piece_is_stored(self):
+        manager, pieces = create_storage_manager(2, 4)
+        stored = []
+        listener = lambda: stored.append(manager.get_downloaded_pieces().count())
+        manager.add_stored_listener(listener)
+        await manager.store_piece(b"data", 0)
+        await asyncio.sleep(0.01)
+        assert stored == [1]
+        manager.remove_stored_listener(listener)
+        await manager.store_piece(b"data", 1)
+        await asyncio.sleep(0.01)
+        assert stored == [1]
+
+    @pytest.mark.asyncio
+    async def test_piece_downloaded_again_when_not_stored(self):
+        manager, pieces = create_storage_manager(2)
+        request_all_blocks(manager.pick_piece(Bitset.from_bools([True, False])))
+        pieces[0].download_error = OSError("no space left on device")
+        await manager.store_piece(b"data", 0)
+        await asyncio.sleep(0.01)
+        assert not pieces[0].is_downloaded()
+        assert manager.get_downloaded_pieces() == Bitset(2)
+        assert manager.get_needed_pieces_indexes() == [0, 1]
+        manager.unlock_piece(0)
+        info = manager.pick_piece(Bitset.from_bools([True, False]))
+        assert info.index == 0 and info.progress.has_unrequested_blocks()
+
+    @pytest.mark.asyncio
+    async def test_upload_block_of_stored_piece(self):
+        manager, pieces = create_storage_manager(2, 4)
+        with pytest.raises(InvalidBlockRequestError):
+            await manager.read_block(0, 0, 2)
+        await manager.store_piece(b"data", 0)
+        await asyncio.sleep(0.01)
+        assert manager.get_downloaded_pieces() == Bitset.from_bools([True, False])
+        assert bytes(await manager.read_block(0, 1, 2)) == b"at"
+        with pytest.raises(InvalidBlockRequestError):
+            await manager.read_block(0, 3, 2)
+        assert manager.get_downloaded_uploaded() == (4, 2)
+
+    @pytest.mark.asyncio
+    async def test_send_block_from_file_unless_cached(self):
+        manager, pieces = create_storage_manager(1, 4)
+        pieces[0].file = object()
+        await manager.store_piece(b"data", 0)
+        await asyncio.sleep(0.01)
+        block_file = await manager.get_block_file(0, 1, 2)
+        assert (block_file.file, block_file.offset, block_file.size) == (pieces[0].file, 1, 2)
+        await manager.read_block(0, 0, 4)
+        assert await manager.get_block_file(0, 0, 4) is None
+
+    @pytest.mark.asyncio
+    async def test_store_waits_while_disk_is_behind(self):
+        scheduler = DiskIoScheduler(max_queued_bytes=6)
+        manager, pieces = create_storage_manager(2, 4, scheduler)
+        pieces[0].allow_download.clear()
+        await manager.store_piece(b"data", 0)
+        store = asyncio.create_task(manager.store_piece(b"data", 1))
+        await asyncio.sleep(0.01)
+        assert not store.done()
+        assert scheduler.queue_depth == 1 and scheduler.queued_bytes == 4
+        pieces[0].allow_download.set()
+        await asyncio.wait_for(store, 1)
+        await asyncio.sleep(0.01)
+        assert scheduler.queued_bytes == 0
+        assert manager.get_downloaded_pieces() == Bitset.full(2)
@@ -1,14 +1,72 @@
+import asyncio
+
 import pytest
 
+from torrent_client.download.exceptions import NotEnoughSpaceError
+from torrent_client.download.file_loading.allocation_policy import AllocationPolicy
 from torrent_client.download.file_loading.torrent_loader import TorrentLoader
 from torrent_client.download.test.fakes.fake_file_loader import FakeFileLoader
+from torrent_client.download.test.fakes.fake_os_wrapper import FakeOsWrapper
 
 
 class TestUnitTorrentLoaderLoad:
     @pytest.mark.asyncio
     async def test_run_loaders(self):
         files = [FakeFileLoader([]) for _ in range(5)]
+        t_loader = TorrentLoader(files_loaders=files, workers=2)
+        task = asyncio.create_task(t_loader.listen_to_requests_and_download())
+        for file in files:
+            file.ready_listener(file)
+        await asyncio.wait_for(task, 1)
+        for file in files:
+            assert file.write_pending_calls == 1
+
+    @pytest.mark.asyncio
+    async def test_still_running_if_a_file_is_not_complete(self):
+        files = [FakeFileLoader([]) for _ in range(3)]
+        t_loader = TorrentLoader(files_loaders=files)
+        task = asyncio.create_task(t_loader.listen_to_requests_and_download())
+        for file in files[:2]:
+            file.ready_listener(file)
+        await asyncio.sleep(0.01)
+        assert not task.done()
+        files[2].ready_listener(files[2])
+        await asyncio.wait_for(task, 1)
+
+    @pytest.mark.asyncio
+    async def test_complete_files_are_not_waited_for(self):
+        files = [FakeFileLoader([]) for _ in range(3)]
+        for file in files:
+            file.complete = True
         t_loader = TorrentLoader(files_loaders=files)
-        await t_loader.listen_to_requests_and_download()
+        await asyncio.wait_for(t_loader.listen_to_requests_and_download(), 1)
+
+    @pytest.mark.asyncio
+    async def test_write_error_stops_the_loader(self):
+        files = [FakeFileLoader([]) for _ in range(2)]
+        files[0].write_error = OSError("disk is gone")
+        t_loader = TorrentLoader(files_loaders=files)
+        task = asyncio.create_task(t_loader.listen_to_requests_and_download())
+        files[0].ready_listener(files[0])
+        with pytest.raises(OSError):
+            await asyncio.wait_for(task, 1)
+
+    @pytest.mark.asyncio
+    async def test_allocate_all_files(self):
+        files = [FakeFileLoader([]) for _ in range(3)]
+        t_loader = TorrentLoader(os=FakeOsWrapper(), files_loaders=files)
+        await t_loader.allocate_files(AllocationPolicy.Preallocate)
+        for file in files:
+            assert file.allocation_policy == AllocationPolicy.Preallocate
+
+    @pytest.mark.asyncio
+    async def test_not_enough_space(self):
+        files = [FakeFileLoader([]) for _ in range(3)]
         for file in files:
-            assert file.run_load
+            file.missing_space = 10
+        os = FakeOsWrapper()
+        os.free_space = 29
+        t_loader = TorrentLoader(os=os, files_loaders=files)
+        with pytest.raises(NotEnoughSpaceError):
+            await t_loader.allocate_files(AllocationPolicy.Sparse)
+        assert all(file.allocation_policy is None for file in files)
@@ -0,0 +1,114 @@
+import re
+from typing import Iterable, Iterator, Optional
+
+# in the wire format the high bit of a byte is the lowest piece index, bit i of a byte is piece 8 * byte + i here
+_REVERSED_BITS = bytes(int(f"{byte:08b}"[::-1], 2) for byte in range(256))
+# the bytes with set bits are found by the regex engine, so the empty parts of a sparse set cost little
+_NON_ZERO_BYTE = re.compile(rb"[^\x00]")
+_SET_BITS_IN_BYTE = [tuple(bit for bit in range(8) if (byte >> bit) & 1) for byte in range(256)]
+
+
+class Bitset:
+    """
+    bits kept in a bytearray, so a single bit is read or changed in O(1).
+    the operations on whole sets go through an int, which does them a machine word at a time
+    """
+    __slots__ = ("_size", "_bits")
+
+    def __init__(self, size: int):
+        self._size = size
+        self._bits = bytearray((size + 7) // 8)
+
+    @classmethod
+    def _from_int(cls, size: int, value: int) -> "Bitset":
+        bitset = cls(size)
+        bitset._bits[:] = (value & ((1 << size) - 1)).to_bytes(len(bitset._bits), "little")
+        return bitset
+
+    def _to_int(self) -> int:
+        return int.from_bytes(self._bits, "little")
+
+    @classmethod
+    def full(cls, size: int) -> "Bitset":
+        return cls._from_int(size, (1 << size) - 1)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, size: int) -> "Bitset":
+        return cls._from_int(size, int.from_bytes(bytes(data).translate(_REVERSED_BITS), "little"))
+
+    @classmethod
+    def from_bools(cls, bits: Iterable[bool]) -> "Bitset":
+        bits = list(bits)
+        return cls.from_indexes(len(bits), (index for index, bit in enumerate(bits) if bit))
+
+    @classmethod
+    def from_indexes(cls, size: int, indexes: Iterable[int]) -> "Bitset":
+        bitset = cls(size)
+        for index in indexes:
+            bitset.set(index)
+        return bitset
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._bits).translate(_REVERSED_BITS)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _check_index(self, index: int) -> None:
+        if not 0 <= index < self._size:
+            raise IndexError(f"bit {index} is out of a bitset of {self._size} bits")
+
+    def __getitem__(self, index: int) -> bool:
+        self._check_index(index)
+        return bool(self._bits[index >> 3] & (1 << (index & 7)))
+
+    def set(self, index: int) -> None:
+        self._check_index(index)
+        self._bits[index >> 3] |= 1 << (index & 7)
+
+    def clear(self, index: int) -> None:
+        self._check_index(index)
+        self._bits[index >> 3] &= ~(1 << (index & 7)) & 0xff
+
+    def count(self) -> int:
+        return self._to_int().bit_count()
+
+    def any(self) -> bool:
+        return self._bits.count(0) != len(self._bits)
+
+    def first_set(self, start: int = 0) -> Optional[int]:
+        """:return the lowest set index that is not lower than start"""
+        if start >= self._size:
+            return None
+        value = int.from_bytes(self._bits[start >> 3:], "little") >> (start & 7)
+        if not value:
+            return None
+        return (value & -value).bit_length() - 1 + start
+
+    def set_indexes(self) -> Iterator[int]:
+        for match in _NON_ZERO_BYTE.finditer(self._bits):
+            byte_index = match.start()
+            for bit in _SET_BITS_IN_BYTE[self._bits[byte_index]]:
+                yield byte_index * 8 + bit
+
+    def copy(self) -> "Bitset":
+        bitset = Bitset(self._size)
+        bitset._bits[:] = self._bits
+        return bitset
+
+    def __and__(self, other: "Bitset") -> "Bitset":
+        return Bitset._from_int(self._size, self._to_int() & other._to_int())
+
+    def __or__(self, other: "Bitset") -> "Bitset":
+        return Bitset._from_int(self._size, self._to_int() | other._to_int())
+
+    def __sub__(self, other: "Bitset") -> "Bitset":
+        return Bitset._from_int(self._size, self._to_int() & ~other._to_int())
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Bitset):
+            return NotImplemented
+        return self._size == other._size and self._bits == other._bits
+
+    def __repr__(self) -> str:
+        return f"Bitset(size={self._size}, count={self.count()})"
@@ -0,0 +1,33 @@
+from collections import defaultdict
+from typing import Dict, List
+
+# pieces of one torrent have the same length, a few free buffers are enough for the pieces that finish together
+MAX_FREE_BUFFERS_PER_SIZE = 8
+
+
+class BufferPool:
+    """
+    reuses the piece buffers of finished pieces, so downloading does not allocate a new buffer of
+    several MiB for every piece. the content of an acquired buffer is not cleared
+    """
+    def __init__(self, max_free_buffers_per_size: int = MAX_FREE_BUFFERS_PER_SIZE):
+        self._max_free_buffers_per_size = max_free_buffers_per_size
+        self._free: Dict[int, List[bytearray]] = defaultdict(list)
+
+    def acquire(self, size: int) -> bytearray:
+        free = self._free.get(size)
+        if free:
+            return free.pop()
+        return bytearray(size)
+
+    def release(self, buffer: bytearray) -> None:
+        free = self._free[len(buffer)]
+        if len(free) < self._max_free_buffers_per_size:
+            free.append(buffer)
+
+    def free_count(self, size: int) -> int:
+        return len(self._free.get(size, ()))
+
+
+# shared by all the pieces, buffers are only touched from the event loop thread
+PIECE_BUFFER_POOL = BufferPool()
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import List
 
+from torrent_client.peer.downloading.bitset import Bitset
 from torrent_client.peer.downloading.peer_bridge import PeerBridge
 from torrent_client.peer.downloading.piece_request import PieceDownloader, AbstractPieceDownloader
 
@@ -11,7 +11,7 @@ class AbstractDownloadingManager(ABC):
         pass
 
     @abstractmethod
-    def set_bitfiled(self, bitfiled: List[bool]):
+    def set_bitfiled(self, bitfiled: Bitset):
         pass
 
     @abstractmethod
@@ -26,6 +26,10 @@ class AbstractDownloadingManager(ABC):
     def is_end_downloading(self) -> bool:
         pass
 
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
 
 class DownloadingManager(AbstractDownloadingManager):
     def __init__(
@@ -35,22 +39,32 @@ class DownloadingManager(AbstractDownloadingManager):
     ):
         self._downloader = downloader
         self._bitfiled_size = bitfiled_size
-        self._bitfiled = [False for _ in range(bitfiled_size)]
+        self._bitfiled = Bitset(bitfiled_size)
 
     def has_available_piece(self) -> bool:
-        for piece_index in self._downloader.get_needed_pieces_indexes():
-            if self._bitfiled[piece_index]:
-                return True
-        return False
+        return (self._downloader.get_needed_pieces() & self._bitfiled).any()
 
     def create_piece_downloader(self) -> AbstractPieceDownloader:
         return PieceDownloader(self._downloader, self._bitfiled)
 
-    def set_bitfiled(self, bitfiled: List[bool]):
-        self._bitfiled = bitfiled[:self._bitfiled_size]
+    def set_bitfiled(self, bitfiled: Bitset):
+        self._remove_availability()
+        self._bitfiled = Bitset(self._bitfiled_size) | bitfiled
+        self._downloader.add_peer_availability(self._bitfiled)
 
     def notify_new_piece(self, index: int):
-        self._bitfiled[index] = True
+        if self._bitfiled[index]:
+            return
+        self._bitfiled.set(index)
+        self._downloader.add_piece_availability(index)
+
+    def close(self) -> None:
+        self._remove_availability()
+        self._bitfiled = Bitset(self._bitfiled_size)
+
+    def _remove_availability(self) -> None:
+        if self._bitfiled.any():
+            self._downloader.remove_peer_availability(self._bitfiled)
 
     def is_end_downloading(self) -> bool:
-        return not self._downloader.get_needed_pieces_indexes()
+        return not self._downloader.get_needed_pieces().any()
@@ -1,22 +1,79 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Callable, List, Optional
 
+from torrent_client.peer.downloading.bitset import Bitset
 from torrent_client.peer.downloading.piece_bitfield_info import PieceBitfieldInfo
+from torrent_client.peer.p2p_net.file_block import FileBlock
 
 
 class PeerBridge(ABC):
     @abstractmethod
-    def store_piece(self, piece: bytes, piece_index: int) -> None:
+    async def store_piece(self, piece: bytes, piece_index: int, on_stored: Optional[Callable[[], None]] = None) -> None:
+        """
+        returns when the piece was handed to the disk, which waits while too much data waits to be written.
+        :param on_stored: called when the write is over, whether it failed or not, the piece is not used after it
+        """
         pass
 
     @abstractmethod
     def get_needed_pieces_indexes(self) -> List[int]:
         pass
 
+    @abstractmethod
+    def get_needed_pieces(self) -> Bitset:
+        pass
+
     @abstractmethod
     def occupy_piece(self, index: int) -> PieceBitfieldInfo:
         pass
 
+    @abstractmethod
+    def pick_piece(self, peer_bitfield: Bitset) -> Optional[PieceBitfieldInfo]:
+        pass
+
+    @abstractmethod
+    def is_endgame(self) -> bool:
+        pass
+
+    @abstractmethod
+    def add_peer_availability(self, bitfield: Bitset) -> None:
+        pass
+
+    @abstractmethod
+    def remove_peer_availability(self, bitfield: Bitset) -> None:
+        pass
+
+    @abstractmethod
+    def add_piece_availability(self, index: int) -> None:
+        pass
+
     @abstractmethod
     def unlock_piece(self, index: int) -> None:
         pass
+
+    @abstractmethod
+    def get_downloaded_pieces(self) -> Bitset:
+        """the pieces that are on disk and can be uploaded"""
+        pass
+
+    @abstractmethod
+    def add_stored_listener(self, listener: Callable[[], None]) -> None:
+        """listener is called whenever a piece was stored and can be uploaded"""
+        pass
+
+    @abstractmethod
+    def remove_stored_listener(self, listener: Callable[[], None]) -> None:
+        pass
+
+    @abstractmethod
+    async def read_block(self, index: int, begin: int, length: int) -> bytes:
+        pass
+
+    @abstractmethod
+    async def get_block_file(self, index: int, begin: int, length: int) -> Optional[FileBlock]:
+        """:return the file to send the block from, None if it should be read with read_block"""
+        pass
+
+    @abstractmethod
+    def read_ahead(self, index: int) -> None:
+        pass
@@ -1,8 +1,15 @@
 from dataclasses import dataclass
 
+from torrent_client.peer.downloading.piece_progress import PieceProgress
+
 
 @dataclass
 class PieceBitfieldInfo:
     index: int
     piece_length: int
     piece_hash: bytes
+    progress: PieceProgress = None
+
+    def __post_init__(self):
+        if self.progress is None:
+            self.progress = PieceProgress(self.piece_length)
@@ -0,0 +1,141 @@
+import asyncio
+from hashlib import sha1
+from typing import Callable, Collection, List, Optional
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.downloading.bitset import Bitset
+from torrent_client.peer.downloading.buffer_pool import BufferPool, PIECE_BUFFER_POOL
+
+# called with the offset of a block that was received or is free to request again, or None when the piece was reset
+BlockListener = Callable[[Optional[int]], None]
+
+
+class PieceProgress:
+    """
+    download state of one piece, shared by all the peers downloading it.
+    every block is requested by one peer (several in endgame) and written at its offset by whichever peer delivers it first
+    """
+    def __init__(self, piece_length: int, buffer_pool: BufferPool = None):
+        self._piece_length = piece_length
+        self._buffer_pool = buffer_pool if buffer_pool else PIECE_BUFFER_POOL
+        self._blocks_count = (piece_length + BLOCK_SIZE - 1) // BLOCK_SIZE
+        self._received = Bitset(self._blocks_count)
+        self._received_count = 0
+        self._requests = [0] * self._blocks_count
+        # blocks that are not received and not requested by any peer
+        self._unrequested = Bitset.full(self._blocks_count)
+        self._listeners: List[BlockListener] = []
+        # every block is written before the piece is complete, so a reused buffer does not have to be cleared
+        self.buffer = self._buffer_pool.acquire(piece_length)
+        # blocks are hashed as soon as all the blocks before them were received
+        self._hash = sha1()
+        self._hashed_blocks = 0
+
+    @property
+    def blocks_count(self) -> int:
+        return self._blocks_count
+
+    @property
+    def hashed_blocks(self) -> int:
+        return self._hashed_blocks
+
+    def block_size(self, block_index: int) -> int:
+        return min(BLOCK_SIZE, self._piece_length - block_index * BLOCK_SIZE)
+
+    def is_block_received(self, block_index: int) -> bool:
+        return self._received[block_index]
+
+    def is_complete(self) -> bool:
+        return self._received_count == self._blocks_count
+
+    def has_unrequested_blocks(self) -> bool:
+        return self._unrequested.any()
+
+    def requests_count(self, block_index: int) -> int:
+        return self._requests[block_index]
+
+    def add_listener(self, listener: BlockListener) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: BlockListener) -> None:
+        self._listeners.remove(listener)
+
+    def request_block(self, own_requests: Collection[int], duplicate: bool = False) -> Optional[int]:
+        """
+        :param own_requests: the blocks the asking peer already requested
+        :param duplicate: allow a block that other peers requested, the least requested one is picked
+        :return the index of the block to request
+        """
+        block_index = self._unrequested.first_set()
+        if block_index is None and duplicate:
+            block_index = self._least_requested_block(own_requests)
+        if block_index is None:
+            return None
+        self._unrequested.clear(block_index)
+        self._requests[block_index] += 1
+        return block_index
+
+    def _least_requested_block(self, own_requests: Collection[int]) -> Optional[int]:
+        candidates = [
+            block_index for block_index in range(self._blocks_count)
+            if not self._received[block_index] and block_index not in own_requests
+        ]
+        return min(candidates, key=self._requests.__getitem__, default=None)
+
+    def cancel_block_request(self, block_index: int, sender: Optional[BlockListener] = None) -> None:
+        if not self._requests[block_index]:
+            return
+        self._requests[block_index] -= 1
+        if not self._requests[block_index] and not self._received[block_index]:
+            self._unrequested.set(block_index)
+            self._notify(block_index * BLOCK_SIZE, sender)
+
+    def add_block(self, begin: int, block: bytes, sender: Optional[BlockListener] = None) -> bool:
+        """:return False if the block was already received"""
+        block_index = begin // BLOCK_SIZE
+        if begin % BLOCK_SIZE or block_index >= self._blocks_count or self._received[block_index]:
+            return False
+        if len(block) != self.block_size(block_index):
+            return False
+        self.buffer[begin:begin + len(block)] = block
+        self._received.set(block_index)
+        self._unrequested.clear(block_index)
+        self._received_count += 1
+        # the blocks left when the piece completes can be the whole piece, they are hashed in digest
+        if not self.is_complete():
+            self._hash_received_blocks()
+        self._notify(begin, sender)
+        return True
+
+    def _hash_received_blocks(self) -> None:
+        while self._hashed_blocks < self._blocks_count and self._received[self._hashed_blocks]:
+            begin = self._hashed_blocks * BLOCK_SIZE
+            self._hash.update(memoryview(self.buffer)[begin:begin + self.block_size(self._hashed_blocks)])
+            self._hashed_blocks += 1
+
+    async def digest(self) -> bytes:
+        """sha1 of the complete piece, the blocks that were not hashed yet are hashed in a worker thread"""
+        if self._hashed_blocks < self._blocks_count:
+            # hashlib releases the gil while hashing big buffers, and the buffer doesn't change once it's complete
+            await asyncio.get_running_loop().run_in_executor(None, self._hash_received_blocks)
+        return self._hash.digest()
+
+    def release_buffer(self) -> None:
+        """called when the piece was stored, the received blocks are not available after it"""
+        if self.buffer is not None:
+            self._buffer_pool.release(self.buffer)
+            self.buffer = None
+
+    def reset(self) -> None:
+        self._received = Bitset(self._blocks_count)
+        self._received_count = 0
+        self._requests = [0] * self._blocks_count
+        self._unrequested = Bitset.full(self._blocks_count)
+        self._hash = sha1()
+        self._hashed_blocks = 0
+        self._notify(None, None)
+
+    def _notify(self, begin: Optional[int], sender: Optional[BlockListener]) -> None:
+        for listener in list(self._listeners):
+            if listener != sender:
+                listener(begin)
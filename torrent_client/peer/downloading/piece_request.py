@@ -1,85 +1,154 @@
+import asyncio
+import logging
 from abc import abstractmethod, ABC
-from typing import List, Iterable
-from hashlib import sha1
+from typing import Iterable, List, Optional, Set
 
 from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.downloading.bitset import Bitset
 from torrent_client.peer.exceptions import CorruptedPieceError, NoPieceNeededError
-from torrent_client.peer.p2p_messages_handling.p2p_messages import RequestMessage
+from torrent_client.peer.p2p_messages_handling.p2p_messages import RequestMessage, CancelMessage
 from torrent_client.peer.downloading.peer_bridge import PeerBridge
 
+logger = logging.getLogger(__name__)
+
 
 class AbstractPieceDownloader(ABC):
     @abstractmethod
-    def __enter__(self) -> "AbstractPieceDownloader":
+    async def __aenter__(self) -> "AbstractPieceDownloader":
         pass
 
     @abstractmethod
-    def __exit__(self, exc_type, exc_val, exc_tb):
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
         pass
 
     @abstractmethod
     def __iter__(self) -> Iterable[RequestMessage]:
         pass
 
+    @property
+    @abstractmethod
+    def piece_index(self) -> int:
+        pass
+
     @abstractmethod
     def is_piece_complete(self) -> bool:
         pass
 
     @abstractmethod
-    def add_block(self, block: bytes, index: int):
+    def is_done(self) -> bool:
+        pass
+
+    @abstractmethod
+    def add_block(self, index: int, begin: int, block: bytes):
+        pass
+
+    @abstractmethod
+    def pop_cancels(self) -> List[CancelMessage]:
+        pass
+
+    @abstractmethod
+    async def wait_for_update(self) -> None:
         pass
 
 
 class PieceDownloader(AbstractPieceDownloader):
     def __init__(self,
                  downloader: PeerBridge,
-                 bit_filed: List[bool],
+                 bit_filed: Bitset,
                  ):
         self._downloader = downloader
         self._bit_filed = bit_filed
-        self._buffer = b""
-
-    def __enter__(self):
-        for piece_index in self._downloader.get_needed_pieces_indexes():
-            if not self._bit_filed[piece_index]:
-                continue
-            self._piece_info = self._downloader.occupy_piece(piece_index)
-            break
-        else:
+        # indexes of the blocks this peer requested and did not receive yet
+        self._requested: Set[int] = set()
+        self._cancels: List[CancelMessage] = []
+        self._updated = asyncio.Event()
+        self._completed_by_us = False
+
+    async def __aenter__(self):
+        piece_info = self._downloader.pick_piece(self._bit_filed)
+        if piece_info is None:
             raise NoPieceNeededError()
+        self._piece_info = piece_info
+        self._progress = piece_info.progress
+        self._progress.add_listener(self._on_block_update)
         return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        if isinstance(exc_val, Exception):
-            self._downloader.unlock_piece(self._piece_info.index)
-        else:
-            self._check_piece_hash()
-            self._downloader.store_piece(self._buffer, self._piece_info.index)
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._progress.remove_listener(self._on_block_update)
+        # blocks this peer did not deliver go back to the other peers of the piece
+        for block_index in self._requested:
+            self._progress.cancel_block_request(block_index)
+        self._requested.clear()
+        try:
+            # a complete piece is worth storing even if the connection failed right after it
+            if self._completed_by_us:
+                await self._check_piece_hash()
+                # the disk writes from the buffer itself, it goes back to the pool once it is written
+                await self._downloader.store_piece(
+                    self._progress.buffer, self._piece_info.index, self._progress.release_buffer
+                )
+        finally:
             self._downloader.unlock_piece(self._piece_info.index)
 
-    def _is_hash_valid(self):
-        buffer_hash = sha1(self._buffer).digest()
-        return buffer_hash == self._piece_info.piece_hash
+    @property
+    def piece_index(self) -> int:
+        return self._piece_info.index
 
-    def _check_piece_hash(self):
-        if not self._is_hash_valid():
-            self._downloader.unlock_piece(self._piece_info.index)
+    async def _is_hash_valid(self):
+        return await self._progress.digest() == self._piece_info.piece_hash
+
+    async def _check_piece_hash(self):
+        if not await self._is_hash_valid():
+            logger.warning(f"piece {self._piece_info.index} is corrupted")
+            self._progress.reset()
             raise CorruptedPieceError()
 
     def is_piece_complete(self):
-        return self._buffer == self._piece_info.piece_length
+        return self._progress.is_complete()
 
-    def add_block(self, block: bytes, index: int):
+    def is_done(self) -> bool:
+        """the piece is complete, or the blocks left are requested by other peers and it is not endgame yet"""
+        if self._progress.is_complete():
+            return True
+        return not (self._requested or self._progress.has_unrequested_blocks() or self._downloader.is_endgame())
+
+    def add_block(self, index: int, begin: int, block: bytes):
         if self._piece_info.index != index:
-            raise
-        self._buffer += block
+            logger.debug(f"got block of piece {index} while downloading piece {self._piece_info.index}")
+            return
+        self._requested.discard(begin // BLOCK_SIZE)
+        if self._progress.add_block(begin, block, self._on_block_update):
+            self._completed_by_us = self._progress.is_complete()
+        self._updated.set()
+
+    def pop_cancels(self) -> List[CancelMessage]:
+        cancels, self._cancels = self._cancels, []
+        return cancels
+
+    async def wait_for_update(self) -> None:
+        await self._updated.wait()
+        self._updated.clear()
+
+    def _on_block_update(self, begin: Optional[int]) -> None:
+        if begin is None:
+            self._requested.clear()
+        else:
+            block_index = begin // BLOCK_SIZE
+            if block_index in self._requested and self._progress.is_block_received(block_index):
+                self._requested.discard(block_index)
+                self._cancels.append(CancelMessage(self._piece_info.index, begin, self._progress.block_size(block_index)))
+        self._updated.set()
 
     def _iter(self) -> Iterable[RequestMessage]:
-        for offset in range(0, self._piece_info.piece_length, BLOCK_SIZE):
+        while True:
+            block_index = self._progress.request_block(self._requested, self._downloader.is_endgame())
+            if block_index is None:
+                return
+            self._requested.add(block_index)
             yield RequestMessage(
                 self._piece_info.index,
-                offset,
-                BLOCK_SIZE
+                block_index * BLOCK_SIZE,
+                self._progress.block_size(block_index)
             )
 
     def __iter__(self) -> Iterable[RequestMessage]:
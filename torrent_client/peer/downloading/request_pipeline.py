@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import math
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.p2p_messages_handling.p2p_messages import RequestMessage
+from torrent_client.peer.p2p_net.clock import AbstractClock, Clock
+
+logger = logging.getLogger(__name__)
+
+MIN_WINDOW = 2
+# no more than the requests a peer keeps for us, ours keeps 250 (MAX_PEER_REQUESTS of the uploader)
+MAX_WINDOW = 250
+# the window holds this much of the download rate, so it stays above the bandwidth-delay product
+# without following the round trip time, which grows with our own requests queued at the peer
+TARGET_QUEUE_SEC = 1
+# on links whose round trip is longer than the target queue, the window is kept above the lowest round trip
+WINDOW_HEADROOM = 1.5
+RTT_SMOOTHING = 1 / 8
+RATE_SMOOTHING = 1 / 4
+MIN_RATE_INTERVAL_SEC = 0.5
+# slow start ends when a rate sample grows less than this compared to the previous one
+SLOW_START_MIN_GROWTH = 1.1
+
+BlockKey = Tuple[int, int]
+
+
+class AbstractRequestPipeline(ABC):
+    @abstractmethod
+    async def wait_for_free_slot(self) -> None:
+        pass
+
+    @abstractmethod
+    def on_request_sent(self, request: RequestMessage) -> None:
+        pass
+
+    @abstractmethod
+    def on_block_received(self, index: int, begin: int, size: int) -> None:
+        pass
+
+    @abstractmethod
+    def on_request_cancelled(self, index: int, begin: int) -> None:
+        pass
+
+    @abstractmethod
+    def reset(self) -> None:
+        pass
+
+    @abstractmethod
+    def outstanding_requests(self) -> List[RequestMessage]:
+        pass
+
+    @abstractmethod
+    def snub(self) -> None:
+        pass
+
+    @property
+    @abstractmethod
+    def window_size(self) -> int:
+        pass
+
+    @property
+    @abstractmethod
+    def outstanding(self) -> int:
+        pass
+
+    @property
+    @abstractmethod
+    def smoothed_rtt(self) -> Optional[float]:
+        pass
+
+
+class RequestPipeline(AbstractRequestPipeline):
+    """
+    keeps a window of outstanding block requests per peer.
+    the window grows by one block for every block received until the download rate stops growing (slow start),
+    after that it holds TARGET_QUEUE_SEC of the download rate of the peer, or more on links with a longer round trip
+    """
+    def __init__(self, clock: AbstractClock = None):
+        self._clock = clock if clock else Clock()
+        self._outstanding: Dict[BlockKey, Tuple[float, RequestMessage]] = {}
+        self._window = MIN_WINDOW
+        # a snubbing peer gets one request at a time until it delivers a block
+        self._snubbed = False
+        self._slot_freed = asyncio.Event()
+        self._slow_start = True
+        self._smoothed_rtt = None
+        # the round trip without our requests queued at the peer
+        self._min_rtt = None
+        self._rate = 0.0
+        self._interval_start = None
+        self._interval_bytes = 0
+
+    @property
+    def window_size(self) -> int:
+        return self._window
+
+    @property
+    def outstanding(self) -> int:
+        return len(self._outstanding)
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @property
+    def smoothed_rtt(self) -> Optional[float]:
+        return self._smoothed_rtt
+
+    def _has_free_slot(self) -> bool:
+        return len(self._outstanding) < (1 if self._snubbed else self._window)
+
+    async def wait_for_free_slot(self) -> None:
+        while not self._has_free_slot():
+            self._slot_freed.clear()
+            await self._slot_freed.wait()
+
+    def on_request_sent(self, request: RequestMessage) -> None:
+        now = self._clock.get_time()
+        self._outstanding[(request.piece_index, request.block_offset)] = (now, request)
+        if self._interval_start is None:
+            self._interval_start = now
+
+    def on_block_received(self, index: int, begin: int, size: int) -> None:
+        sent = self._outstanding.pop((index, begin), None)
+        if sent is None:
+            logger.debug(f"got block that wasn't requested index: {index}, begin: {begin}")
+            return
+        sent_time, _ = sent
+        self._snubbed = False
+        now = self._clock.get_time()
+        self._update_rtt(now - sent_time)
+        self._update_rate(now, size)
+        self._update_window()
+        self._slot_freed.set()
+
+    def on_request_cancelled(self, index: int, begin: int) -> None:
+        if self._outstanding.pop((index, begin), None) is not None:
+            self._slot_freed.set()
+
+    def reset(self) -> None:
+        self._outstanding.clear()
+        self._interval_start = None
+        self._interval_bytes = 0
+        self._slot_freed.set()
+
+    def outstanding_requests(self) -> List[RequestMessage]:
+        return [request for _, request in self._outstanding.values()]
+
+    def snub(self) -> None:
+        """the window starts over from slow start once the peer delivers again"""
+        self._snubbed = True
+        self._window = MIN_WINDOW
+        self._slow_start = True
+        self._rate = 0.0
+
+    def _update_rtt(self, sample: float) -> None:
+        self._min_rtt = sample if self._min_rtt is None else min(self._min_rtt, sample)
+        if self._smoothed_rtt is None:
+            self._smoothed_rtt = sample
+        else:
+            self._smoothed_rtt += RTT_SMOOTHING * (sample - self._smoothed_rtt)
+
+    def _update_rate(self, now: float, size: int) -> None:
+        self._interval_bytes += size
+        elapsed = now - self._interval_start
+        if elapsed < max(self._smoothed_rtt, MIN_RATE_INTERVAL_SEC):
+            return
+        sample = self._interval_bytes / elapsed
+        if self._slow_start and self._rate and sample < self._rate * SLOW_START_MIN_GROWTH:
+            logger.debug(f"slow start ended with window of {self._window} blocks")
+            self._slow_start = False
+        self._rate = sample if not self._rate else self._rate + RATE_SMOOTHING * (sample - self._rate)
+        self._interval_start, self._interval_bytes = now, 0
+
+    def _update_window(self) -> None:
+        if self._slow_start:
+            window = self._window + 1
+        else:
+            queue_time = max(TARGET_QUEUE_SEC, self._min_rtt * WINDOW_HEADROOM)
+            window = math.ceil(self._rate * queue_time / BLOCK_SIZE)
+        self._window = min(max(window, MIN_WINDOW), MAX_WINDOW)
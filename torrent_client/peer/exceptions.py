@@ -24,3 +24,15 @@ class CorruptedPieceError(Exception):
 
 class PeerTimeOutError(Exception):
     pass
+
+
+class PeerDisconnectedError(Exception):
+    pass
+
+
+class InvalidBlockRequestError(Exception):
+    pass
+
+
+class PeerSnubbedError(Exception):
+    pass
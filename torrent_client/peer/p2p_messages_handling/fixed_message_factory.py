@@ -1,4 +1,5 @@
-from dataclasses import astuple
+from dataclasses import fields
+from operator import attrgetter
 from struct import Struct
 from typing import Type, Any
 
@@ -9,12 +10,15 @@ class FixedMessageFactory(MessageFactory):
     def __init__(self, message_type: Type[PeerMessage_], struct: Struct):
         self._class = message_type
         self._struct = struct
+        names = [field.name for field in fields(message_type)]
+        # attrgetter of one name returns the value itself and not a tuple
+        self._get_values = attrgetter(*names) if len(names) > 1 else lambda obj: tuple(getattr(obj, name) for name in names)
 
     def decode(self, data: bytes) -> PeerMessage_:
         return self._class(*self._struct.unpack(data))
 
     def encode(self, obj: Any) -> bytes:
-        return self._struct.pack(*astuple(obj))
+        return self._struct.pack(*self._get_values(obj))
 
     @property
     def size(self):
@@ -10,4 +10,6 @@ class MessageID(Enum):
     Bitfiled = 5
     Request = 6
     Piece = 7
-    Handshake = 8
+    Cancel = 8
+    # the handshake has no id on the wire
+    Handshake = -1
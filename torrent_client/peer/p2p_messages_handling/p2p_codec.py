@@ -1,6 +1,6 @@
 import struct
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Callable, Dict, Sequence, Tuple
 
 from torrent_client.peer.p2p_messages_handling.message_id import MessageID
 from torrent_client.peer.p2p_messages_handling.bitfieled_message_factory import BitfieldMessageFactory
@@ -8,7 +8,7 @@ from torrent_client.peer.p2p_messages_handling.fixed_message_factory import Fixe
 from torrent_client.peer.p2p_messages_handling.piece_message_factory import PieceMessageFactory
 from torrent_client.peer.p2p_messages_handling.message_factory import MessageFactory
 from torrent_client.peer.p2p_messages_handling.p2p_messages import HandshakeMessage, ChokeMessage, UnchokeMessage, \
-    HaveMessage, RequestMessage, InterestedMessage, NotInterestedMessage, Response
+    HaveMessage, RequestMessage, InterestedMessage, NotInterestedMessage, Response, CancelMessage, PieceMessage
 
 
 class AbstractP2PCodec(ABC):
@@ -16,6 +16,11 @@ class AbstractP2PCodec(ABC):
     def encode(self, message: Any, message_id: MessageID) -> bytes:
         pass
 
+    @abstractmethod
+    def encode_payloads(self, message: Any, message_id: MessageID) -> Sequence[bytes]:
+        """the message as payloads that are written one after the other, so big parts of it are not copied"""
+        pass
+
     @abstractmethod
     def decode_response_not_handshake(self, payload: bytes) -> Response:
         pass
@@ -28,6 +33,11 @@ class AbstractP2PCodec(ABC):
     def decode_response_length(self, payload: bytes) -> int:
         pass
 
+    @abstractmethod
+    def encode_piece_header(self, index: int, begin: int, block_size: int) -> bytes:
+        """the piece message without its block, for blocks that are sent separately"""
+        pass
+
     @property
     @abstractmethod
     def handshake_size(self) -> int:
@@ -42,6 +52,11 @@ class AbstractP2PCodec(ABC):
 class P2PCodec(AbstractP2PCodec):
     _HEADER_STRUCT = struct.Struct("!IB")
     _LENGTH_STRUCT = struct.Struct("!I")
+    # the hot messages are encoded with their header in one pack
+    _BLOCK_MESSAGE_STRUCT = struct.Struct("!IBIII")
+    _HAVE_STRUCT = struct.Struct("!IBI")
+    _PIECE_HEADER_STRUCT = struct.Struct("!IBII")
+    _IDS = {message_id.value: message_id for message_id in MessageID}
 
     _CONSTANT_MESSAGES_FACTORIES = {
         MessageID.Choke: FixedMessageFactory(ChokeMessage, struct.Struct("")),
@@ -51,14 +66,50 @@ class P2PCodec(AbstractP2PCodec):
         MessageID.Piece: PieceMessageFactory(),
         MessageID.Have: FixedMessageFactory(HaveMessage, struct.Struct("!I")),
         MessageID.Request: FixedMessageFactory(RequestMessage, struct.Struct("!III")),
+        MessageID.Cancel: FixedMessageFactory(CancelMessage, struct.Struct("!III")),
         MessageID.Handshake: FixedMessageFactory(HandshakeMessage, struct.Struct("!B19s8s20s20s"))
     }
 
     def __init__(self, bitfield_size: int):
-        self._messages_factories: dict[MessageID, MessageFactory] = self._CONSTANT_MESSAGES_FACTORIES
+        self._messages_factories: dict[MessageID, MessageFactory] = dict(self._CONSTANT_MESSAGES_FACTORIES)
         self._messages_factories[MessageID.Bitfiled] = BitfieldMessageFactory(bitfield_size)
+        self._fast_encoders: Dict[MessageID, Callable[[Any], bytes]] = {
+            MessageID.Request: self._encode_request,
+            MessageID.Cancel: self._encode_cancel,
+            MessageID.Have: self._encode_have,
+        }
+
+    def _encode_request(self, message: RequestMessage) -> bytes:
+        return self._BLOCK_MESSAGE_STRUCT.pack(
+            13, MessageID.Request.value, message.piece_index, message.block_offset, message.size
+        )
+
+    def _encode_cancel(self, message: CancelMessage) -> bytes:
+        return self._BLOCK_MESSAGE_STRUCT.pack(
+            13, MessageID.Cancel.value, message.piece_index, message.block_offset, message.size
+        )
+
+    def _encode_have(self, message: HaveMessage) -> bytes:
+        return self._HAVE_STRUCT.pack(5, MessageID.Have.value, message.index)
+
+    def _encode_piece(self, message: PieceMessage) -> Tuple[bytes, bytes]:
+        # the block is written after its header and not copied into it
+        return self.encode_piece_header(message.index, message.begin, len(message.block)), message.block
+
+    def encode_piece_header(self, index: int, begin: int, block_size: int) -> bytes:
+        return self._PIECE_HEADER_STRUCT.pack(block_size + 9, MessageID.Piece.value, index, begin)
+
+    def encode_payloads(self, message: Any, message_id: MessageID) -> Sequence[bytes]:
+        if message_id == MessageID.Piece:
+            return self._encode_piece(message)
+        return (self.encode(message, message_id),)
 
     def encode(self, message: Any, message_id: MessageID) -> bytes:
+        if message_id == MessageID.Piece:
+            return b"".join(self._encode_piece(message))
+        fast_encoder = self._fast_encoders.get(message_id)
+        if fast_encoder:
+            return fast_encoder(message)
         encoded_message = self._messages_factories[message_id].encode(message)
         header = b""
         if message_id != MessageID.Handshake:
@@ -69,12 +120,9 @@ class P2PCodec(AbstractP2PCodec):
     def decode_response_length(self, payload: bytes) -> int:
         return self._LENGTH_STRUCT.unpack(payload)[0]
 
-    def _decode_header(self, payload: bytes) -> tuple[int, MessageID, bytes]:
-        header_size = self._HEADER_STRUCT.size
-        header, rest = payload[:header_size], payload[header_size:]
-        length, _id = self._HEADER_STRUCT.unpack(header)
-        _id = MessageID(_id)
-        return length, _id, rest
+    def _decode_header(self, payload: bytes) -> tuple[int, MessageID, memoryview]:
+        length, _id = self._HEADER_STRUCT.unpack_from(payload)
+        return length, self._IDS[_id], memoryview(payload)[self._HEADER_STRUCT.size:]
 
     def decode_response_not_handshake(self, payload: bytes) -> Response:
         length, message_id, rest = self._decode_header(payload)
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
-from typing import Annotated, List, Any
+from typing import Annotated, Any
 
+from torrent_client.peer.downloading.bitset import Bitset
 from torrent_client.peer.p2p_messages_handling.message_id import MessageID
 
 
@@ -34,9 +35,16 @@ class RequestMessage:
     size: int
 
 
+@dataclass
+class CancelMessage:
+    piece_index: int
+    block_offset: int
+    size: int
+
+
 @dataclass
 class BitfieldMessage:
-    bit_field: List[bool]
+    bit_field: Bitset
 
 
 @dataclass
@@ -5,10 +5,12 @@ from torrent_client.peer.p2p_messages_handling.p2p_messages import PieceMessage
 
 
 class PieceMessageFactory(MessageFactory[PieceMessage]):
-    def decode(self, data: bytes):
-        length = len(data)
-        data_in_tuple = struct.unpack(f"II{length - 8}s", data)
-        return PieceMessage(*data_in_tuple)
+    HEADER_STRUCT = struct.Struct("!II")
+
+    def decode(self, data: bytes) -> PieceMessage:
+        # the block is a view of data, it is only valid as long as data is
+        index, begin = self.HEADER_STRUCT.unpack_from(data)
+        return PieceMessage(index, begin, memoryview(data)[self.HEADER_STRUCT.size:])
 
     def encode(self, obj: PieceMessage) -> bytes:
-        return struct.pack(f"II{len(obj.block)}s", obj.index, obj.begin, obj.block)
+        return self.HEADER_STRUCT.pack(obj.index, obj.begin) + obj.block
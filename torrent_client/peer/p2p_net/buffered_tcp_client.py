@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from typing import BinaryIO, List, Optional
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.exceptions import PeerNotRespondingError
+from torrent_client.peer.p2p_net.rate_limiter import BandwidthLimits, RateLimiter
+from torrent_client.peer.p2p_net.receive_buffer import ReceiveBuffer
+from torrent_client.peer.p2p_net.tcp_client import AbstractTcpClient, send_file_on_transport
+
+logger = logging.getLogger(__name__)
+
+MIN_RECV_SIZE = 4 * BLOCK_SIZE
+# stop reading from the socket when this much data is waiting to be parsed
+READ_HIGH_WATERMARK = 64 * BLOCK_SIZE
+
+
+class _ReceiveBufferProtocol(asyncio.BufferedProtocol):
+    def __init__(self, buffer: ReceiveBuffer, download_limiter: RateLimiter):
+        self._buffer = buffer
+        self.download_limiter = download_limiter
+        self.transport: Optional[asyncio.Transport] = None
+        self.received = 0
+        self.eof = False
+        # reading is paused while the buffer is full or while the download limit is reached
+        self._buffer_full = False
+        self._limit_reached = False
+        self._reading_paused = False
+        self._data_arrived = asyncio.Event()
+        self._writing_resumed = asyncio.Event()
+        self._writing_resumed.set()
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self._buffer.get_write_view(max(sizehint, MIN_RECV_SIZE))
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self._buffer.commit(nbytes)
+        self.received += nbytes
+        self._data_arrived.set()
+        if len(self._buffer) >= READ_HIGH_WATERMARK:
+            logger.debug("receive buffer is full, pause reading")
+            self._buffer_full = True
+        self.download_limiter.consume(nbytes)
+        if not self._limit_reached:
+            self._wait_for_limiter()
+        self._update_reading()
+
+    def buffer_drained(self) -> None:
+        self._buffer_full = False
+        self._update_reading()
+
+    def _wait_for_limiter(self) -> None:
+        delay = self.download_limiter.delay()
+        self._limit_reached = bool(delay)
+        if delay:
+            asyncio.get_running_loop().call_later(delay, self._on_limiter_delay_passed)
+
+    def _on_limiter_delay_passed(self) -> None:
+        # other connections may have taken the tokens in the meantime
+        self._wait_for_limiter()
+        self._update_reading()
+
+    def _update_reading(self) -> None:
+        pause = self._buffer_full or self._limit_reached
+        if pause == self._reading_paused or not self.transport or self.transport.is_closing():
+            return
+        self._reading_paused = pause
+        if pause:
+            self.transport.pause_reading()
+        else:
+            self.transport.resume_reading()
+
+    def eof_received(self) -> bool:
+        self.eof = True
+        self._data_arrived.set()
+        return False
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.eof = True
+        self._data_arrived.set()
+        self._writing_resumed.set()
+
+    def pause_writing(self) -> None:
+        self._writing_resumed.clear()
+
+    def resume_writing(self) -> None:
+        self._writing_resumed.set()
+
+    async def wait_for_data(self) -> None:
+        while not (self.received or self.eof):
+            self._data_arrived.clear()
+            await self._data_arrived.wait()
+
+    async def drain(self) -> None:
+        await self._writing_resumed.wait()
+
+
+class BufferedTcpClient(AbstractTcpClient):
+    """
+    tcp client that lets the event loop receive straight into the receive buffer of the p2p socket,
+    the same buffer has to be given to the p2p socket
+    """
+    def __init__(self, ip: str, port: int, buffer: ReceiveBuffer, limits: BandwidthLimits = None):
+        self._addr = (ip, port)
+        self._buffer = buffer
+        self._limits = limits if limits else BandwidthLimits()
+        self._protocol = _ReceiveBufferProtocol(buffer, self._limits.download)
+
+    def set_limits(self, limits: BandwidthLimits) -> None:
+        super().set_limits(limits)
+        self._protocol.download_limiter = limits.download
+
+    async def init(self):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.create_connection(lambda: self._protocol, *self._addr)
+        except Exception as e:
+            raise PeerNotRespondingError("try to open connections and unknown error appeared") from e
+
+    def close(self):
+        if self._protocol.transport:
+            self._protocol.transport.close()
+
+    async def recv_into(self, buffer: ReceiveBuffer, size: int) -> int:
+        # the socket only asks for more data when what was buffered is not a full message
+        self._protocol.buffer_drained()
+        await self._protocol.wait_for_data()
+        received, self._protocol.received = self._protocol.received, 0
+        return received
+
+    async def recv(self, size: int) -> bytes:
+        if not len(self._buffer):
+            await self.recv_into(self._buffer, size)
+        data = bytes(self._buffer.peek(size))
+        self._buffer.consume(len(data))
+        return data
+
+    async def send(self, payload: bytes) -> None:
+        await self.send_many([payload])
+
+    async def send_many(self, payloads: List[bytes]) -> None:
+        await self._limits.upload.write(payloads, self._write)
+
+    async def _write(self, payloads: List[bytes]) -> None:
+        self._protocol.transport.writelines(payloads)
+        await self._protocol.drain()
+
+    async def sendfile(self, file: BinaryIO, offset: int, count: int) -> None:
+        await self._limits.upload.acquire(count)
+        await send_file_on_transport(self._protocol.transport, file, offset, count, self._write)
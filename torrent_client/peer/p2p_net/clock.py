@@ -1,15 +1,22 @@
 import asyncio
 import time
 from abc import ABC, abstractmethod
+from typing import Awaitable, TypeVar
 
 from torrent_client.peer.exceptions import PeerTimeOutError
 
+Result_ = TypeVar("Result_")
+
 
 class AbstractClock(ABC):
     @abstractmethod
     async def sleep(self, sec: float) -> None:
         pass
 
+    @abstractmethod
+    async def wait_for(self, awaitable: Awaitable[Result_]) -> Result_:
+        pass
+
     @abstractmethod
     def set_timeout(self, timeout: float) -> None:
         pass
@@ -18,6 +25,10 @@ class AbstractClock(ABC):
     def reset(self):
         pass
 
+    @abstractmethod
+    def get_time(self) -> float:
+        pass
+
 
 class Clock(AbstractClock):
     def __init__(self):
@@ -35,8 +46,18 @@ class Clock(AbstractClock):
         await asyncio.sleep(sec)
         self._check_pass_timeout()
 
+    async def wait_for(self, awaitable: Awaitable[Result_]) -> Result_:
+        time_left = self._timeout - (time.time() - self._start_counting_time)
+        try:
+            return await asyncio.wait_for(awaitable, max(time_left, 0))
+        except asyncio.TimeoutError:
+            raise PeerTimeOutError()
+
     def set_timeout(self, timeout: float) -> None:
         self._timeout = timeout
 
     def reset(self):
         self._start_counting_time = time.time()
+
+    def get_time(self) -> float:
+        return time.monotonic()
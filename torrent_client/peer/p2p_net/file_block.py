@@ -0,0 +1,43 @@
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Optional
+from weakref import WeakKeyDictionary
+
+# where there are no positioned reads and writes (windows), the file position is moved under a lock of the file
+_position_locks: "WeakKeyDictionary[BinaryIO, threading.Lock]" = WeakKeyDictionary()
+_position_locks_lock = threading.Lock()
+
+
+@dataclass
+class FileBlock:
+    """a block that is sent to the peer straight from an open file"""
+    file: BinaryIO
+    offset: int
+    size: int
+    # keeps the file open until the block was sent or dropped
+    on_release: Optional[Callable[[], None]] = field(default=None, compare=False, repr=False)
+
+    def release(self) -> None:
+        """called once the block is not going to be sent from the file any more, calling it again does nothing"""
+        on_release, self.on_release = self.on_release, None
+        if on_release:
+            on_release()
+
+
+def position_lock(file: BinaryIO) -> threading.Lock:
+    """the lock every seek and the read or write after it takes, shared by all the users of the open file"""
+    with _position_locks_lock:
+        lock = _position_locks.get(file)
+        if lock is None:
+            lock = _position_locks[file] = threading.Lock()
+        return lock
+
+
+def read_at(file: BinaryIO, offset: int, size: int) -> bytes:
+    """blocking read from offset that does not move the file position of the other users of the file"""
+    if hasattr(os, "pread"):
+        return os.pread(file.fileno(), size, offset)
+    with position_lock(file):
+        file.seek(offset)
+        return file.read(size)
@@ -1,9 +1,13 @@
+import asyncio
 import logging
 from abc import ABC, abstractmethod
-from typing import Callable, Any
+from typing import Callable, Any, List, Optional, Union
 
 from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.exceptions import PeerDisconnectedError
 from torrent_client.peer.p2p_net.clock import AbstractClock, Clock
+from torrent_client.peer.p2p_net.file_block import FileBlock
+from torrent_client.peer.p2p_net.receive_buffer import ReceiveBuffer
 from torrent_client.peer.p2p_messages_handling.message_id import MessageID
 from torrent_client.peer.p2p_messages_handling.p2p_messages import Response
 from torrent_client.peer.p2p_messages_handling.p2p_codec import AbstractP2PCodec, P2PCodec
@@ -11,8 +15,18 @@ from torrent_client.peer.p2p_net.tcp_client import TcpClient, AbstractTcpClient
 
 logger = logging.getLogger(__name__)
 
-WAIT_SECONDS_UNTIL_TIMEOUT = 3
-SLEEP_PERIOD = 0.01
+# peers send a keep alive at least every two minutes, a connection that is silent for longer is dead.
+# a peer that is only slow to send the blocks we requested is caught by the snub timeout of the peer
+IDLE_TIMEOUT_SEC = 120
+# the handshake is the answer to ours, a peer that does not answer soon is not worth waiting for
+HANDSHAKE_TIMEOUT_SEC = 10
+# we send a keep alive when nothing else was sent for this long, so idle peers don't drop us
+KEEP_ALIVE_INTERVAL_SEC = 60
+# the stream reader buffers up to 64 KiB, read all of it at once
+RECV_SIZE = 4 * BLOCK_SIZE
+# send waits when this much data is queued for the peer, until the writer brings it below the low watermark
+WRITE_HIGH_WATERMARK = 64 * BLOCK_SIZE
+WRITE_LOW_WATERMARK = 16 * BLOCK_SIZE
 
 
 class AbstractP2PSocket(ABC):
@@ -27,6 +41,10 @@ class AbstractP2PSocket(ABC):
     async def read(self) -> Response:
         pass
 
+    @abstractmethod
+    async def read_batch(self) -> List[Response]:
+        pass
+
     @abstractmethod
     async def read_handshake(self) -> Response:
         pass
@@ -35,6 +53,10 @@ class AbstractP2PSocket(ABC):
     async def send(self, message: Any, message_id: MessageID) -> None:
         pass
 
+    @abstractmethod
+    async def send_file_block(self, index: int, begin: int, block: FileBlock) -> None:
+        pass
+
     @abstractmethod
     async def __aenter__(self) -> None:
         pass
@@ -52,27 +74,38 @@ class P2PSocket(AbstractP2PSocket):
                  bitfiled_size: int,
                  client: AbstractTcpClient = None,
                  protocol: AbstractP2PCodec = None,
-                 clock: AbstractClock = None
+                 clock: AbstractClock = None,
+                 receive_buffer: ReceiveBuffer = None
                  ):
         self._client = client if client else TcpClient(ip, port)
         self._protocol = protocol if protocol else P2PCodec(bitfiled_size)
-        self._buff = b""
+        # an empty buffer is falsy, and the buffer given has to be the one the client receives into
+        self._buff = receive_buffer if receive_buffer is not None else ReceiveBuffer()
         self._clock = clock if clock else Clock()
-        self._clock.set_timeout(WAIT_SECONDS_UNTIL_TIMEOUT)
+        self._clock.set_timeout(IDLE_TIMEOUT_SEC)
+        self._outbound: List[Union[bytes, FileBlock]] = []
+        self._outbound_size = 0
+        self._outbound_ready = asyncio.Event()
+        self._outbound_drained = asyncio.Event()
+        self._writer_task: Optional[asyncio.Task] = None
+        self._writer_error: Optional[Exception] = None
 
     async def __aenter__(self) -> None:
         await self._client.init()
 
     async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self._writer_task:
+            self._writer_task.cancel()
         self._client.close()
+        self._release_file_blocks(self._outbound)
 
     def _remove_from_buffer(self, size: int) -> None:
         logger.debug(f"removing data from buffer size {size}")
-        self._buff = self._buff[size:]
+        self._buff.consume(size)
 
-    def _get_from_buffer(self, size: int) -> bytes:
+    def _get_from_buffer(self, size: int) -> memoryview:
         logger.debug(f"getting from buffer data size: {size}")
-        return self._buff[:size]
+        return self._buff.peek(size)
 
     def _is_hand_shake_full(self) -> bool:
         return len(self._buff) >= self._protocol.handshake_size
@@ -81,17 +114,14 @@ class P2PSocket(AbstractP2PSocket):
         await self._recv_until_condition(self._is_hand_shake_full)
 
     async def _read_from_peer(self) -> None:
-        packet = await self._client.recv(BLOCK_SIZE)
-        if len(packet) > 0:
-            logger.debug(f"we got new data {packet}")
-        self._buff += packet
+        received = await self._client.recv_into(self._buff, RECV_SIZE)
+        if not received:
+            raise PeerDisconnectedError("peer closed the connection")
+        logger.debug(f"we got new data size: {received}")
 
     async def _recv_until_condition(self, condition: Callable[[], bool]) -> None:
-        self._clock.reset()
-        await self._read_from_peer()
         while not condition():
-            await self._clock.sleep(SLEEP_PERIOD)
-            await self._read_from_peer()
+            await self._clock.wait_for(self._read_from_peer())
 
     def _is_response_containing_length(self) -> bool:
         return len(self._buff) >= self._protocol.length_datatype_size
@@ -124,28 +154,147 @@ class P2PSocket(AbstractP2PSocket):
 
     async def read_handshake(self) -> Response:
         logger.debug("waiting for handshake response")
-        await self._wait_for_handshake()
+        self._clock.reset()
+        self._clock.set_timeout(HANDSHAKE_TIMEOUT_SEC)
+        try:
+            await self._wait_for_handshake()
+        finally:
+            self._clock.set_timeout(IDLE_TIMEOUT_SEC)
         logger.info("we got and shake response")
         hand_shake = self._get_from_buffer(self._protocol.handshake_size)
-        self._remove_from_buffer(self._protocol.handshake_size)
         decoded_hand_shake = self._protocol.decode_handshake(hand_shake)
-        logger.debug(f"hand shake data: [encoded: {hand_shake}, decoded: {decoded_hand_shake}]")
+        self._remove_from_buffer(self._protocol.handshake_size)
+        logger.debug(f"hand shake data: [decoded: {decoded_hand_shake}]")
         return decoded_hand_shake
 
     async def __anext__(self) -> Response:
         return await self.read()
 
     async def read(self) -> Response:
+        """the block of a piece message is a view of the receive buffer, it is valid until the next read"""
         logger.info("waiting for readable response")
+        self._clock.reset()
         response_length = await self._recv_response_return_size()
         full_response_length = response_length + self._protocol.length_datatype_size
         response_bytes = self._get_from_buffer(full_response_length)
         response = self._protocol.decode_response_not_handshake(response_bytes)
         self._remove_from_buffer(full_response_length)
-        logger.debug(f"we got new response encoded: {response_bytes}, decoded: {response}")
+        logger.debug(f"we got new response size: {full_response_length}")
         return response
 
+    async def read_batch(self) -> List[Response]:
+        """
+        waits for one response and returns it with all the complete responses that are already in the buffer.
+        the blocks of piece messages are views of the receive buffer, they are valid until the next read
+        """
+        responses = [await self.read()]
+        while True:
+            response = self._decode_buffered_response()
+            if response is None:
+                return responses
+            responses.append(response)
+
+    def _decode_buffered_response(self) -> Optional[Response]:
+        length_size = self._protocol.length_datatype_size
+        while len(self._buff) >= length_size:
+            length = self._protocol.decode_response_length(self._buff.peek(length_size))
+            if length == 0:
+                # keep alive
+                self._buff.consume(length_size)
+                continue
+            if len(self._buff) < length + length_size:
+                return None
+            response = self._protocol.decode_response_not_handshake(self._buff.peek(length + length_size))
+            self._buff.consume(length + length_size)
+            return response
+        return None
+
     async def send(self, message: Any, message_id: MessageID) -> None:
-        message_encoded = self._protocol.encode(message, message_id)
-        logger.debug(f"we are sending message decoded{message}, encoded {message_encoded}")
-        await self._client.send(message_encoded)
+        """queues the message for the writer task, waits only when too much data is queued"""
+        self._check_writer_error()
+        payloads = self._protocol.encode_payloads(message, message_id)
+        # the message itself is not logged, formatting a piece block costs more than sending it
+        logger.debug(f"we are sending {message_id}, size: {sum(len(payload) for payload in payloads)}")
+        await self._queue_outbound(*payloads)
+
+    async def send_file_block(self, index: int, begin: int, block: FileBlock) -> None:
+        """queues a piece message whose block is sent from the file by the kernel, without reading it"""
+        if self._writer_error:
+            block.release()
+        self._check_writer_error()
+        await self._queue_outbound(self._protocol.encode_piece_header(index, begin, block.size), block)
+
+    async def _queue_outbound(self, *payloads: Union[bytes, FileBlock]) -> None:
+        if not self._writer_task:
+            self._writer_task = asyncio.create_task(self._write_outbound())
+        for payload in payloads:
+            self._outbound.append(payload)
+            self._outbound_size += self._payload_size(payload)
+        self._outbound_ready.set()
+        if self._outbound_size >= WRITE_HIGH_WATERMARK:
+            logger.debug(f"{self._outbound_size} bytes are waiting to be sent, wait for the writer")
+            self._outbound_drained.clear()
+            await self._outbound_drained.wait()
+            self._check_writer_error()
+
+    def _queue_keep_alive(self) -> None:
+        # a keep alive is a message length of 0
+        keep_alive = bytes(self._protocol.length_datatype_size)
+        self._outbound.append(keep_alive)
+        self._outbound_size += len(keep_alive)
+        self._outbound_ready.set()
+
+    def _check_writer_error(self) -> None:
+        if self._writer_error:
+            raise PeerDisconnectedError("failed to send to peer") from self._writer_error
+
+    async def _write_outbound(self) -> None:
+        # everything queued since the last write goes to the socket in one write
+        try:
+            while True:
+                while not self._outbound:
+                    self._outbound_ready.clear()
+                    keep_alive = asyncio.get_running_loop().call_later(KEEP_ALIVE_INTERVAL_SEC, self._queue_keep_alive)
+                    try:
+                        await self._outbound_ready.wait()
+                    finally:
+                        keep_alive.cancel()
+                payloads, self._outbound = self._outbound, []
+                await self._write_payloads(payloads)
+                if self._outbound_size <= WRITE_LOW_WATERMARK:
+                    self._outbound_drained.set()
+        except Exception as e:
+            logger.info(f"failed to send to peer {e!r}")
+            self._writer_error = e
+            self._outbound_drained.set()
+
+    async def _write_payloads(self, payloads: List[Union[bytes, FileBlock]]) -> None:
+        # the messages between file blocks are still written together
+        start = 0
+        try:
+            for end, payload in enumerate(payloads):
+                if isinstance(payload, FileBlock):
+                    await self._write_buffers(payloads[start:end])
+                    await self._client.sendfile(payload.file, payload.offset, payload.size)
+                    payload.release()
+                    self._outbound_size -= payload.size
+                    start = end + 1
+            await self._write_buffers(payloads[start:])
+        finally:
+            # the blocks that were not sent because the write failed
+            self._release_file_blocks(payloads)
+
+    @staticmethod
+    def _release_file_blocks(payloads: List[Union[bytes, FileBlock]]) -> None:
+        for payload in payloads:
+            if isinstance(payload, FileBlock):
+                payload.release()
+
+    async def _write_buffers(self, payloads: List[bytes]) -> None:
+        if payloads:
+            await self._client.send_many(payloads)
+            self._outbound_size -= sum(len(payload) for payload in payloads)
+
+    @staticmethod
+    def _payload_size(payload: Union[bytes, FileBlock]) -> int:
+        return payload.size if isinstance(payload, FileBlock) else len(payload)
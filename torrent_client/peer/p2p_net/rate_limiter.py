@@ -0,0 +1,129 @@
+import asyncio
+from typing import Awaitable, Callable, Iterator, List, Optional
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.p2p_net.clock import AbstractClock, Clock
+
+# an idle limiter saves up to this many seconds of its rate, sent or received at once without waiting
+BURST_SEC = 1
+# a limited connection sends this much at a time, so the connections waiting for the same limiter take turns
+SEND_QUANTUM = 4 * BLOCK_SIZE
+
+PayloadsWriter = Callable[[List[bytes]], Awaitable[None]]
+
+
+class RateLimiter:
+    """
+    token bucket of one direction, limited by its own rate and by the rates of all its parents.
+    traffic is counted after it happened, so a limiter can go into debt, the traffic waits until the debt is paid.
+    a rate of 0 is not limited, a limiter with spare tokens never makes the traffic wait
+    """
+    def __init__(self, rate: float = 0, parent: Optional["RateLimiter"] = None, clock: AbstractClock = None):
+        self._rate = rate
+        self._parent = parent
+        self._clock = clock if clock else (parent._clock if parent else Clock())
+        self._tokens = rate * BURST_SEC
+        self._last_refill = self._clock.get_time()
+        # the connections that wait for this limiter are served in the order they came
+        self._turn = asyncio.Lock()
+        self._chain: List[RateLimiter] = [self] + (parent._chain if parent else [])
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @rate.setter
+    def rate(self, rate: float) -> None:
+        self._refill()
+        self._rate = rate
+        self._tokens = min(self._tokens, rate * BURST_SEC)
+
+    def child(self, rate: float = 0) -> "RateLimiter":
+        return RateLimiter(rate, self)
+
+    def is_limited(self) -> bool:
+        return any(limiter._rate for limiter in self._chain)
+
+    def consume(self, size: int) -> None:
+        for limiter in self._chain:
+            if limiter._rate:
+                limiter._refill()
+                limiter._tokens -= size
+
+    def delay(self) -> float:
+        """:return seconds until no limiter of the chain is in debt"""
+        return max(limiter._own_delay() for limiter in self._chain)
+
+    async def acquire(self, size: int) -> None:
+        """waits for the debt of the chain to be paid, then takes size bytes"""
+        # the debt is paid from this limiter up to the root, a limiter is waited for only while it is in debt
+        # itself, so a connection over its own limit does not make the connections it shares parents with wait
+        while True:
+            for limiter in self._chain:
+                await limiter._wait_turn()
+            if not self.delay():
+                break
+        self.consume(size)
+
+    async def _wait_turn(self) -> None:
+        """waits until this limiter is not in debt, the connections waiting for it are served in turns"""
+        if not self._own_delay() and not self._turn.locked():
+            return
+        async with self._turn:
+            while True:
+                delay = self._own_delay()
+                if not delay:
+                    break
+                await asyncio.sleep(delay)
+
+    async def write(self, payloads: List[bytes], writer: PayloadsWriter) -> None:
+        """writes the payloads with the writer as fast as the chain allows"""
+        if not self.is_limited():
+            await writer(payloads)
+            return
+        for chunk in split_payloads(payloads, SEND_QUANTUM):
+            await self.acquire(sum(len(payload) for payload in chunk))
+            await writer(chunk)
+
+    def _refill(self) -> None:
+        now = self._clock.get_time()
+        if now > self._last_refill:
+            self._tokens = min(self._tokens + (now - self._last_refill) * self._rate, self._rate * BURST_SEC)
+            self._last_refill = now
+
+    def _own_delay(self) -> float:
+        if not self._rate:
+            return 0
+        self._refill()
+        return -self._tokens / self._rate if self._tokens < 0 else 0
+
+
+def split_payloads(payloads: List[bytes], size: int) -> Iterator[List[bytes]]:
+    """groups the payloads into chunks of up to size bytes, payloads bigger than size are sliced"""
+    chunk, chunk_size = [], 0
+    for payload in payloads:
+        view = memoryview(payload)
+        while view:
+            part = view[:size - chunk_size]
+            chunk.append(part)
+            chunk_size += len(part)
+            view = view[len(part):]
+            if chunk_size == size:
+                yield chunk
+                chunk, chunk_size = [], 0
+    if chunk:
+        yield chunk
+
+
+class BandwidthLimits:
+    """the upload and download limiters of one level: all the torrents, one torrent or one peer"""
+    def __init__(self, upload: RateLimiter = None, download: RateLimiter = None):
+        self.upload = upload if upload else RateLimiter()
+        self.download = download if download else RateLimiter()
+
+    def child(self, upload_rate: float = 0, download_rate: float = 0) -> "BandwidthLimits":
+        return BandwidthLimits(self.upload.child(upload_rate), self.download.child(download_rate))
+
+
+# the limits shared by all the torrents, not limited unless the rates are set
+GLOBAL_BANDWIDTH = BandwidthLimits()
@@ -0,0 +1,61 @@
+from torrent_client.constants import BLOCK_SIZE
+
+INITIAL_CAPACITY = 4 * BLOCK_SIZE
+
+
+class ReceiveBuffer:
+    """
+    growable receive buffer with read and write cursors.
+    data is consumed by moving the read cursor, and unread data is moved to the start of the buffer only
+    when there is no room left at its end, so every received byte is copied at most once more.
+    views returned by peek are valid until the next write to the buffer
+    """
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._read = 0
+        self._write = 0
+
+    def __len__(self) -> int:
+        return self._write - self._read
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buffer)
+
+    def write(self, data: bytes) -> None:
+        size = len(data)
+        self.reserve(size)
+        self._view[self._write:self._write + size] = data
+        self._write += size
+
+    def get_write_view(self, min_size: int = 1) -> memoryview:
+        self.reserve(min_size)
+        return self._view[self._write:]
+
+    def commit(self, size: int) -> None:
+        self._write += size
+
+    def peek(self, size: int) -> memoryview:
+        return self._view[self._read:self._read + size]
+
+    def consume(self, size: int) -> None:
+        self._read += size
+        if self._read == self._write:
+            self._read = self._write = 0
+
+    def reserve(self, size: int) -> None:
+        if self.capacity - self._write >= size:
+            return
+        unread = len(self)
+        if self.capacity - unread >= size:
+            self._view[:unread] = self._view[self._read:self._write]
+        else:
+            self._grow(unread + size)
+        self._read, self._write = 0, unread
+
+    def _grow(self, min_capacity: int) -> None:
+        # a new buffer is allocated instead of resizing, views already handed out keep the old one alive
+        buffer = bytearray(max(self.capacity * 2, min_capacity))
+        buffer[:len(self)] = self._view[self._read:self._write]
+        self._buffer, self._view = buffer, memoryview(buffer)
@@ -1,8 +1,12 @@
 import asyncio
 from abc import ABC, abstractmethod
-from asyncio import StreamReader, StreamWriter
+from asyncio import StreamReader, StreamWriter, BaseTransport
+from typing import Awaitable, BinaryIO, Callable, List
 
 from torrent_client.peer.exceptions import PeerNotRespondingError
+from torrent_client.peer.p2p_net.file_block import read_at
+from torrent_client.peer.p2p_net.rate_limiter import BandwidthLimits
+from torrent_client.peer.p2p_net.receive_buffer import ReceiveBuffer
 
 
 class AbstractTcpClient(ABC):
@@ -10,10 +14,26 @@ class AbstractTcpClient(ABC):
     async def recv(self, size: int) -> bytes:
         pass
 
+    async def recv_into(self, buffer: ReceiveBuffer, size: int) -> int:
+        packet = await self.recv(size)
+        buffer.write(packet)
+        return len(packet)
+
     @abstractmethod
     async def send(self, payload: bytes) -> None:
         pass
 
+    async def send_many(self, payloads: List[bytes]) -> None:
+        await self.send(b"".join(payloads))
+
+    async def sendfile(self, file: BinaryIO, offset: int, count: int) -> None:
+        """sends count bytes of the file from offset, clients that can should send them without reading the file"""
+        await self.send(await asyncio.to_thread(read_at, file, offset, count))
+
+    def set_limits(self, limits: BandwidthLimits) -> None:
+        """the bandwidth limits of the connection, set before the connection is used"""
+        self._limits = limits
+
     @abstractmethod
     async def init(self):
         pass
@@ -23,10 +43,28 @@ class AbstractTcpClient(ABC):
         pass
 
 
+async def send_file_on_transport(transport: BaseTransport,
+                                 file: BinaryIO,
+                                 offset: int,
+                                 count: int,
+                                 write: Callable[[List[bytes]], Awaitable[None]]) -> None:
+    """
+    sends with os.sendfile when the transport supports it. the fallback of the event loop is not used,
+    it seeks the file, which is shared by all the peers uploading from it, so the block is read by offset instead
+    """
+    try:
+        await asyncio.get_running_loop().sendfile(transport, file, offset, count, fallback=False)
+    except (asyncio.SendfileNotAvailableError, RuntimeError):
+        if transport.is_closing():
+            raise
+        await write([await asyncio.to_thread(read_at, file, offset, count)])
+
+
 class TcpClient(AbstractTcpClient):
-    def __init__(self, ip: str, port: int):
+    def __init__(self, ip: str, port: int, limits: BandwidthLimits = None):
         self._addr = (ip, port)
         self._reader, self.writer = None, None
+        self._limits = limits if limits else BandwidthLimits()
 
     async def init(self):
         try:
@@ -38,8 +76,32 @@ class TcpClient(AbstractTcpClient):
         self.writer.close()
 
     async def recv(self, size: int) -> bytes:
-        return await self._reader.read(size)
+        # while the limit is reached nothing is read, the stream reader fills up and pauses the transport
+        await self._limits.download.acquire(0)
+        data = await self._reader.read(size)
+        self._limits.download.consume(len(data))
+        return data
 
     async def send(self, payload: bytes) -> None:
-        self.writer.write(payload)
+        await self.send_many([payload])
+
+    async def send_many(self, payloads: List[bytes]) -> None:
+        await self._limits.upload.write(payloads, self._write)
+
+    async def _write(self, payloads: List[bytes]) -> None:
+        self.writer.writelines(payloads)
         await self.writer.drain()
+
+    async def sendfile(self, file: BinaryIO, offset: int, count: int) -> None:
+        await self._limits.upload.acquire(count)
+        await send_file_on_transport(self.writer.transport, file, offset, count, self._write)
+
+
+class AcceptedTcpClient(TcpClient):
+    """a connection the peer opened to us, it is open already"""
+    def __init__(self, reader: StreamReader, writer: StreamWriter, limits: BandwidthLimits = None):
+        super().__init__(*writer.get_extra_info("peername")[:2], limits)
+        self._reader, self.writer = reader, writer
+
+    async def init(self):
+        pass
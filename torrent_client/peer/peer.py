@@ -1,27 +1,72 @@
 import asyncio
 import logging
 from abc import ABC, abstractmethod
+from contextlib import AsyncExitStack
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
 
-from torrent_client.peer.exceptions import PeerReturnInvalidResponseError, NoPieceNeededError, ChokedWhileRequestingError
+from torrent_client.peer.exceptions import PeerReturnInvalidResponseError, NoPieceNeededError, \
+    ChokedWhileRequestingError, PeerSnubbedError
 from torrent_client.peer.p2p_messages_handling.message_id import MessageID
 from torrent_client.peer.p2p_messages_handling.p2p_messages import HandshakeMessage, Response, BitfieldMessage, InterestedMessage, \
-    HaveMessage, PieceMessage, NotInterestedMessage
+    HaveMessage, PieceMessage, NotInterestedMessage, ChokeMessage, UnchokeMessage, RequestMessage, CancelMessage
 from torrent_client.peer.downloading.peer_bridge import PeerBridge
 from torrent_client.peer.downloading.downloading_manager import AbstractDownloadingManager, DownloadingManager
 from torrent_client.peer.downloading.piece_request import AbstractPieceDownloader
+from torrent_client.peer.downloading.request_pipeline import AbstractRequestPipeline, RequestPipeline
+from torrent_client.peer.p2p_net.clock import AbstractClock, Clock
+from torrent_client.peer.p2p_net.file_block import FileBlock
 from torrent_client.peer.p2p_net.p2p_socket import AbstractP2PSocket, P2PSocket
+from torrent_client.peer.rate_meter import RateMeter
+from torrent_client.peer.uploading.uploader import AbstractUploader, Uploader
 
 logger = logging.getLogger(__name__)
 
-SLEEP_TIME_SEC = 0.01
+# a peer that has our requests and delivers no block for this long is snubbing us, its requests go to other peers
+SNUB_TIMEOUT_SEC = 30
+SNUB_CHECK_INTERVAL_SEC = 1
+# finished pieces of one peer that are hashed and stored at once, no piece is started while more wait for the disk
+MAX_FINISHING_PIECES = 2
 
 
 class AbstractPeer(ABC):
 
+    @abstractmethod
+    async def connect(self) -> None:
+        pass
+
     @abstractmethod
     async def download(self) -> None:
         pass
 
+    @property
+    @abstractmethod
+    def download_rate(self) -> float:
+        pass
+
+    @property
+    @abstractmethod
+    def upload_rate(self) -> float:
+        pass
+
+    @property
+    @abstractmethod
+    def is_peer_interested(self) -> bool:
+        pass
+
+    @property
+    @abstractmethod
+    def is_snubbed(self) -> bool:
+        pass
+
+    @property
+    @abstractmethod
+    def block_latency(self) -> Optional[float]:
+        pass
+
+    @abstractmethod
+    def set_choked(self, choked: bool) -> None:
+        pass
+
 
 class Peer(AbstractPeer):
     def __init__(self,
@@ -32,24 +77,111 @@ class Peer(AbstractPeer):
                  peer_id: str,
                  downloader: PeerBridge,
                  downloading_manager: AbstractDownloadingManager = None,
-                 p2p_socket: AbstractP2PSocket = None
+                 p2p_socket: AbstractP2PSocket = None,
+                 request_pipeline: AbstractRequestPipeline = None,
+                 uploader: AbstractUploader = None,
+                 inbound: bool = False,
+                 download_meter: RateMeter = None,
+                 upload_meter: RateMeter = None,
+                 clock: AbstractClock = None,
+                 snub_timeout: float = SNUB_TIMEOUT_SEC
                  ):
         self._info_hash = info_hash
+        # the peer connected to us, its handshake was read and checked by the listener
+        self._inbound = inbound
         self._peer_id = peer_id.encode()
         self._choked = True
         self._downloading_manager = downloading_manager if downloading_manager \
             else DownloadingManager(bitfield_size, downloader)
         self._p2p_socket = p2p_socket if p2p_socket else P2PSocket(ip, port, bitfield_size)
         self._interested = False
+        self._request_pipeline = request_pipeline if request_pipeline else RequestPipeline()
+        self._uploader = uploader if uploader else Uploader(downloader)
+        # the upload side: the choker decides if we choke the peer, the upload task tells the peer when it changes
+        self._choking = True
+        self._choke_wanted = True
+        self._peer_interested = False
+        self._download_meter = download_meter if download_meter else RateMeter()
+        self._upload_meter = upload_meter if upload_meter else RateMeter()
+        self._clock = clock if clock else Clock()
+        self._snub_timeout = snub_timeout
+        self._snubbed = False
+        self._last_block_time = self._clock.get_time()
+        self._connection: Optional[AsyncExitStack] = None
+        # the pieces we request blocks of, by index, and the finished pieces that are hashed and stored
+        self._piece_downloaders: Dict[int, AbstractPieceDownloader] = {}
+        # the requests of every piece for this round, a new round starts when a piece is updated
+        self._piece_requests: Dict[int, Iterator[RequestMessage]] = {}
+        self._finishing: Set[asyncio.Task] = set()
+        self._handlers: Dict[MessageID, Callable[[Any], None]] = {
+            MessageID.Unchoke: self._on_unchoke,
+            MessageID.Choke: self._on_choke,
+            MessageID.Have: self._on_have,
+            MessageID.Bitfiled: self._on_bitfield,
+            MessageID.Piece: self._on_piece,
+            MessageID.Interested: self._on_interested,
+            MessageID.NotInterested: self._on_not_interested,
+            MessageID.Request: self._on_request,
+            MessageID.Cancel: self._on_cancel,
+        }
 
-    async def download(self) -> None:
+    async def connect(self) -> None:
+        """opens the connection and exchanges handshakes, download connects by itself if this was not called"""
         logger.info("connecting to new peer")
-        async with self._p2p_socket:
+        connection = AsyncExitStack()
+        await connection.enter_async_context(self._p2p_socket)
+        try:
             logger.debug("connection was established")
             await self._send_and_recv_handshake()
-            logger.info("peer handshake stage was completed")
-            logger.info("start downloading session")
-            await self._wait_and_save_pieces()
+        except BaseException:
+            await connection.aclose()
+            raise
+        self._connection = connection
+        logger.info("peer handshake stage was completed")
+
+    async def download(self) -> None:
+        try:
+            if not self._connection:
+                await self.connect()
+            async with self._connection:
+                logger.info("start downloading session")
+                upload_task = asyncio.create_task(self._upload())
+                session_task = asyncio.create_task(self._download_and_seed())
+                try:
+                    done, _ = await asyncio.wait((upload_task, session_task), return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                finally:
+                    upload_task.cancel()
+                    session_task.cancel()
+        finally:
+            self._downloading_manager.close()
+
+    @property
+    def download_rate(self) -> float:
+        return self._download_meter.rate
+
+    @property
+    def upload_rate(self) -> float:
+        return self._upload_meter.rate
+
+    @property
+    def is_peer_interested(self) -> bool:
+        return self._peer_interested
+
+    @property
+    def is_snubbed(self) -> bool:
+        return self._snubbed
+
+    @property
+    def block_latency(self) -> Optional[float]:
+        """smoothed seconds from a request to its block, None before the first block"""
+        return self._request_pipeline.smoothed_rtt
+
+    def set_choked(self, choked: bool) -> None:
+        if choked != self._choke_wanted:
+            self._choke_wanted = choked
+            self._uploader.notify_update()
 
     async def _send_and_recv_handshake(self) -> None:
         message = HandshakeMessage(
@@ -57,77 +189,284 @@ class Peer(AbstractPeer):
             peer_id=self._peer_id,
         )
         await self._p2p_socket.send(message, MessageID.Handshake)
+        if self._inbound:
+            return
         response = await self._p2p_socket.read_handshake()
         self._check_handshake_info_hash(response)
 
+    async def _download_and_seed(self) -> None:
+        await self._wait_and_save_pieces()
+        # the peer may still need our pieces after we have nothing to get from it
+        while self._peer_interested:
+            self._handle_responses(await self._p2p_socket.read_batch())
+
     async def _wait_and_save_pieces(self) -> None:
         await self._listen_until_can_request_piece()
         while not self._downloading_manager.is_end_downloading():
             try:
-                await self._get_and_save_piece()
+                await self._get_and_save_pieces()
+            except PeerSnubbedError:
+                logger.info(f"peer delivered nothing for {self._snub_timeout} seconds, its requests go to other peers")
+                await self._listen_until_can_request_piece()
             except (NoPieceNeededError, ChokedWhileRequestingError):
                 await self._listen_until_can_request_piece()
 
     async def _listen_until_can_request_piece(self) -> None:
-        async for response in self._p2p_socket:
-            logger.debug("new response")
-            self._check_and_use_regular_responses(response)
+        while True:
+            self._handle_responses(await self._p2p_socket.read_batch())
             await self._update_interested_state()
             if (not self._choked) and self._interested:
                 logger.debug("peer can request pieces")
                 return
 
-    async def _get_and_save_piece(self) -> None:
-        with self._downloading_manager.create_piece_downloader() as piece_downloader:
-            logger.info("downloading was assigned to peer")
-            await asyncio.gather(
-                self._request_piece(piece_downloader), self._recv_piece_from_peer(piece_downloader)
+    async def _get_and_save_pieces(self) -> None:
+        """
+        requests blocks of as many pieces as the window has room for, the next piece is started before the last
+        one is done, and finished pieces are hashed and stored while the requests go on
+        """
+        request_task = asyncio.create_task(self._request_pieces())
+        recv_task = asyncio.create_task(self._recv_pieces_from_peer())
+        snub_task = asyncio.create_task(self._watch_for_snub())
+        self._last_block_time = self._clock.get_time()
+        try:
+            done, _ = await asyncio.wait(
+                (request_task, recv_task, snub_task), return_when=asyncio.FIRST_COMPLETED
             )
-        logger.info("we downloaded the full downloading")
+            for task in done:
+                task.result()
+        except PeerSnubbedError:
+            await self._cancel_outstanding_requests()
+            self._snubbed = True
+            self._request_pipeline.snub()
+            raise
+        finally:
+            request_task.cancel()
+            recv_task.cancel()
+            snub_task.cancel()
+            self._request_pipeline.reset()
+            await self._close_pieces()
 
-    async def _recv_piece_from_peer(self, piece_downloader: AbstractPieceDownloader) -> None:
+    async def _recv_pieces_from_peer(self) -> None:
         logger.info("start receiving blocks")
-        async for response in self._p2p_socket:
-            self._check_and_use_regular_responses(response)
-            self._add_piece_if_needed(piece_downloader, response)
+        while True:
+            self._handle_responses(await self._p2p_socket.read_batch())
             if self._choked:
+                self._request_pipeline.reset()
                 raise ChokedWhileRequestingError()
-            if piece_downloader.is_piece_complete():
-                return
+            self._finish_done_pieces()
 
-    async def _request_piece(self, piece_downloader: AbstractPieceDownloader) -> None:
+    async def _request_pieces(self) -> None:
         logger.info("start sending block requests")
-        for message in piece_downloader:
-            await self._p2p_socket.send(message, MessageID.Request)
-            logger.debug(f"we sent block request to peer: {message}")
-            await asyncio.sleep(SLEEP_TIME_SEC)
-        logger.info("all block requests were send")
+        # blocks are requested while no other peer requested them, more rounds are needed when blocks other peers
+        # requested become free again, in endgame, or when a piece was found corrupted and started over
+        while True:
+            self._check_finishing()
+            await self._send_cancels()
+            await self._request_pipeline.wait_for_free_slot()
+            message = self._next_request()
+            if message:
+                self._request_pipeline.on_request_sent(message)
+                await self._p2p_socket.send(message, MessageID.Request)
+                logger.debug(f"we sent block request to peer: {message}, "
+                             f"window size: {self._request_pipeline.window_size}")
+                continue
+            if not self._piece_downloaders and not self._finishing and \
+                    self._downloading_manager.is_end_downloading():
+                return
+            if not await self._start_piece():
+                await self._wait_for_pieces_update()
+                self._finish_done_pieces()
+
+    def _next_request(self) -> Optional[RequestMessage]:
+        """the pieces that were started first are completed first"""
+        for index, piece_downloader in self._piece_downloaders.items():
+            if index not in self._piece_requests:
+                self._piece_requests[index] = iter(piece_downloader)
+            message = next(self._piece_requests[index], None)
+            if message:
+                return message
+        return None
+
+    async def _start_piece(self) -> bool:
+        """:return if a piece was started, none is while the disk is behind or the peer has no piece we need"""
+        if len(self._finishing) >= MAX_FINISHING_PIECES:
+            return False
+        piece_downloader = self._downloading_manager.create_piece_downloader()
+        try:
+            await piece_downloader.__aenter__()
+        except NoPieceNeededError:
+            if self._piece_downloaders or self._finishing:
+                return False
+            raise
+        if piece_downloader.piece_index in self._piece_downloaders:
+            # in endgame the piece shared with the fewest peers may be ours already
+            await piece_downloader.__aexit__(None, None, None)
+            return False
+        logger.info(f"piece {piece_downloader.piece_index} was assigned to peer")
+        self._piece_downloaders[piece_downloader.piece_index] = piece_downloader
+        return True
+
+    async def _wait_for_pieces_update(self) -> None:
+        """waits for a block of a piece we request, or for a finished piece to be stored"""
+        waiters = [
+            asyncio.ensure_future(piece_downloader.wait_for_update())
+            for piece_downloader in self._piece_downloaders.values()
+        ]
+        try:
+            await asyncio.wait(waiters + list(self._finishing), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        self._piece_requests.clear()
+
+    def _finish_done_pieces(self) -> None:
+        for index, piece_downloader in list(self._piece_downloaders.items()):
+            if piece_downloader.is_done():
+                del self._piece_downloaders[index]
+                self._piece_requests.pop(index, None)
+                self._start_finishing(piece_downloader)
+
+    def _start_finishing(self, piece_downloader: AbstractPieceDownloader, send_cancels: bool = True) -> None:
+        self._finishing.add(asyncio.create_task(self._finish_piece(piece_downloader, send_cancels)))
+
+    async def _finish_piece(self, piece_downloader: AbstractPieceDownloader, send_cancels: bool) -> None:
+        """hashes and stores a complete piece, or gives the blocks of an incomplete one back to the other peers"""
+        if send_cancels:
+            await self._send_cancels(piece_downloader)
+        await piece_downloader.__aexit__(None, None, None)
+        logger.info(f"we are done with piece {piece_downloader.piece_index}")
+
+    def _check_finishing(self) -> None:
+        """raises the error of a piece that failed to finish, a corrupted one ends the connection"""
+        for task in [task for task in self._finishing if task.done()]:
+            self._finishing.discard(task)
+            task.result()
+
+    async def _close_pieces(self) -> None:
+        """the pieces are left when the requests stop, complete ones are still stored"""
+        for piece_downloader in self._piece_downloaders.values():
+            self._start_finishing(piece_downloader, send_cancels=False)
+        self._piece_downloaders.clear()
+        self._piece_requests.clear()
+        finishing, self._finishing = list(self._finishing), set()
+        for result in await asyncio.gather(*finishing, return_exceptions=True):
+            if isinstance(result, Exception):
+                raise result
+
+    async def _watch_for_snub(self) -> None:
+        while True:
+            await asyncio.sleep(min(SNUB_CHECK_INTERVAL_SEC, self._snub_timeout))
+            idle_time = self._clock.get_time() - self._last_block_time
+            if self._request_pipeline.outstanding and idle_time >= self._snub_timeout:
+                raise PeerSnubbedError()
+
+    async def _cancel_outstanding_requests(self) -> None:
+        """the blocks go to other peers, so the peer is told not to send them"""
+        for request in self._request_pipeline.outstanding_requests():
+            self._request_pipeline.on_request_cancelled(request.piece_index, request.block_offset)
+            await self._p2p_socket.send(
+                CancelMessage(request.piece_index, request.block_offset, request.size), MessageID.Cancel
+            )
+
+    async def _send_cancels(self, piece_downloader: AbstractPieceDownloader = None) -> None:
+        """sends the cancels of one piece, or of all the pieces we request"""
+        piece_downloaders = [piece_downloader] if piece_downloader else list(self._piece_downloaders.values())
+        for piece_downloader in piece_downloaders:
+            for message in piece_downloader.pop_cancels():
+                self._request_pipeline.on_request_cancelled(message.piece_index, message.block_offset)
+                await self._p2p_socket.send(message, MessageID.Cancel)
+                logger.debug(f"block was received from another peer, cancel request: {message}")
+
+    async def _upload(self) -> None:
+        """tells the peer about the pieces we have and serves its requests"""
+        bitfield = self._uploader.create_bitfield()
+        try:
+            if bitfield:
+                await self._p2p_socket.send(BitfieldMessage(bitfield), MessageID.Bitfiled)
+            while True:
+                for index in self._uploader.pop_new_pieces():
+                    await self._p2p_socket.send(HaveMessage(index), MessageID.Have)
+                await self._update_choking_state()
+                message = await self._uploader.next_block()
+                if not message:
+                    continue
+                if self._choking:
+                    if isinstance(message.block, FileBlock):
+                        message.block.release()
+                    continue
+                if isinstance(message.block, FileBlock):
+                    await self._p2p_socket.send_file_block(message.index, message.begin, message.block)
+                    self._upload_meter.add(message.block.size)
+                else:
+                    await self._p2p_socket.send(message, MessageID.Piece)
+                    self._upload_meter.add(len(message.block))
+        finally:
+            self._uploader.close()
+
+    async def _update_choking_state(self) -> None:
+        if not self._choke_wanted and self._choking:
+            logger.debug("unchoking peer")
+            await self._p2p_socket.send(UnchokeMessage(), MessageID.Unchoke)
+            self._choking = False
+        elif self._choke_wanted and not self._choking:
+            logger.debug("choking peer")
+            self._uploader.clear()
+            await self._p2p_socket.send(ChokeMessage(), MessageID.Choke)
+            self._choking = True
 
     def _check_handshake_info_hash(self, response: Response) -> None:
         message: HandshakeMessage = response.message
         if not message.info_hash == self._info_hash:
             raise PeerReturnInvalidResponseError("peer return hand shake with wrong info_hash")
 
-    def _check_and_use_regular_responses(self, response: Response) -> None:
-        logger.debug(f"we got new response {response}")
-        if response.id == MessageID.Unchoke:
-            self._choked = False
-        elif response.id == MessageID.Choke:
-            self._choked = True
-        elif response.id == MessageID.Have:
-            message: HaveMessage = response.message
+    def _handle_responses(self, responses: List[Response]) -> None:
+        logger.debug(f"we got {len(responses)} new responses")
+        for response in responses:
+            handler = self._handlers.get(response.id)
+            if handler:
+                handler(response.message)
+
+    def _on_unchoke(self, message: UnchokeMessage) -> None:
+        self._choked = False
+
+    def _on_choke(self, message: ChokeMessage) -> None:
+        self._choked = True
+
+    def _on_have(self, message: HaveMessage) -> None:
+        try:
             self._downloading_manager.notify_new_piece(message.index)
-        elif response.id == MessageID.Bitfiled:
-            message: BitfieldMessage = response.message
-            self._downloading_manager.set_bitfiled(message.bit_field)
-            logger.info("we got bitfield")
-
-    @staticmethod
-    def _add_piece_if_needed(piece_downloader: AbstractPieceDownloader, response: Response) -> None:
-        if response.id == MessageID.Piece:
-            logger.debug("new block was added")
-            message: PieceMessage = response.message
-            piece_downloader.add_block(message.block, message.index)
+        except IndexError as e:
+            raise PeerReturnInvalidResponseError(f"peer has piece {message.index} that is not in the torrent") from e
+
+    def _on_bitfield(self, message: BitfieldMessage) -> None:
+        self._downloading_manager.set_bitfiled(message.bit_field)
+        logger.info("we got bitfield")
+
+    def _on_piece(self, message: PieceMessage) -> None:
+        # blocks that arrive after their piece was left are dropped
+        self._download_meter.add(len(message.block))
+        self._last_block_time = self._clock.get_time()
+        self._snubbed = False
+        piece_downloader = self._piece_downloaders.get(message.index)
+        if piece_downloader:
+            self._request_pipeline.on_block_received(message.index, message.begin, len(message.block))
+            piece_downloader.add_block(message.index, message.begin, message.block)
+
+    def _on_interested(self, message: InterestedMessage) -> None:
+        self._peer_interested = True
+        self._uploader.notify_update()
+
+    def _on_not_interested(self, message: NotInterestedMessage) -> None:
+        self._peer_interested = False
+        self._uploader.notify_update()
+
+    def _on_request(self, message: RequestMessage) -> None:
+        # requests sent before the peer saw our choke are dropped
+        if not self._choking:
+            self._uploader.add_request(message)
+
+    def _on_cancel(self, message: CancelMessage) -> None:
+        self._uploader.cancel_request(message)
 
     async def _update_interested_state(self) -> None:
         logger.debug((not self._interested) and self._downloading_manager.has_available_piece())
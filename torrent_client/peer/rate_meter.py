@@ -0,0 +1,34 @@
+import math
+
+from torrent_client.peer.p2p_net.clock import AbstractClock, Clock
+
+RATE_WINDOW_SEC = 20
+
+
+class RateMeter:
+    """
+    bytes per second of one direction of a connection.
+    the rate is a moving average that forgets old traffic exponentially, window seconds is its time constant
+    """
+    def __init__(self, window: float = RATE_WINDOW_SEC, clock: AbstractClock = None):
+        self._window = window
+        self._clock = clock if clock else Clock()
+        self._rate = 0.0
+        self._last_update = self._clock.get_time()
+        self.total = 0
+
+    def add(self, size: int) -> None:
+        self._decay()
+        self._rate += size / self._window
+        self.total += size
+
+    @property
+    def rate(self) -> float:
+        self._decay()
+        return self._rate
+
+    def _decay(self) -> None:
+        now = self._clock.get_time()
+        if now > self._last_update:
+            self._rate *= math.exp((self._last_update - now) / self._window)
+            self._last_update = now
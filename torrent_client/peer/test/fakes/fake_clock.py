@@ -1,11 +1,18 @@
+import asyncio
+from typing import Awaitable
+
 from torrent_client.peer.p2p_net.clock import AbstractClock
 from torrent_client.peer.exceptions import PeerTimeOutError
 
+WAIT_FOR_TIMEOUT = 0.01
+
 
 class FakeClock(AbstractClock):
     def __init__(self):
         self.timeout = -1
         self._time_waited = 0
+        self.current_time = 0
+        self.timeouts = []
 
     async def sleep(self, sec: float) -> None:
         if self.timeout == -1:
@@ -14,8 +21,19 @@ class FakeClock(AbstractClock):
         if self.timeout <= self._time_waited:
             raise PeerTimeOutError()
 
+    async def wait_for(self, awaitable: Awaitable):
+        if self.timeout == -1:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, WAIT_FOR_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise PeerTimeOutError()
+
     def set_timeout(self, timeout: float) -> None:
-        pass
+        self.timeouts.append(timeout)
 
     def reset(self):
         self._time_waited = 0
+
+    def get_time(self) -> float:
+        return self.current_time
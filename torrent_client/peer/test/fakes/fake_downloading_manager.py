@@ -1,7 +1,7 @@
-from typing import List
-
+from torrent_client.peer.downloading.bitset import Bitset
 from torrent_client.peer.downloading.downloading_manager import AbstractDownloadingManager
 from torrent_client.peer.downloading.piece_request import AbstractPieceDownloader
+from torrent_client.peer.test.fakes.fake_piece_downloader import FakePieceDownloader
 
 
 class FakeDownloadingManager(AbstractDownloadingManager):
@@ -10,11 +10,18 @@ class FakeDownloadingManager(AbstractDownloadingManager):
         self.bit_field_response = None
         self.is_have_available_piece_res = True
         self.piece_downloader = None
+        # given before piece_downloader, one after the other
+        self.piece_downloaders = []
+        self.closed = False
 
     def create_piece_downloader(self) -> AbstractPieceDownloader:
-        return self.piece_downloader
+        # every downloader is given once, like a piece that is occupied once picked
+        if self.piece_downloaders:
+            return self.piece_downloaders.pop(0)
+        piece_downloader, self.piece_downloader = self.piece_downloader, None
+        return piece_downloader if piece_downloader else FakePieceDownloader(no_piece=True)
 
-    def set_bitfiled(self, bitfiled: List[bool]):
+    def set_bitfiled(self, bitfiled: Bitset):
         self.bit_field_response = bitfiled
 
     def notify_new_piece(self, index: int):
@@ -25,3 +32,6 @@ class FakeDownloadingManager(AbstractDownloadingManager):
 
     def is_end_downloading(self) -> bool:
         return False
+
+    def close(self) -> None:
+        self.closed = True
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Sequence
 
 from torrent_client.peer.p2p_messages_handling.message_id import MessageID
 from torrent_client.peer.p2p_messages_handling.p2p_messages import Response
@@ -22,7 +22,13 @@ class FakeP2PCodec(AbstractP2PCodec):
         return self.decode_response
 
     def encode(self, message: Any, message_id: MessageID) -> bytes:
-        pass
+        return message
+
+    def encode_payloads(self, message: Any, message_id: MessageID) -> Sequence[bytes]:
+        return (message,)
+
+    def encode_piece_header(self, index: int, begin: int, block_size: int) -> bytes:
+        return b"header"
 
     def decode_response_length(self, payload: bytes) -> int:
         self.length_received = payload
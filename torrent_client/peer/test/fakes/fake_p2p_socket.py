@@ -1,8 +1,9 @@
 import asyncio
-from typing import Any
+from typing import Any, List
 
 from torrent_client.peer.p2p_messages_handling.message_id import MessageID
-from torrent_client.peer.p2p_messages_handling.p2p_messages import Response
+from torrent_client.peer.p2p_messages_handling.p2p_messages import Response, PieceMessage
+from torrent_client.peer.p2p_net.file_block import FileBlock
 from torrent_client.peer.p2p_net.p2p_socket import AbstractP2PSocket
 
 
@@ -15,6 +16,7 @@ class FakeP2PSocket(AbstractP2PSocket):
 
     def __init__(self):
         self.sent_message = None
+        self.sent_messages = []
         self.next_response = None
         self._have_sent_new_message = False
 
@@ -32,6 +34,9 @@ class FakeP2PSocket(AbstractP2PSocket):
         next_message, self.next_response = self.next_response, None
         return next_message
 
+    async def read_batch(self) -> List[Response]:
+        return [await self.read()]
+
     async def read_handshake(self) -> Response:
         return await self.read()
 
@@ -44,3 +49,7 @@ class FakeP2PSocket(AbstractP2PSocket):
     async def send(self, message: Any, message_id: MessageID) -> None:
         self._have_sent_new_message = True
         self.sent_message = message
+        self.sent_messages.append(message)
+
+    async def send_file_block(self, index: int, begin: int, block: FileBlock) -> None:
+        await self.send(PieceMessage(index, begin, block), MessageID.Piece)
@@ -0,0 +1,54 @@
+import asyncio
+from typing import Optional
+
+from torrent_client.peer.peer import AbstractPeer
+
+
+class FakePeer(AbstractPeer):
+    def __init__(self, ip: str, port: int):
+        self.ip = ip
+        self.port = port
+        self.connect_error: Optional[Exception] = None
+        self.connected = asyncio.Event()
+        self.allow_connect = asyncio.Event()
+        self.allow_connect.set()
+        self.disconnect = asyncio.Event()
+        self.client = None
+        self.download_rate_value = 0.0
+        self.upload_rate_value = 0.0
+        self.interested = False
+        self.choked = True
+        self.snubbed = False
+        self.block_latency_value: Optional[float] = None
+
+    async def connect(self) -> None:
+        await self.allow_connect.wait()
+        if self.connect_error:
+            raise self.connect_error
+        self.connected.set()
+
+    async def download(self) -> None:
+        await self.disconnect.wait()
+
+    @property
+    def download_rate(self) -> float:
+        return self.download_rate_value
+
+    @property
+    def upload_rate(self) -> float:
+        return self.upload_rate_value
+
+    @property
+    def is_peer_interested(self) -> bool:
+        return self.interested
+
+    @property
+    def is_snubbed(self) -> bool:
+        return self.snubbed
+
+    @property
+    def block_latency(self) -> Optional[float]:
+        return self.block_latency_value
+
+    def set_choked(self, choked: bool) -> None:
+        self.choked = choked
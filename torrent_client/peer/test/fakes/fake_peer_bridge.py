@@ -1,27 +1,89 @@
 import asyncio
-from typing import List
+from typing import Callable, List, Optional
 
+from torrent_client.peer.downloading.bitset import Bitset
 from torrent_client.peer.downloading.peer_bridge import PeerBridge
 from torrent_client.peer.downloading.piece_bitfield_info import PieceBitfieldInfo
+from torrent_client.peer.exceptions import InvalidBlockRequestError
+from torrent_client.peer.p2p_net.file_block import FileBlock
 
 
 class FakePeerBridge(PeerBridge):
     def __init__(self):
         self.piece_info = None
         self.available_piece_to_download = []
+        self.pieces_count = 0
+        self.peers_availability = []
+        self.pieces_availability = []
         self.locked_index = None
         self.unlocked_index = None
         self.blocks = []
+        self.endgame = False
+        self.downloaded_pieces = Bitset(0)
+        self.pieces_data = {}
+        self.read_ahead_indexes = []
+        self.block_files = {}
+        # when set, the stored pieces are not written until on_stored is called by the test
+        self.hold_stored = False
+        self.on_stored = []
+        self.stored_listeners = []
 
-    def store_piece(self, piece: bytes, piece_index: int) -> None:
-        self.blocks.append((piece, piece_index))
+    async def store_piece(self, piece: bytes, piece_index: int, on_stored: Optional[Callable[[], None]] = None) -> None:
+        self.blocks.append((bytes(piece), piece_index))
+        if on_stored:
+            self.on_stored.append(on_stored)
+            if not self.hold_stored:
+                on_stored()
 
     def get_needed_pieces_indexes(self) -> List[int]:
         return self.available_piece_to_download
 
+    def get_needed_pieces(self) -> Bitset:
+        return Bitset.from_indexes(self.pieces_count, self.available_piece_to_download)
+
     def occupy_piece(self, index: int) -> PieceBitfieldInfo:
         self.locked_index = index
         return self.piece_info
 
     def unlock_piece(self, index: int):
         self.unlocked_index = index
+
+    def pick_piece(self, peer_bitfield: Bitset) -> Optional[PieceBitfieldInfo]:
+        index = (self.get_needed_pieces() & peer_bitfield).first_set()
+        if index is None:
+            return None
+        return self.occupy_piece(index)
+
+    def is_endgame(self) -> bool:
+        return self.endgame
+
+    def add_peer_availability(self, bitfield: Bitset) -> None:
+        self.peers_availability.append(bitfield)
+
+    def remove_peer_availability(self, bitfield: Bitset) -> None:
+        self.peers_availability.remove(bitfield)
+
+    def add_piece_availability(self, index: int) -> None:
+        self.pieces_availability.append(index)
+
+    def get_downloaded_pieces(self) -> Bitset:
+        return self.downloaded_pieces
+
+    def add_stored_listener(self, listener: Callable[[], None]) -> None:
+        self.stored_listeners.append(listener)
+
+    def remove_stored_listener(self, listener: Callable[[], None]) -> None:
+        self.stored_listeners.remove(listener)
+
+    async def read_block(self, index: int, begin: int, length: int) -> bytes:
+        if index not in self.pieces_data:
+            raise InvalidBlockRequestError()
+        return self.pieces_data[index][begin:begin + length]
+
+    async def get_block_file(self, index: int, begin: int, length: int) -> Optional[FileBlock]:
+        if index not in self.block_files:
+            return None
+        return FileBlock(self.block_files[index], begin, length)
+
+    def read_ahead(self, index: int) -> None:
+        self.read_ahead_indexes.append(index)
@@ -1,23 +1,60 @@
+import asyncio
+from typing import List, Optional
+
 from torrent_client.peer.downloading.piece_request import AbstractPieceDownloader
+from torrent_client.peer.exceptions import NoPieceNeededError
+from torrent_client.peer.p2p_messages_handling.p2p_messages import CancelMessage
 
 
 class FakePieceDownloader(AbstractPieceDownloader):
-    def __init__(self):
+    def __init__(self, index: int = 0, no_piece: bool = False):
+        self.index = index
+        self.no_piece = no_piece
         self.is_piece_complete_res = False
         self.requests = []
         self.blocks = []
+        self.cancels = []
+        self.exited = False
+        # the exit, where a complete piece is hashed and stored, waits for it when set
+        self.allow_exit: Optional[asyncio.Event] = None
+        self._updated = asyncio.Event()
 
-    def __enter__(self):
+    async def __aenter__(self):
+        if self.no_piece:
+            raise NoPieceNeededError()
         return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
+    @property
+    def piece_index(self) -> int:
+        return self.index
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.allow_exit:
+            await self.allow_exit.wait()
+        self.exited = True
 
     def __iter__(self):
-        return self.requests.__iter__()
+        # like the real downloader, a request is only handed out once
+        requests, self.requests = self.requests, []
+        return requests.__iter__()
 
     def is_piece_complete(self) -> bool:
         return self.is_piece_complete_res
 
-    def add_block(self, block: bytes, index: int):
-        self.blocks.append(block)
\ No newline at end of file
+    def is_done(self) -> bool:
+        return self.is_piece_complete_res
+
+    def add_block(self, index: int, begin: int, block: bytes):
+        self.blocks.append(block)
+        self._updated.set()
+
+    def pop_cancels(self) -> List[CancelMessage]:
+        cancels, self.cancels = self.cancels, []
+        return cancels
+
+    def notify_update(self) -> None:
+        self._updated.set()
+
+    async def wait_for_update(self) -> None:
+        await self._updated.wait()
+        self._updated.clear()
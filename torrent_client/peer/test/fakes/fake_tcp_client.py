@@ -1,3 +1,6 @@
+import asyncio
+from typing import BinaryIO, List
+
 from torrent_client.peer.p2p_net.tcp_client import AbstractTcpClient
 
 
@@ -6,7 +9,13 @@ class FakeTcpClient(AbstractTcpClient):
     def __init__(self):
         self.data = b""
         self.send_list = []
+        # the payloads of every send_many, before they are joined
+        self.send_many_payloads = []
         self.response_size = 1
+        self.closed_by_peer = False
+        self.send_error = None
+        self.allow_send = asyncio.Event()
+        self.allow_send.set()
 
     def close(self):
         pass
@@ -15,8 +24,23 @@ class FakeTcpClient(AbstractTcpClient):
         pass
 
     async def recv(self, size: int) -> bytes:
+        while not self.data:
+            if self.closed_by_peer:
+                return b""
+            await asyncio.sleep(0.01)
         self.data, result = self.data[self.response_size:], self.data[:self.response_size]
         return result
 
-    def send(self, payload: bytes) -> None:
+    async def send(self, payload: bytes) -> None:
+        await self.allow_send.wait()
+        if self.send_error:
+            raise self.send_error
         self.send_list.append(payload)
+
+    async def send_many(self, payloads: List[bytes]) -> None:
+        self.send_many_payloads.append(list(payloads))
+        await super().send_many(payloads)
+
+    async def sendfile(self, file: BinaryIO, offset: int, count: int) -> None:
+        await self.allow_send.wait()
+        self.send_list.append((file, offset, count))
@@ -0,0 +1,49 @@
+import asyncio
+from typing import List, Optional
+
+from torrent_client.peer.downloading.bitset import Bitset
+from torrent_client.peer.p2p_messages_handling.p2p_messages import RequestMessage, CancelMessage, PieceMessage
+from torrent_client.peer.uploading.uploader import AbstractUploader
+
+
+class FakeUploader(AbstractUploader):
+    def __init__(self):
+        self.bitfield = None
+        self.new_pieces = []
+        self.requests = []
+        self.cancels = []
+        self.cleared = False
+        self.closed = False
+        self._updated = asyncio.Event()
+
+    def create_bitfield(self) -> Optional[Bitset]:
+        return self.bitfield
+
+    def pop_new_pieces(self) -> List[int]:
+        new_pieces, self.new_pieces = self.new_pieces, []
+        return new_pieces
+
+    def add_request(self, message: RequestMessage) -> None:
+        self.requests.append(message)
+        self._updated.set()
+
+    def cancel_request(self, message: CancelMessage) -> None:
+        self.cancels.append(message)
+
+    def clear(self) -> None:
+        self.cleared = True
+        self.requests = []
+
+    def notify_update(self) -> None:
+        self._updated.set()
+
+    async def next_block(self) -> Optional[PieceMessage]:
+        await self._updated.wait()
+        self._updated.clear()
+        if not self.requests:
+            return None
+        request = self.requests.pop(0)
+        return PieceMessage(request.piece_index, request.block_offset, bytes(request.size))
+
+    def close(self) -> None:
+        self.closed = True
@@ -0,0 +1,66 @@
+import pytest
+
+from torrent_client.peer.downloading.bitset import Bitset
+
+
+class TestUnitBitset:
+    def test_from_bytes_high_bit_first(self):
+        bitset = Bitset.from_bytes(bytes([0b10100000, 0b01000000]), 10)
+        assert list(bitset.set_indexes()) == [0, 2, 9]
+        assert bitset[0] and not bitset[1]
+
+    def test_to_bytes_pad_last_byte(self):
+        bitset = Bitset.from_indexes(10, [0, 2, 9])
+        assert bitset.to_bytes() == bytes([0b10100000, 0b01000000])
+
+    @pytest.mark.parametrize("size", [1, 7, 8, 9, 100])
+    def test_bytes_round_trip(self, size):
+        bitset = Bitset.from_indexes(size, range(0, size, 3))
+        assert Bitset.from_bytes(bitset.to_bytes(), size) == bitset
+
+    def test_spare_bits_ignored(self):
+        bitset = Bitset.from_bytes(bytes([0xff]), 3)
+        assert bitset.count() == 3
+        assert bitset == Bitset.full(3)
+
+    def test_set_and_clear(self):
+        bitset = Bitset(20)
+        bitset.set(13)
+        assert bitset[13]
+        assert bitset.count() == 1
+        bitset.clear(13)
+        assert not bitset.any()
+
+    def test_and_and_not(self):
+        needed = Bitset.from_indexes(8, [1, 2, 3])
+        peer = Bitset.from_indexes(8, [3, 4])
+        assert list((needed & peer).set_indexes()) == [3]
+        assert list((needed - peer).set_indexes()) == [1, 2]
+        assert list((needed | peer).set_indexes()) == [1, 2, 3, 4]
+
+    def test_first_set(self):
+        bitset = Bitset.from_indexes(100, [5, 64, 99])
+        assert bitset.first_set() == 5
+        assert bitset.first_set(6) == 64
+        assert bitset.first_set(65) == 99
+        assert Bitset(100).first_set() is None
+        assert bitset.first_set(100) is None
+
+    @pytest.mark.parametrize("index", [-1, 20, 100])
+    def test_index_out_of_range_raises(self, index):
+        bitset = Bitset(20)
+        with pytest.raises(IndexError):
+            bitset.set(index)
+        with pytest.raises(IndexError):
+            bitset.clear(index)
+        with pytest.raises(IndexError):
+            bitset[index]
+        assert len(bitset) == 20 and not bitset.any()
+
+    def test_copy_is_independent(self):
+        bitset = Bitset.from_indexes(10, [1])
+        copy = bitset.copy()
+        copy.set(2)
+        copy.clear(1)
+        assert list(bitset.set_indexes()) == [1]
+        assert list(copy.set_indexes()) == [2]
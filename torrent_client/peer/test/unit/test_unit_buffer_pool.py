@@ -0,0 +1,24 @@
+from torrent_client.peer.downloading.buffer_pool import BufferPool
+
+
+class TestUnitBufferPool:
+    def test_reuse_released_buffer(self):
+        pool = BufferPool()
+        buffer = pool.acquire(10)
+        assert len(buffer) == 10
+        pool.release(buffer)
+        assert pool.free_count(10) == 1
+        assert pool.acquire(10) is buffer
+        assert pool.free_count(10) == 0
+
+    def test_buffers_are_kept_by_size(self):
+        pool = BufferPool()
+        pool.release(bytearray(5))
+        assert len(pool.acquire(10)) == 10
+        assert pool.free_count(5) == 1
+
+    def test_free_buffers_are_capped(self):
+        pool = BufferPool(max_free_buffers_per_size=1)
+        pool.release(bytearray(10))
+        pool.release(bytearray(10))
+        assert pool.free_count(10) == 1
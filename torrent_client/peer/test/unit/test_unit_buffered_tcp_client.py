@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+
+from torrent_client.peer.p2p_net.buffered_tcp_client import BufferedTcpClient, READ_HIGH_WATERMARK
+from torrent_client.peer.p2p_net.rate_limiter import BandwidthLimits, BURST_SEC
+from torrent_client.peer.p2p_net.receive_buffer import ReceiveBuffer
+
+
+async def start_loopback_server(payload: bytes):
+    received = []
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        received.append(await reader.readexactly(4))
+        writer.write(payload)
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, port, received
+
+
+async def read_all(client: BufferedTcpClient, buffer: ReceiveBuffer, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        if not await client.recv_into(buffer, size):
+            break
+        data += bytes(buffer.peek(len(buffer)))
+        buffer.consume(len(buffer))
+    return data
+
+
+class TestUnitBufferedTcpClient:
+    @pytest.mark.asyncio
+    async def test_receive_into_buffer(self):
+        payload = bytes(range(256)) * 100
+        server, port, received = await start_loopback_server(payload)
+        buffer = ReceiveBuffer()
+        client = BufferedTcpClient("127.0.0.1", port, buffer)
+        await client.init()
+        await client.send(b"ping")
+        assert await read_all(client, buffer, len(payload)) == payload
+        assert received == [b"ping"]
+        client.close()
+        server.close()
+        await server.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_pause_reading_when_buffer_full(self):
+        payload = bytes(READ_HIGH_WATERMARK * 8)
+        server, port, received = await start_loopback_server(payload)
+        buffer = ReceiveBuffer()
+        client = BufferedTcpClient("127.0.0.1", port, buffer)
+        await client.init()
+        await client.send(b"ping")
+        await client.recv_into(buffer, 1)
+        await asyncio.sleep(0.1)
+        assert READ_HIGH_WATERMARK <= len(buffer) < len(payload)
+        buffered = len(buffer)
+        buffer.consume(buffered)
+        assert len(await read_all(client, buffer, len(payload))) == len(payload) - buffered
+        client.close()
+        server.close()
+        await server.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_closed_connection_return_nothing(self):
+        server, port, received = await start_loopback_server(b"")
+        buffer = ReceiveBuffer()
+        client = BufferedTcpClient("127.0.0.1", port, buffer)
+        await client.init()
+        await client.send(b"ping")
+        assert await asyncio.wait_for(client.recv_into(buffer, 1), 1) == 0
+        client.close()
+        server.close()
+        await server.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_download_limit_pauses_reading(self):
+        rate = 1_000_000
+        payload = bytes(rate * BURST_SEC + rate // 4)
+        server, port, received = await start_loopback_server(payload)
+        buffer = ReceiveBuffer()
+        client = BufferedTcpClient("127.0.0.1", port, buffer, BandwidthLimits().child(download_rate=rate))
+        await client.init()
+        await client.send(b"ping")
+        start = time.monotonic()
+        assert len(await read_all(client, buffer, len(payload))) == len(payload)
+        # the burst arrives at once, the rest at the rate
+        assert time.monotonic() - start >= 0.2
+        client.close()
+        server.close()
+        await server.wait_closed()
@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 from torrent_client.peer.p2p_net.clock import Clock
@@ -42,4 +44,25 @@ class TestUnitClock:
         with pytest.raises(PeerTimeOutError):
             await clock.sleep(0.2)
 
+    @pytest.mark.asyncio
+    async def test_wait_for_return_result(self):
+        clock = Clock()
+        clock.set_timeout(0.2)
+        assert await clock.wait_for(asyncio.sleep(0.05, result=1)) == 1
 
+    @pytest.mark.asyncio
+    async def test_wait_for_more_then_timeout(self):
+        clock = Clock()
+        clock.set_timeout(0.1)
+        with pytest.raises(PeerTimeOutError):
+            await clock.wait_for(asyncio.sleep(0.3))
+
+    @pytest.mark.asyncio
+    async def test_wait_for_share_deadline_until_reset(self):
+        clock = Clock()
+        clock.set_timeout(0.2)
+        await clock.wait_for(asyncio.sleep(0.15))
+        with pytest.raises(PeerTimeOutError):
+            await clock.wait_for(asyncio.sleep(0.15))
+        clock.reset()
+        await clock.wait_for(asyncio.sleep(0.15))
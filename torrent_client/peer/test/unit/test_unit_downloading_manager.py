@@ -1,16 +1,16 @@
-import pytest
-
-from torrent_client.peer.exceptions import NoPieceNeededError
+from torrent_client.peer.downloading.bitset import Bitset
 from torrent_client.peer.downloading.downloading_manager import DownloadingManager
 from torrent_client.peer.downloading.piece_request import PieceDownloader
 from torrent_client.peer.test.fakes.fake_peer_bridge import FakePeerBridge
 
 
-def create_text_objects(size: int, needed_pieces_indexes: [int], peer_bitfiled: [bool]) -> DownloadingManager:
-    downloader = FakePeerBridge()
+def create_text_objects(size: int, needed_pieces_indexes: [int], peer_bitfiled: [bool],
+                        downloader: FakePeerBridge = None) -> DownloadingManager:
+    downloader = downloader if downloader else FakePeerBridge()
     downloader.available_piece_to_download = needed_pieces_indexes
+    downloader.pieces_count = size
     piece_manager = DownloadingManager(size, downloader)
-    piece_manager.set_bitfiled(peer_bitfiled)
+    piece_manager.set_bitfiled(Bitset.from_bools(peer_bitfiled))
     return piece_manager
 
 
@@ -35,4 +35,14 @@ class TestUnitDownloadingManager:
 
         piece_manager = create_text_objects(3, [1], [False, True, False])
         assert piece_manager.has_available_piece()
-        assert isinstance(piece_manager.create_piece_downloader(), PieceDownloader)
\ No newline at end of file
+        assert isinstance(piece_manager.create_piece_downloader(), PieceDownloader)
+
+    def test_availability_updates(self):
+        downloader = FakePeerBridge()
+        piece_manager = create_text_objects(3, [0], [True, False, False], downloader)
+        assert downloader.peers_availability == [Bitset.from_bools([True, False, False])]
+        piece_manager.notify_new_piece(0)
+        piece_manager.notify_new_piece(2)
+        assert downloader.pieces_availability == [2]
+        piece_manager.close()
+        assert downloader.peers_availability == []
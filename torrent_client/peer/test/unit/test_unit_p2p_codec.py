@@ -1,8 +1,9 @@
 from typing import Any
 
+from torrent_client.peer.downloading.bitset import Bitset
 from torrent_client.peer.p2p_messages_handling.message_id import MessageID
 from torrent_client.peer.p2p_messages_handling.p2p_messages import HandshakeMessage, ChokeMessage, UnchokeMessage, InterestedMessage, \
-    NotInterestedMessage, PieceMessage, BitfieldMessage, HaveMessage
+    NotInterestedMessage, PieceMessage, BitfieldMessage, HaveMessage, CancelMessage
 from torrent_client.peer.p2p_messages_handling.p2p_codec import P2PCodec
 
 
@@ -40,10 +41,62 @@ class TestUnitP2PCodec:
 
     def test_bitfiled(self):
         peer_protocol = P2PCodec(10)
-        message = BitfieldMessage([True, False]*5)
+        message = BitfieldMessage(Bitset.from_bools([True, False]*5))
         check_message(message, MessageID.Bitfiled, peer_protocol)
 
+    def test_bitfiled_high_bit_is_first_piece(self):
+        peer_protocol = P2PCodec(10)
+        message = BitfieldMessage(Bitset.from_indexes(10, [0, 9]))
+        encoded_message = peer_protocol.encode(message, MessageID.Bitfiled)
+        assert encoded_message[5:] == bytes([0b10000000, 0b01000000])
+
     def test_have(self):
         peer_protocol = P2PCodec(0)
         message = HaveMessage(5)
         check_message(message, MessageID.Have, peer_protocol)
+
+    def test_cancel(self):
+        peer_protocol = P2PCodec(0)
+        message = CancelMessage(1, 2, 3)
+        check_message(message, MessageID.Cancel, peer_protocol)
+        assert peer_protocol.encode(message, MessageID.Cancel) == bytes([0, 0, 0, 13, 8, 0, 0, 0, 1, 0, 0, 0, 2, 0, 0, 0, 3])
+
+    def test_decode_from_memoryview(self):
+        peer_protocol = P2PCodec(0)
+        message = PieceMessage(1, 2, b"asd")
+        encoded_message = peer_protocol.encode(message, MessageID.Piece)
+        buffer = memoryview(b"junk" + encoded_message + b"junk")
+        decode_response = peer_protocol.decode_response_not_handshake(buffer[4:-4])
+        assert decode_response.id == MessageID.Piece
+        assert decode_response.message == message
+
+    def test_piece_in_network_order(self):
+        peer_protocol = P2PCodec(0)
+        encoded_message = peer_protocol.encode(PieceMessage(1, 2, b"asd"), MessageID.Piece)
+        assert encoded_message == bytes([0, 0, 0, 12, 7, 0, 0, 0, 1, 0, 0, 0, 2]) + b"asd"
+
+    def test_piece_payloads_keep_the_block(self):
+        peer_protocol = P2PCodec(0)
+        block = b"asd"
+        header, payload_block = peer_protocol.encode_payloads(PieceMessage(1, 2, block), MessageID.Piece)
+        assert header == bytes([0, 0, 0, 12, 7, 0, 0, 0, 1, 0, 0, 0, 2])
+        assert payload_block is block
+        assert peer_protocol.encode_payloads(HaveMessage(5), MessageID.Have) == (
+            peer_protocol.encode(HaveMessage(5), MessageID.Have),
+        )
+
+    def test_piece_block_is_view_of_payload(self):
+        peer_protocol = P2PCodec(0)
+        payload = bytearray(peer_protocol.encode(PieceMessage(1, 2, b"asd"), MessageID.Piece))
+        block = peer_protocol.decode_response_not_handshake(payload).message.block
+        assert isinstance(block, memoryview)
+        payload[-1:] = b"x"
+        assert block == b"asx"
+
+    def test_bitfield_size_per_codec(self):
+        first, second = P2PCodec(8), P2PCodec(16)
+        message = BitfieldMessage(Bitset.full(8))
+        decoded = first.decode_response_not_handshake(first.encode(message, MessageID.Bitfiled))
+        assert decoded.message == message
+        assert len(second.decode_response_not_handshake(second.encode(
+            BitfieldMessage(Bitset.full(16)), MessageID.Bitfiled)).message.bit_field) == 16
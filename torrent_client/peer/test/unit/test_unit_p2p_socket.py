@@ -4,8 +4,14 @@ from typing import Any
 import pytest
 
 from torrent_client.constants import BLOCK_SIZE
-from torrent_client.peer.exceptions import PeerTimeOutError
-from torrent_client.peer.p2p_net.p2p_socket import P2PSocket
+from torrent_client.peer.exceptions import PeerTimeOutError, PeerDisconnectedError
+from torrent_client.peer.p2p_messages_handling.message_id import MessageID
+from torrent_client.peer.p2p_messages_handling.p2p_codec import P2PCodec
+from torrent_client.peer.p2p_messages_handling.p2p_messages import HaveMessage, PieceMessage
+from torrent_client.peer.p2p_net.file_block import FileBlock
+from torrent_client.peer.p2p_net import p2p_socket
+from torrent_client.peer.p2p_net.p2p_socket import P2PSocket, WRITE_HIGH_WATERMARK, IDLE_TIMEOUT_SEC, \
+    HANDSHAKE_TIMEOUT_SEC
 from torrent_client.peer.test.fakes.fake_clock import FakeClock
 from torrent_client.peer.test.fakes.fake_p2p_codec import FakeP2PCodec
 from torrent_client.peer.test.fakes.fake_tcp_client import FakeTcpClient
@@ -43,6 +49,24 @@ class TestUnitP2PSocket:
         assert len(p2p_codec.decode_received) == length
         assert p2p_codec.decode_received == full_message
 
+    @pytest.mark.asyncio
+    async def test_short_timeout_only_for_the_handshake(self, socket_init):
+        generator, client, p2p_codec, clock = socket_init
+        client.response_size = 5
+        insert_message(client, p2p_codec, 5)
+        await generator.read_handshake()
+        assert clock.timeouts == [IDLE_TIMEOUT_SEC, HANDSHAKE_TIMEOUT_SEC, IDLE_TIMEOUT_SEC]
+
+    @pytest.mark.asyncio
+    async def test_keep_alive_sent_when_idle(self, socket_init, monkeypatch):
+        generator, client, p2p_codec, clock = socket_init
+        monkeypatch.setattr(p2p_socket, "KEEP_ALIVE_INTERVAL_SEC", 0.01)
+        await generator.send(b"have", MessageID.Have)
+        await asyncio.sleep(0.05)
+        assert client.send_list[0] == b"have"
+        assert bytes(p2p_codec.length_datatype_size) in client.send_list[1:]
+        await generator.__aexit__(None, None, None)
+
     @pytest.mark.asyncio
     async def test_read_in_multi_response(self, socket_init):
         generator, client, p2p_codec, clock = socket_init
@@ -83,9 +107,115 @@ class TestUnitP2PSocket:
             assert pack_1 == p2p_codec.decode_received
             assert p2p_codec.length_received == pack_1[:p2p_codec.length_datatype_size]
 
+    @pytest.mark.asyncio
+    async def test_read_batch_all_buffered_messages(self):
+        client, codec = FakeTcpClient(), P2PCodec(1)
+        generator = P2PSocket(None, None, None, client, codec, FakeClock())
+        keep_alive = bytes(4)
+        have = codec.encode(HaveMessage(3), MessageID.Have)
+        piece = codec.encode(PieceMessage(3, 0, b"block"), MessageID.Piece)
+        client.response_size = 1024
+        client.data = have + keep_alive + piece + have[:5]
+        responses = await generator.read_batch()
+        assert [response.id for response in responses] == [MessageID.Have, MessageID.Piece]
+        assert bytes(responses[1].message.block) == b"block"
+        client.data = have[5:]
+        responses = await generator.read_batch()
+        assert [response.message.index for response in responses] == [3]
+
     @pytest.mark.asyncio
     async def test_no_response_raise(self, socket_init):
         generator, client, p2p_codec, clock = socket_init
         clock.timeout = 3
         with pytest.raises(PeerTimeOutError):
             await generator.read()
+
+    @pytest.mark.asyncio
+    async def test_peer_closed_connection_raise(self, socket_init):
+        generator, client, p2p_codec, clock = socket_init
+        client.closed_by_peer = True
+        with pytest.raises(PeerDisconnectedError):
+            await generator.read()
+
+    @pytest.mark.asyncio
+    async def test_message_arrive_after_wait(self, socket_init):
+        generator, client, p2p_codec, clock = socket_init
+        task = asyncio.create_task(generator.read())
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        full_pack = insert_message(client, p2p_codec, 5, 4)
+        assert SOME_STRING == await asyncio.wait_for(task, 1)
+        assert full_pack == p2p_codec.decode_received
+
+    @pytest.mark.asyncio
+    async def test_send_coalesce_messages(self, socket_init):
+        generator, client, p2p_codec, clock = socket_init
+        for index in range(64):
+            await generator.send(bytes([index]), MessageID.Request)
+        assert client.send_list == []
+        await asyncio.sleep(0)
+        assert client.send_list == [bytes(range(64))]
+        await generator.send(b"have", MessageID.Have)
+        await asyncio.sleep(0)
+        assert client.send_list == [bytes(range(64)), b"have"]
+        await generator.__aexit__(None, None, None)
+
+    @pytest.mark.asyncio
+    async def test_piece_block_sent_without_copy(self):
+        client, codec = FakeTcpClient(), P2PCodec(1)
+        generator = P2PSocket(None, None, None, client, codec, FakeClock())
+        block = bytearray(b"block")
+        await generator.send(PieceMessage(3, 0, block), MessageID.Piece)
+        await asyncio.sleep(0)
+        header, sent_block = client.send_many_payloads[0]
+        assert sent_block is block
+        assert client.send_list == [codec.encode(PieceMessage(3, 0, b"block"), MessageID.Piece)]
+        await generator.__aexit__(None, None, None)
+
+    @pytest.mark.asyncio
+    async def test_send_file_block_in_order(self, socket_init):
+        generator, client, p2p_codec, clock = socket_init
+        file = object()
+        await generator.send(b"have", MessageID.Have)
+        await generator.send_file_block(0, BLOCK_SIZE, FileBlock(file, 100, BLOCK_SIZE))
+        await generator.send(b"have", MessageID.Have)
+        await asyncio.sleep(0)
+        assert client.send_list == [b"haveheader", (file, 100, BLOCK_SIZE), b"have"]
+        await generator.__aexit__(None, None, None)
+
+    @pytest.mark.asyncio
+    async def test_file_block_released_when_sent_or_dropped(self, socket_init):
+        generator, client, p2p_codec, clock = socket_init
+        released = []
+        await generator.send_file_block(0, 0, FileBlock(object(), 0, BLOCK_SIZE, lambda: released.append("sent")))
+        await asyncio.sleep(0)
+        assert released == ["sent"]
+        client.allow_send.clear()
+        await generator.send_file_block(0, 0, FileBlock(object(), 0, BLOCK_SIZE, lambda: released.append("dropped")))
+        await generator.__aexit__(None, None, None)
+        await asyncio.sleep(0)
+        assert released == ["sent", "dropped"]
+
+    @pytest.mark.asyncio
+    async def test_send_wait_when_queue_is_full(self, socket_init):
+        generator, client, p2p_codec, clock = socket_init
+        client.allow_send.clear()
+        await generator.send(b"first", MessageID.Request)
+        await asyncio.sleep(0)
+        task = asyncio.create_task(generator.send(bytes(WRITE_HIGH_WATERMARK), MessageID.Piece))
+        await asyncio.sleep(0.01)
+        assert not task.done()
+        client.allow_send.set()
+        await asyncio.wait_for(task, 1)
+        await asyncio.sleep(0)
+        assert client.send_list == [b"first", bytes(WRITE_HIGH_WATERMARK)]
+        await generator.__aexit__(None, None, None)
+
+    @pytest.mark.asyncio
+    async def test_send_error_raise_on_next_send(self, socket_init):
+        generator, client, p2p_codec, clock = socket_init
+        client.send_error = ConnectionResetError()
+        await generator.send(b"first", MessageID.Request)
+        await asyncio.sleep(0)
+        with pytest.raises(PeerDisconnectedError):
+            await generator.send(b"second", MessageID.Request)
@@ -3,21 +3,27 @@ from typing import Any, List, Optional, Tuple
 
 import pytest
 
+from torrent_client.peer.downloading.bitset import Bitset
 from torrent_client.peer.exceptions import PeerReturnInvalidResponseError
 from torrent_client.peer.p2p_messages_handling.message_id import MessageID
 from torrent_client.peer.p2p_messages_handling.p2p_messages import (
     HandshakeMessage, InterestedMessage, BitfieldMessage, Response,
-    UnchokeMessage, RequestMessage, PieceMessage, HaveMessage
+    UnchokeMessage, RequestMessage, PieceMessage, HaveMessage, CancelMessage
 )
-from torrent_client.peer.peer import Peer
+from torrent_client.peer.peer import Peer, SNUB_TIMEOUT_SEC
+from torrent_client.peer.test.fakes.fake_clock import FakeClock
 from torrent_client.peer.test.fakes.fake_p2p_socket import FakeP2PSocket
 from torrent_client.peer.test.fakes.fake_downloading_manager import FakeDownloadingManager
 from torrent_client.peer.test.fakes.fake_piece_downloader import FakePieceDownloader
+from torrent_client.peer.test.fakes.fake_uploader import FakeUploader
 
 MessageAndResponse = Tuple[Optional[Any], Optional[Response]]
 
 
-def create_peer(info_hash: bytes, peer_id: str) -> Tuple[Peer, FakeP2PSocket, FakeDownloadingManager]:
+def create_peer(info_hash: bytes, peer_id: str,
+                inbound: bool = False,
+                clock: FakeClock = None,
+                snub_timeout: float = SNUB_TIMEOUT_SEC) -> Tuple[Peer, FakeP2PSocket, FakeDownloadingManager]:
     p2p_socket = FakeP2PSocket()
     downloading_manager = FakeDownloadingManager()
     peer = Peer(
@@ -28,7 +34,11 @@ def create_peer(info_hash: bytes, peer_id: str) -> Tuple[Peer, FakeP2PSocket, Fa
         peer_id=peer_id,
         downloader=None,
         downloading_manager=downloading_manager,
-        p2p_socket=p2p_socket
+        p2p_socket=p2p_socket,
+        uploader=FakeUploader(),
+        inbound=inbound,
+        clock=clock if clock else FakeClock(),
+        snub_timeout=snub_timeout
     )
     return peer, p2p_socket, downloading_manager
 
@@ -64,7 +74,7 @@ async def start_communication_with_bitfiled_test(
         task: asyncio.Task,
         info_hash: bytes,
         peer_id: str,
-        bit_field: List[bool]
+        bit_field: Bitset
 ) -> None:
     await check_conversion(
         p2p_socket,
@@ -88,23 +98,25 @@ async def start_communication_with_bitfiled_test(
 
 
 async def get_piece_test(p2p_socket: FakeP2PSocket, downloading_manager: FakeDownloadingManager, task: asyncio.Task) -> None:
-    downloading_manager.piece_downloader = FakePieceDownloader()
+    piece_downloader = FakePieceDownloader()
+    downloading_manager.piece_downloader = piece_downloader
     num_of_blocks = 3
     piece_requests = [RequestMessage(0, i, 0) for i in range(num_of_blocks)]
-    downloading_manager.piece_downloader.requests = piece_requests
+    piece_downloader.requests = piece_requests
 
     await check_conversion(
         p2p_socket,
         task,
         [(None, Response(MessageID.Unchoke, 1, UnchokeMessage()))]
     )
-    await check_conversion(
-        p2p_socket,
-        task,
-        [
-            (request, Response(MessageID.Piece, 0, PieceMessage(0, 0, b""))) for request in piece_requests
-        ]
-    )
+    cancel = CancelMessage(0, 0, 0)
+    piece_downloader.cancels = [cancel]
+    for request in piece_requests:
+        p2p_socket.next_response = Response(MessageID.Piece, 0, PieceMessage(0, request.block_offset, b""))
+        await wait_until_read_response(p2p_socket, task)
+    sent_requests = [message for message in p2p_socket.sent_messages if isinstance(message, RequestMessage)]
+    assert sent_requests == piece_requests
+    assert cancel in p2p_socket.sent_messages
 
 
 class TestUnitPeer:
@@ -122,6 +134,7 @@ class TestUnitPeer:
                     (None, Response(MessageID.Handshake, 1, HandshakeMessage(info_hash=wrong_info_hash)))
                 ]
             )
+        assert downloading_manager.closed
 
     @pytest.mark.asyncio
     async def test_no_bitfield(self) -> None:
@@ -185,10 +198,170 @@ class TestUnitPeer:
     @pytest.mark.asyncio
     async def test_download_with_bitfiled(self) -> None:
         info_hash, peer_id = b"test info" + bytes(11), "test id"
-        bit_field = [True, False, False]
+        bit_field = Bitset.from_bools([True, False, False])
         peer, p2p_socket, downloading_manager = create_peer(info_hash, peer_id)
         peer_task = asyncio.create_task(peer.download())
         await start_communication_with_bitfiled_test(p2p_socket, downloading_manager, peer_task, info_hash, peer_id, bit_field)
         await get_piece_test(p2p_socket, downloading_manager, peer_task)
         peer_task.cancel()
         await asyncio.sleep(0.01)
+
+    @pytest.mark.asyncio
+    async def test_peer_that_delivers_nothing_is_snubbed(self) -> None:
+        info_hash, peer_id = b"test info" + bytes(11), "test id"
+        bit_field = Bitset.from_bools([True, False, False])
+        clock = FakeClock()
+        peer, p2p_socket, downloading_manager = create_peer(info_hash, peer_id, clock=clock, snub_timeout=0.02)
+        peer_task = asyncio.create_task(peer.download())
+        await start_communication_with_bitfiled_test(p2p_socket, downloading_manager, peer_task, info_hash, peer_id, bit_field)
+        piece_downloader = FakePieceDownloader()
+        piece_downloader.requests = [RequestMessage(0, 0, 0)]
+        downloading_manager.piece_downloader = piece_downloader
+        await check_conversion(
+            p2p_socket,
+            peer_task,
+            [(None, Response(MessageID.Unchoke, 1, UnchokeMessage())), (RequestMessage(0, 0, 0), None)]
+        )
+        await asyncio.sleep(0.05)
+        assert not peer.is_snubbed
+        clock.current_time = 1
+        await asyncio.sleep(0.05)
+        assert peer.is_snubbed
+        # the piece was given back, so other peers can request its blocks
+        assert piece_downloader.exited
+        p2p_socket.next_response = Response(MessageID.Piece, 0, PieceMessage(0, 0, b""))
+        await wait_until_read_response(p2p_socket, peer_task)
+        assert not peer.is_snubbed
+        peer_task.cancel()
+        await asyncio.sleep(0.01)
+
+    @pytest.mark.asyncio
+    async def test_snubbed_peer_does_not_refill_its_window(self) -> None:
+        info_hash, peer_id = b"test info" + bytes(11), "test id"
+        bit_field = Bitset.from_bools([True, True, False])
+        clock = FakeClock()
+        peer, p2p_socket, downloading_manager = create_peer(info_hash, peer_id, clock=clock, snub_timeout=0.02)
+        peer_task = asyncio.create_task(peer.download())
+        await start_communication_with_bitfiled_test(p2p_socket, downloading_manager, peer_task, info_hash, peer_id, bit_field)
+        downloading_manager.piece_downloader = FakePieceDownloader()
+        downloading_manager.piece_downloader.requests = [RequestMessage(0, 0, 4), RequestMessage(0, 4, 4)]
+        await check_conversion(p2p_socket, peer_task, [(None, Response(MessageID.Unchoke, 1, UnchokeMessage()))])
+        await asyncio.sleep(0.05)
+        clock.current_time = 1
+        await asyncio.sleep(0.05)
+        assert peer.is_snubbed
+        # the requests the peer did not serve are cancelled on the wire
+        assert CancelMessage(0, 0, 4) in p2p_socket.sent_messages
+        assert CancelMessage(0, 4, 4) in p2p_socket.sent_messages
+        piece_requests = [RequestMessage(1, 0, 4), RequestMessage(1, 4, 4), RequestMessage(1, 8, 4)]
+        downloading_manager.piece_downloader = FakePieceDownloader(1)
+        downloading_manager.piece_downloader.requests = list(piece_requests)
+        sent_before = len(p2p_socket.sent_messages)
+        p2p_socket.next_response = Response(MessageID.Have, 1, HaveMessage(1))
+        await wait_until_read_response(p2p_socket, peer_task)
+        await asyncio.sleep(0.05)
+        assert p2p_socket.sent_messages[sent_before:] == [RequestMessage(1, 0, 4)]
+        # a delivered block ends the snub, and the window opens again
+        p2p_socket.next_response = Response(MessageID.Piece, 0, PieceMessage(1, 0, b"data"))
+        await wait_until_read_response(p2p_socket, peer_task)
+        await asyncio.sleep(0.05)
+        assert not peer.is_snubbed
+        assert p2p_socket.sent_messages[sent_before:] == piece_requests
+        peer_task.cancel()
+        await asyncio.sleep(0.01)
+
+    @pytest.mark.asyncio
+    async def test_next_piece_requested_while_the_last_is_stored(self) -> None:
+        info_hash, peer_id = b"test info" + bytes(11), "test id"
+        bit_field = Bitset.from_bools([True, True, False])
+        peer, p2p_socket, downloading_manager = create_peer(info_hash, peer_id)
+        peer_task = asyncio.create_task(peer.download())
+        await start_communication_with_bitfiled_test(p2p_socket, downloading_manager, peer_task, info_hash, peer_id, bit_field)
+        first, second = FakePieceDownloader(0), FakePieceDownloader(1)
+        first.requests = [RequestMessage(0, 0, 4)]
+        first.allow_exit = asyncio.Event()
+        second.requests = [RequestMessage(1, 0, 4), RequestMessage(1, 4, 4), RequestMessage(1, 8, 4)]
+        downloading_manager.piece_downloaders = [first, second]
+        await check_conversion(p2p_socket, peer_task, [(None, Response(MessageID.Unchoke, 1, UnchokeMessage()))])
+        await asyncio.sleep(0.05)
+        # the window is not left empty until the first piece is done
+        sent_requests = [message for message in p2p_socket.sent_messages if isinstance(message, RequestMessage)]
+        assert sent_requests == [RequestMessage(0, 0, 4), RequestMessage(1, 0, 4)]
+        first.is_piece_complete_res = True
+        p2p_socket.next_response = Response(MessageID.Piece, 0, PieceMessage(0, 0, b"data"))
+        await wait_until_read_response(p2p_socket, peer_task)
+        await asyncio.sleep(0.05)
+        # the first piece is still being stored, and the requests of the second go on
+        assert not first.exited
+        sent_requests = [message for message in p2p_socket.sent_messages if isinstance(message, RequestMessage)]
+        assert sent_requests == [RequestMessage(0, 0, 4), RequestMessage(1, 0, 4), RequestMessage(1, 4, 4), RequestMessage(1, 8, 4)]
+        first.allow_exit.set()
+        await asyncio.sleep(0.01)
+        assert first.exited and not second.exited
+        peer_task.cancel()
+        await asyncio.sleep(0.01)
+
+    @pytest.mark.asyncio
+    async def test_upload_to_interested_peer(self) -> None:
+        info_hash, peer_id = bytes(20), "test id"
+        peer, p2p_socket, downloading_manager = create_peer(info_hash, peer_id)
+        downloading_manager.is_have_available_piece_res = False
+        peer_task = asyncio.create_task(peer.download())
+        request = RequestMessage(0, 0, 4)
+        await check_conversion(
+            p2p_socket,
+            peer_task,
+            [
+                (
+                    HandshakeMessage(info_hash=info_hash, peer_id=peer_id.encode()),
+                    Response(MessageID.Handshake, 1, HandshakeMessage(info_hash=info_hash))
+                ),
+                (
+                    None,
+                    Response(MessageID.Interested, 1, InterestedMessage())
+                )
+            ]
+        )
+        # the choker unchokes the peer
+        peer.set_choked(False)
+        await check_conversion(
+            p2p_socket,
+            peer_task,
+            [
+                (
+                    UnchokeMessage(),
+                    Response(MessageID.Request, 1, request)
+                ),
+                (
+                    PieceMessage(0, 0, bytes(4)),
+                    None
+                )
+            ]
+        )
+        peer_task.cancel()
+        await asyncio.sleep(0.01)
+        assert peer._uploader.closed
+
+    @pytest.mark.asyncio
+    async def test_inbound_peer_does_not_wait_for_handshake(self) -> None:
+        info_hash, peer_id = bytes(20), "test id"
+        bit_field = Bitset.from_bools([True])
+        peer, p2p_socket, downloading_manager = create_peer(info_hash, peer_id, inbound=True)
+        peer_task = asyncio.create_task(peer.download())
+        await check_conversion(
+            p2p_socket,
+            peer_task,
+            [
+                (
+                    HandshakeMessage(info_hash=info_hash, peer_id=peer_id.encode()),
+                    Response(MessageID.Bitfiled, 1, BitfieldMessage(bit_field))
+                ),
+                (
+                    InterestedMessage(),
+                    None
+                )
+            ]
+        )
+        assert downloading_manager.bit_field_response == bit_field
+        peer_task.cancel()
+        await asyncio.sleep(0.01)
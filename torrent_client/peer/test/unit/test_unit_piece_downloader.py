@@ -1,17 +1,121 @@
 from hashlib import sha1
 
+import pytest
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.downloading.bitset import Bitset
 from torrent_client.peer.downloading.piece_bitfield_info import PieceBitfieldInfo
 from torrent_client.peer.downloading.piece_request import PieceDownloader
+from torrent_client.peer.exceptions import CorruptedPieceError
+from torrent_client.peer.p2p_messages_handling.p2p_messages import RequestMessage, CancelMessage
 from torrent_client.peer.test.fakes.fake_peer_bridge import FakePeerBridge
 
+PIECE = bytes(range(256)) * (BLOCK_SIZE // 256) * 2 + b"end"
+
+
+def create_bridge(piece: bytes, piece_hash: bytes = None) -> FakePeerBridge:
+    bridge = FakePeerBridge()
+    bridge.available_piece_to_download = [0]
+    bridge.pieces_count = 1
+    bridge.piece_info = PieceBitfieldInfo(0, len(piece), piece_hash if piece_hash else sha1(piece).digest())
+    return bridge
+
 
 class TestUnitPieceDownloader:
-    def test_lock_unlock(self):
-        bridge = FakePeerBridge()
-        bridge.available_piece_to_download = [0]
-        bridge.piece_info = PieceBitfieldInfo(0, None, sha1(b"").digest())
-        bitfield = [True]
-        with PieceDownloader(bridge, bitfield) as prs:
+    @pytest.mark.asyncio
+    async def test_lock_unlock(self):
+        bridge = create_bridge(b"")
+        bitfield = Bitset.from_bools([True])
+        async with PieceDownloader(bridge, bitfield) as prs:
             pass
         assert bridge.locked_index == 0
         assert bridge.unlocked_index == 0
+
+    @pytest.mark.asyncio
+    async def test_download_piece(self):
+        bridge = create_bridge(PIECE)
+        async with PieceDownloader(bridge, Bitset.full(1)) as downloader:
+            requests = list(downloader)
+            assert requests == [
+                RequestMessage(0, 0, BLOCK_SIZE),
+                RequestMessage(0, BLOCK_SIZE, BLOCK_SIZE),
+                RequestMessage(0, 2 * BLOCK_SIZE, 3),
+            ]
+            assert list(downloader) == []
+            for request in reversed(requests):
+                downloader.add_block(0, request.block_offset, PIECE[request.block_offset:][:request.size])
+            assert downloader.is_piece_complete()
+        assert bridge.blocks == [(PIECE, 0)]
+        # the buffer goes back to the pool once the piece was stored
+        assert bridge.piece_info.progress.buffer is None
+
+    @pytest.mark.asyncio
+    async def test_buffer_released_only_when_written(self):
+        bridge = create_bridge(PIECE)
+        bridge.hold_stored = True
+        async with PieceDownloader(bridge, Bitset.full(1)) as downloader:
+            for request in downloader:
+                downloader.add_block(0, request.block_offset, PIECE[request.block_offset:][:request.size])
+            buffer = bridge.piece_info.progress.buffer
+        assert bridge.piece_info.progress.buffer is buffer
+        bridge.on_stored[0]()
+        assert bridge.piece_info.progress.buffer is None
+
+    @pytest.mark.asyncio
+    async def test_corrupted_piece(self):
+        bridge = create_bridge(PIECE, bytes(20))
+        with pytest.raises(CorruptedPieceError):
+            async with PieceDownloader(bridge, Bitset.full(1)) as downloader:
+                for request in downloader:
+                    downloader.add_block(0, request.block_offset, PIECE[request.block_offset:][:request.size])
+        assert bridge.blocks == []
+        assert bridge.unlocked_index == 0
+        assert not bridge.piece_info.progress.is_complete()
+
+    @pytest.mark.asyncio
+    async def test_endgame_cancels_duplicate_requests(self):
+        bridge = create_bridge(PIECE)
+        bridge.endgame = True
+        async with PieceDownloader(bridge, Bitset.full(1)) as first, PieceDownloader(bridge, Bitset.full(1)) as second:
+            first_requests = list(first)
+            second_requests = list(second)
+            assert first_requests == second_requests
+            second.add_block(0, 0, PIECE[:BLOCK_SIZE])
+            assert first.pop_cancels() == [CancelMessage(0, 0, BLOCK_SIZE)]
+            assert second.pop_cancels() == []
+            # a late duplicate of a block is ignored
+            first.add_block(0, 0, PIECE[:BLOCK_SIZE])
+            first.add_block(0, BLOCK_SIZE, PIECE[BLOCK_SIZE:2 * BLOCK_SIZE])
+            first.add_block(0, 2 * BLOCK_SIZE, PIECE[2 * BLOCK_SIZE:])
+            assert second.is_piece_complete()
+            assert second.pop_cancels() == [CancelMessage(0, BLOCK_SIZE, BLOCK_SIZE), CancelMessage(0, 2 * BLOCK_SIZE, 3)]
+        assert bridge.blocks == [(PIECE, 0)]
+
+    @pytest.mark.asyncio
+    async def test_blocks_are_split_between_peers(self):
+        bridge = create_bridge(PIECE)
+        async with PieceDownloader(bridge, Bitset.full(1)) as first, PieceDownloader(bridge, Bitset.full(1)) as second:
+            first_requests = iter(first)
+            assert next(first_requests) == RequestMessage(0, 0, BLOCK_SIZE)
+            assert list(second) == [RequestMessage(0, BLOCK_SIZE, BLOCK_SIZE), RequestMessage(0, 2 * BLOCK_SIZE, 3)]
+            assert list(first_requests) == []
+            first.add_block(0, 0, PIECE[:BLOCK_SIZE])
+            # the rest of the blocks are requested by the second peer, the first one can take another piece
+            assert first.is_done()
+            assert not second.is_done()
+            second.add_block(0, BLOCK_SIZE, PIECE[BLOCK_SIZE:2 * BLOCK_SIZE])
+            second.add_block(0, 2 * BLOCK_SIZE, PIECE[2 * BLOCK_SIZE:])
+            assert second.is_done()
+            assert first.pop_cancels() == []
+        assert bridge.blocks == [(PIECE, 0)]
+
+    @pytest.mark.asyncio
+    async def test_leaving_peer_frees_its_blocks(self):
+        bridge = create_bridge(PIECE)
+        async with PieceDownloader(bridge, Bitset.full(1)) as second:
+            async with PieceDownloader(bridge, Bitset.full(1)) as first:
+                assert len(list(first)) == 3
+                assert list(second) == []
+                assert second.is_done()
+            assert not second.is_done()
+            assert len(list(second)) == 3
@@ -0,0 +1,99 @@
+from hashlib import sha1
+
+import pytest
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.downloading.buffer_pool import BufferPool
+from torrent_client.peer.downloading.piece_progress import PieceProgress
+
+
+class TestUnitPieceProgress:
+    def test_blocks(self):
+        progress = PieceProgress(BLOCK_SIZE + 10)
+        assert progress.blocks_count == 2
+        assert progress.block_size(0) == BLOCK_SIZE
+        assert progress.block_size(1) == 10
+
+    def test_add_block(self):
+        progress = PieceProgress(BLOCK_SIZE + 10)
+        assert progress.add_block(BLOCK_SIZE, b"a" * 10)
+        assert not progress.add_block(BLOCK_SIZE, b"a" * 10)
+        assert progress.is_block_received(1)
+        assert not progress.is_complete()
+        assert progress.add_block(0, b"b" * BLOCK_SIZE)
+        assert progress.is_complete()
+        assert progress.buffer == b"b" * BLOCK_SIZE + b"a" * 10
+
+    def test_invalid_block(self):
+        progress = PieceProgress(BLOCK_SIZE + 10)
+        assert not progress.add_block(1, b"a")
+        assert not progress.add_block(0, b"a")
+        assert not progress.add_block(2 * BLOCK_SIZE, b"a" * 10)
+        assert not progress.is_block_received(0)
+
+    def test_listeners(self):
+        progress = PieceProgress(2 * BLOCK_SIZE)
+        first, second = [], []
+        progress.add_listener(first.append)
+        progress.add_listener(second.append)
+        progress.add_block(BLOCK_SIZE, bytes(BLOCK_SIZE), first.append)
+        progress.reset()
+        assert first == [None]
+        assert second == [BLOCK_SIZE, None]
+        assert not progress.is_block_received(1)
+
+    def test_request_blocks(self):
+        progress = PieceProgress(2 * BLOCK_SIZE)
+        assert progress.request_block(()) == 0
+        assert progress.request_block(()) == 1
+        assert not progress.has_unrequested_blocks()
+        assert progress.request_block(()) is None
+        assert progress.request_block({1}, duplicate=True) == 0
+        assert progress.requests_count(0) == 2
+
+    def test_cancel_block_request(self):
+        progress = PieceProgress(2 * BLOCK_SIZE)
+        released = []
+        progress.add_listener(released.append)
+        progress.request_block(())
+        progress.cancel_block_request(0)
+        assert released == [0]
+        assert progress.request_block(()) == 0
+
+    def test_received_block_is_not_requested(self):
+        progress = PieceProgress(2 * BLOCK_SIZE)
+        progress.add_block(0, bytes(BLOCK_SIZE))
+        assert progress.request_block(()) == 1
+        assert progress.request_block({1}, duplicate=True) is None
+
+    def test_buffer_from_pool(self):
+        pool = BufferPool()
+        progress = PieceProgress(BLOCK_SIZE, pool)
+        buffer = progress.buffer
+        progress.release_buffer()
+        assert progress.buffer is None
+        assert PieceProgress(BLOCK_SIZE, pool).buffer is buffer
+
+    @pytest.mark.asyncio
+    async def test_in_order_blocks_are_hashed_on_arrival(self):
+        piece = bytes(range(256)) * (3 * BLOCK_SIZE // 256) + b"end"
+        progress = PieceProgress(len(piece))
+        progress.add_block(BLOCK_SIZE, piece[BLOCK_SIZE:2 * BLOCK_SIZE])
+        assert progress.hashed_blocks == 0
+        progress.add_block(0, piece[:BLOCK_SIZE])
+        assert progress.hashed_blocks == 2
+        progress.add_block(3 * BLOCK_SIZE, piece[3 * BLOCK_SIZE:])
+        progress.add_block(2 * BLOCK_SIZE, piece[2 * BLOCK_SIZE:3 * BLOCK_SIZE])
+        # the rest is left to digest so completing the piece doesn't hash it on the event loop
+        assert progress.hashed_blocks == 2
+        assert await progress.digest() == sha1(piece).digest()
+        assert progress.hashed_blocks == 4
+
+    @pytest.mark.asyncio
+    async def test_reset_restarts_hash(self):
+        progress = PieceProgress(2 * BLOCK_SIZE)
+        progress.add_block(0, b"a" * BLOCK_SIZE)
+        progress.reset()
+        progress.add_block(0, b"b" * BLOCK_SIZE)
+        progress.add_block(BLOCK_SIZE, b"c" * BLOCK_SIZE)
+        assert await progress.digest() == sha1(b"b" * BLOCK_SIZE + b"c" * BLOCK_SIZE).digest()
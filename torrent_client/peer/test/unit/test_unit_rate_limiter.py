@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+import pytest
+
+from torrent_client.peer.p2p_net.rate_limiter import RateLimiter, BandwidthLimits, split_payloads, BURST_SEC
+from torrent_client.peer.test.fakes.fake_clock import FakeClock
+
+
+class TestUnitRateLimiter:
+    def test_not_limited_never_waits(self):
+        limiter = RateLimiter().child()
+        limiter.consume(10 ** 9)
+        assert not limiter.is_limited()
+        assert limiter.delay() == 0
+
+    def test_debt_is_paid_by_rate(self):
+        clock = FakeClock()
+        limiter = RateLimiter(1000, clock=clock)
+        limiter.consume(1000 * BURST_SEC + 500)
+        assert limiter.delay() == pytest.approx(0.5)
+        clock.current_time = 0.5
+        assert limiter.delay() == 0
+
+    def test_idle_tokens_are_capped_by_burst(self):
+        clock = FakeClock()
+        limiter = RateLimiter(1000, clock=clock)
+        clock.current_time = 100
+        limiter.consume(1000 * BURST_SEC + 1000)
+        assert limiter.delay() == pytest.approx(1)
+
+    def test_parent_limits_children(self):
+        clock = FakeClock()
+        parent = RateLimiter(1000, clock=clock)
+        first, second = parent.child(), parent.child(10 ** 6)
+        first.consume(1000 * BURST_SEC)
+        second.consume(1000)
+        assert first.is_limited()
+        assert first.delay() == pytest.approx(1)
+        assert second.delay() == pytest.approx(1)
+
+    def test_child_limit_does_not_limit_siblings(self):
+        clock = FakeClock()
+        parent = RateLimiter(clock=clock)
+        first, second = parent.child(1000), parent.child()
+        first.consume(2000 * BURST_SEC)
+        assert first.delay() == pytest.approx(BURST_SEC)
+        assert second.delay() == 0
+
+    def test_split_payloads(self):
+        chunks = list(split_payloads([b"ab", b"cdefg", b"h"], 3))
+        assert [b"".join(chunk) for chunk in chunks] == [b"abc", b"def", b"gh"]
+
+    @pytest.mark.asyncio
+    async def test_acquire_without_debt_does_not_wait(self):
+        limiter = RateLimiter(1000)
+        start = time.monotonic()
+        await limiter.acquire(1000 * BURST_SEC)
+        assert time.monotonic() - start < 0.01
+
+    @pytest.mark.asyncio
+    async def test_write_at_rate(self):
+        limits = BandwidthLimits().child(upload_rate=1_000_000)
+        written = []
+
+        async def writer(chunk):
+            written.append(sum(len(payload) for payload in chunk))
+
+        start = time.monotonic()
+        # the burst goes at once, the rest at the rate, the last chunk is paid for by the next write
+        await limits.upload.write([bytes(1_000_000 * BURST_SEC + 200_000)], writer)
+        await limits.upload.acquire(0)
+        assert time.monotonic() - start == pytest.approx(0.2, abs=0.05)
+        assert sum(written) == 1_000_000 * BURST_SEC + 200_000
+
+    @pytest.mark.asyncio
+    async def test_connections_take_turns(self):
+        parent = RateLimiter(100_000)
+        parent.consume(100_000 * BURST_SEC + 1_000)
+        order = []
+
+        async def send(name, limiter):
+            for _ in range(3):
+                await limiter.acquire(5_000)
+                order.append(name)
+
+        await asyncio.gather(send("a", parent.child()), send("b", parent.child()))
+        assert order == ["a", "b", "a", "b", "a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_limited_child_does_not_block_siblings(self):
+        torrent = RateLimiter().child()
+        limited, sibling = torrent.child(16_000), torrent.child()
+        limited.consume(16_000 * (BURST_SEC + 5))
+        waiting = asyncio.create_task(limited.acquire(16_000))
+        await asyncio.sleep(0)
+        start = time.monotonic()
+        await sibling.acquire(16_000)
+        assert time.monotonic() - start < 0.05
+        assert not waiting.done()
+        waiting.cancel()
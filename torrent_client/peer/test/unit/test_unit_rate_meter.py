@@ -0,0 +1,23 @@
+import pytest
+
+from torrent_client.peer.rate_meter import RateMeter
+from torrent_client.peer.test.fakes.fake_clock import FakeClock
+
+
+class TestUnitRateMeter:
+    def test_steady_rate(self):
+        clock = FakeClock()
+        meter = RateMeter(window=10, clock=clock)
+        for second in range(100):
+            clock.current_time = second
+            meter.add(1000)
+        assert meter.rate == pytest.approx(1000, rel=0.1)
+        assert meter.total == 100 * 1000
+
+    def test_rate_decays_when_idle(self):
+        clock = FakeClock()
+        meter = RateMeter(window=10, clock=clock)
+        meter.add(10000)
+        rate = meter.rate
+        clock.current_time = 10
+        assert meter.rate == pytest.approx(rate / 2.718, rel=0.01)
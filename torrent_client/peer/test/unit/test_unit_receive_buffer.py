@@ -0,0 +1,38 @@
+from torrent_client.peer.p2p_net.receive_buffer import ReceiveBuffer
+
+
+class TestUnitReceiveBuffer:
+    def test_write_and_consume(self):
+        buffer = ReceiveBuffer(8)
+        buffer.write(b"abcd")
+        assert len(buffer) == 4
+        assert buffer.peek(2) == b"ab"
+        buffer.consume(2)
+        assert buffer.peek(2) == b"cd"
+        buffer.consume(2)
+        assert len(buffer) == 0
+
+    def test_compact_when_end_is_full(self):
+        buffer = ReceiveBuffer(8)
+        buffer.write(b"abcdef")
+        buffer.consume(4)
+        buffer.write(b"ghijkl")
+        assert buffer.capacity == 8
+        assert buffer.peek(len(buffer)) == b"efghijkl"
+
+    def test_grow_keep_old_views(self):
+        buffer = ReceiveBuffer(4)
+        buffer.write(b"abc")
+        view = buffer.peek(3)
+        buffer.write(b"defgh")
+        assert buffer.capacity >= 8
+        assert buffer.peek(len(buffer)) == b"abcdefgh"
+        assert view == b"abc"
+
+    def test_write_view_and_commit(self):
+        buffer = ReceiveBuffer(4)
+        view = buffer.get_write_view(6)
+        assert len(view) >= 6
+        view[:6] = b"abcdef"
+        buffer.commit(6)
+        assert buffer.peek(6) == b"abcdef"
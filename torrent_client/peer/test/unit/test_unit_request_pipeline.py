@@ -0,0 +1,129 @@
+import asyncio
+import math
+
+import pytest
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.downloading.request_pipeline import RequestPipeline, MIN_WINDOW, MAX_WINDOW, \
+    TARGET_QUEUE_SEC
+from torrent_client.peer.p2p_messages_handling.p2p_messages import RequestMessage
+from torrent_client.peer.test.fakes.fake_clock import FakeClock
+
+
+def send_and_receive(pipeline: RequestPipeline, clock: FakeClock, offset: int, rtt: float) -> None:
+    pipeline.on_request_sent(RequestMessage(0, offset, BLOCK_SIZE))
+    clock.current_time += rtt
+    pipeline.on_block_received(0, offset, BLOCK_SIZE)
+
+
+class TestUnitRequestPipeline:
+    @pytest.mark.asyncio
+    async def test_wait_when_window_full(self):
+        pipeline = RequestPipeline(FakeClock())
+        for offset in range(MIN_WINDOW):
+            await pipeline.wait_for_free_slot()
+            pipeline.on_request_sent(RequestMessage(0, offset, BLOCK_SIZE))
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pipeline.wait_for_free_slot(), timeout=0.05)
+
+    @pytest.mark.asyncio
+    async def test_block_received_free_slot(self):
+        pipeline = RequestPipeline(FakeClock())
+        for offset in range(MIN_WINDOW):
+            pipeline.on_request_sent(RequestMessage(0, offset, BLOCK_SIZE))
+        task = asyncio.create_task(pipeline.wait_for_free_slot())
+        await asyncio.sleep(0)
+        assert not task.done()
+        pipeline.on_block_received(0, 0, BLOCK_SIZE)
+        await asyncio.wait_for(task, timeout=0.05)
+
+    def test_unrequested_block_ignored(self):
+        pipeline = RequestPipeline(FakeClock())
+        pipeline.on_block_received(0, 0, BLOCK_SIZE)
+        assert pipeline.window_size == MIN_WINDOW
+        assert pipeline.outstanding == 0
+
+    def test_slow_start_grow_window(self):
+        clock = FakeClock()
+        pipeline = RequestPipeline(clock)
+        for offset in range(10):
+            send_and_receive(pipeline, clock, offset, 0.01)
+        assert pipeline.window_size == MIN_WINDOW + 10
+
+    def test_window_holds_target_queue_of_rate(self):
+        clock = FakeClock()
+        pipeline = RequestPipeline(clock)
+        rtt = 0.1
+        for offset in range(200):
+            send_and_receive(pipeline, clock, offset, rtt)
+        assert pipeline.smoothed_rtt == pytest.approx(rtt)
+        assert pipeline.rate == pytest.approx(BLOCK_SIZE / rtt)
+        assert pipeline.window_size == math.ceil(TARGET_QUEUE_SEC / rtt)
+
+    def test_window_kept_above_long_round_trip(self):
+        clock = FakeClock()
+        pipeline = RequestPipeline(clock)
+        rtt = 4 * TARGET_QUEUE_SEC
+        for offset in range(20):
+            send_and_receive(pipeline, clock, offset, rtt)
+        assert pipeline.window_size == MIN_WINDOW
+
+    def test_queue_at_peer_does_not_grow_window(self):
+        clock = FakeClock()
+        pipeline = RequestPipeline(clock)
+        # the peer sends 64 blocks a second one after the other, 25 ms away from us each way
+        block_time, latency = 1 / 64, 0.025
+        peer_free_at, in_flight, offset = 0.0, [], 0
+        for _ in range(3000):
+            while pipeline.outstanding < pipeline.window_size:
+                peer_free_at = max(clock.current_time + latency, peer_free_at) + block_time
+                in_flight.append((peer_free_at + latency, offset))
+                pipeline.on_request_sent(RequestMessage(0, offset, BLOCK_SIZE))
+                offset += 1
+            clock.current_time, received = in_flight.pop(0)
+            pipeline.on_block_received(0, received, BLOCK_SIZE)
+        assert pipeline.window_size <= math.ceil(64 * TARGET_QUEUE_SEC) + 1
+        assert pipeline.smoothed_rtt < 2 * TARGET_QUEUE_SEC
+
+    def test_window_capped(self):
+        clock = FakeClock()
+        pipeline = RequestPipeline(clock)
+        for offset in range(MAX_WINDOW * 2):
+            pipeline.on_request_sent(RequestMessage(0, offset, BLOCK_SIZE))
+        clock.current_time += 1
+        for offset in range(MAX_WINDOW * 2):
+            pipeline.on_block_received(0, offset, BLOCK_SIZE)
+        assert pipeline.window_size == MAX_WINDOW
+
+    def test_reset_drop_outstanding(self):
+        pipeline = RequestPipeline(FakeClock())
+        pipeline.on_request_sent(RequestMessage(0, 0, BLOCK_SIZE))
+        pipeline.reset()
+        assert pipeline.outstanding == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_request_free_slot(self):
+        pipeline = RequestPipeline(FakeClock())
+        for offset in range(MIN_WINDOW):
+            pipeline.on_request_sent(RequestMessage(0, offset, BLOCK_SIZE))
+        task = asyncio.create_task(pipeline.wait_for_free_slot())
+        await asyncio.sleep(0)
+        pipeline.on_request_cancelled(0, 1)
+        await asyncio.wait_for(task, timeout=0.05)
+        assert pipeline.outstanding == MIN_WINDOW - 1
+        assert pipeline.window_size == MIN_WINDOW
+
+    @pytest.mark.asyncio
+    async def test_snubbed_peer_gets_one_request_until_it_delivers(self):
+        clock = FakeClock()
+        pipeline = RequestPipeline(clock)
+        for offset in range(10):
+            send_and_receive(pipeline, clock, offset, 0.01)
+        pipeline.snub()
+        pipeline.on_request_sent(RequestMessage(0, 0, BLOCK_SIZE))
+        assert pipeline.outstanding_requests() == [RequestMessage(0, 0, BLOCK_SIZE)]
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pipeline.wait_for_free_slot(), timeout=0.05)
+        pipeline.on_block_received(0, 0, BLOCK_SIZE)
+        await asyncio.wait_for(pipeline.wait_for_free_slot(), timeout=0.05)
+        assert pipeline.window_size == MIN_WINDOW + 1
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from torrent_client.peer.p2p_net.tcp_client import TcpClient
+
+
+async def start_receiving_server(size: int):
+    received = asyncio.get_running_loop().create_future()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        received.set_result(await reader.readexactly(size))
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1], received
+
+
+class TestUnitTcpClient:
+    @pytest.mark.asyncio
+    async def test_sendfile_without_native_sendfile_reads_by_offset(self, tmp_path, monkeypatch):
+        async def no_sendfile(*args, **kwargs):
+            raise asyncio.SendfileNotAvailableError()
+        monkeypatch.setattr(asyncio.get_running_loop(), "sendfile", no_sendfile)
+        path = tmp_path / "file"
+        path.write_bytes(b"abcdefgh")
+        server, port, received = await start_receiving_server(6)
+        client = TcpClient("127.0.0.1", port)
+        await client.init()
+        with open(path, "rb") as file:
+            await asyncio.gather(client.sendfile(file, 5, 3), client.sendfile(file, 0, 3))
+            assert file.tell() == 0
+        data = await asyncio.wait_for(received, 1)
+        assert sorted([data[:3], data[3:]]) == [b"abc", b"fgh"]
+        client.close()
+        server.close()
+        await server.wait_closed()
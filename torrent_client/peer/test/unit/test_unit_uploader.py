@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.downloading.bitset import Bitset
+from torrent_client.peer.p2p_net.file_block import FileBlock
+from torrent_client.peer.p2p_messages_handling.p2p_messages import RequestMessage, CancelMessage, PieceMessage
+from torrent_client.peer.test.fakes.fake_peer_bridge import FakePeerBridge
+from torrent_client.peer.uploading.uploader import Uploader
+
+
+def create_uploader(max_requests: int = 10, send_from_file: bool = False):
+    bridge = FakePeerBridge()
+    bridge.downloaded_pieces = Bitset.from_bools([True, False, True])
+    bridge.pieces_data = {0: bytes(range(4)) * BLOCK_SIZE, 2: bytes(4 * BLOCK_SIZE)}
+    return Uploader(bridge, max_requests, send_from_file), bridge
+
+
+class TestUnitUploader:
+    def test_announce_new_pieces(self):
+        uploader, bridge = create_uploader()
+        assert uploader.pop_new_pieces() == []
+        assert uploader.create_bitfield() == Bitset.from_bools([True, False, True])
+        assert uploader.pop_new_pieces() == []
+        bridge.downloaded_pieces.set(1)
+        assert uploader.pop_new_pieces() == [1]
+        assert uploader.pop_new_pieces() == []
+
+    def test_nothing_to_announce(self):
+        uploader, bridge = create_uploader()
+        bridge.downloaded_pieces = Bitset(3)
+        assert uploader.create_bitfield() is None
+
+    @pytest.mark.asyncio
+    async def test_serve_requests_in_order(self):
+        uploader, bridge = create_uploader()
+        uploader.add_request(RequestMessage(2, 0, BLOCK_SIZE))
+        uploader.add_request(RequestMessage(0, 1, 2))
+        uploader.add_request(RequestMessage(0, 1, 2))
+        assert uploader.requests_count == 2
+        assert await uploader.next_block() == PieceMessage(2, 0, bytes(BLOCK_SIZE))
+        assert await uploader.next_block() == PieceMessage(0, 1, bytes([1, 2]))
+
+    @pytest.mark.asyncio
+    async def test_idle_uploader_waits_for_request(self):
+        uploader, bridge = create_uploader()
+        next_block = asyncio.create_task(uploader.next_block())
+        await asyncio.sleep(0.01)
+        assert not next_block.done()
+        uploader.add_request(RequestMessage(2, 0, 4))
+        assert await next_block == PieceMessage(2, 0, bytes(4))
+
+    @pytest.mark.asyncio
+    async def test_stored_piece_wakes_idle_uploader(self):
+        uploader, bridge = create_uploader()
+        uploader.create_bitfield()
+        next_block = asyncio.create_task(uploader.next_block())
+        await asyncio.sleep(0.01)
+        bridge.downloaded_pieces.set(1)
+        for listener in bridge.stored_listeners:
+            listener()
+        assert await next_block is None
+        assert uploader.pop_new_pieces() == [1]
+        uploader.close()
+        assert bridge.stored_listeners == []
+
+    @pytest.mark.asyncio
+    async def test_drop_requests_over_limits(self):
+        uploader, bridge = create_uploader(max_requests=1)
+        uploader.add_request(RequestMessage(0, 0, BLOCK_SIZE + 1))
+        uploader.add_request(RequestMessage(0, 0, BLOCK_SIZE))
+        uploader.add_request(RequestMessage(0, BLOCK_SIZE, BLOCK_SIZE))
+        assert uploader.requests_count == 1
+
+    @pytest.mark.asyncio
+    async def test_cancel_and_clear(self):
+        uploader, bridge = create_uploader()
+        uploader.add_request(RequestMessage(0, 0, BLOCK_SIZE))
+        uploader.add_request(RequestMessage(0, BLOCK_SIZE, BLOCK_SIZE))
+        uploader.cancel_request(CancelMessage(0, 0, BLOCK_SIZE))
+        uploader.cancel_request(CancelMessage(1, 0, BLOCK_SIZE))
+        assert uploader.requests_count == 1
+        uploader.clear()
+        assert uploader.requests_count == 0
+
+    @pytest.mark.asyncio
+    async def test_invalid_request_is_skipped(self):
+        uploader, bridge = create_uploader()
+        uploader.add_request(RequestMessage(1, 0, BLOCK_SIZE))
+        assert await uploader.next_block() is None
+
+    @pytest.mark.asyncio
+    async def test_read_ahead_when_requests_are_sequential(self):
+        uploader, bridge = create_uploader()
+        uploader.add_request(RequestMessage(0, 0, BLOCK_SIZE))
+        uploader.add_request(RequestMessage(0, 2 * BLOCK_SIZE, BLOCK_SIZE))
+        uploader.add_request(RequestMessage(0, 3 * BLOCK_SIZE, BLOCK_SIZE))
+        for _ in range(3):
+            await uploader.next_block()
+        assert bridge.read_ahead_indexes == [1]
+
+    @pytest.mark.asyncio
+    async def test_send_block_from_file(self):
+        uploader, bridge = create_uploader(send_from_file=True)
+        file = object()
+        bridge.block_files = {0: file}
+        uploader.add_request(RequestMessage(0, 0, BLOCK_SIZE))
+        uploader.add_request(RequestMessage(2, 0, 4))
+        assert await uploader.next_block() == PieceMessage(0, 0, FileBlock(file, 0, BLOCK_SIZE))
+        # a block that can not be sent from its file is read
+        assert await uploader.next_block() == PieceMessage(2, 0, bytes(4))
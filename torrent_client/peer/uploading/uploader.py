@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, List, Optional, Tuple, Union
+
+from torrent_client.constants import BLOCK_SIZE
+from torrent_client.peer.downloading.bitset import Bitset
+from torrent_client.peer.downloading.peer_bridge import PeerBridge
+from torrent_client.peer.exceptions import InvalidBlockRequestError
+from torrent_client.peer.p2p_messages_handling.p2p_messages import RequestMessage, CancelMessage, PieceMessage
+from torrent_client.peer.p2p_net.file_block import FileBlock
+
+logger = logging.getLogger(__name__)
+
+# requests over this are dropped, like most clients do
+MAX_PEER_REQUESTS = 250
+MAX_REQUEST_SIZE = BLOCK_SIZE
+
+
+class AbstractUploader(ABC):
+    @abstractmethod
+    def create_bitfield(self) -> Optional[Bitset]:
+        pass
+
+    @abstractmethod
+    def pop_new_pieces(self) -> List[int]:
+        pass
+
+    @abstractmethod
+    def add_request(self, message: RequestMessage) -> None:
+        pass
+
+    @abstractmethod
+    def cancel_request(self, message: CancelMessage) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @abstractmethod
+    def notify_update(self) -> None:
+        pass
+
+    @abstractmethod
+    async def next_block(self) -> Optional[PieceMessage]:
+        pass
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
+
+class Uploader(AbstractUploader):
+    """
+    the requests a peer sent us, served in order from the storage.
+    blocks are sent from their file when possible, otherwise they are read through the piece cache,
+    and when the peer requests blocks one after the other the next piece is read ahead
+    """
+    def __init__(self, bridge: PeerBridge, max_requests: int = MAX_PEER_REQUESTS, send_from_file: bool = True):
+        self._bridge = bridge
+        self._max_requests = max_requests
+        self._send_from_file = send_from_file
+        self._requests: Deque[RequestMessage] = deque()
+        self._update = asyncio.Event()
+        self._announced: Optional[Bitset] = None
+        self._last_end: Optional[Tuple[int, int]] = None
+
+    @property
+    def requests_count(self) -> int:
+        return len(self._requests)
+
+    def create_bitfield(self) -> Optional[Bitset]:
+        """:return the pieces we have for the bitfield message, None if we have nothing"""
+        self._announced = self._bridge.get_downloaded_pieces().copy()
+        # a stored piece wakes next_block, so it is announced without polling
+        self._bridge.add_stored_listener(self.notify_update)
+        return self._announced.copy() if self._announced.any() else None
+
+    def pop_new_pieces(self) -> List[int]:
+        """:return the pieces that were downloaded since they were last announced"""
+        if self._announced is None:
+            return []
+        new_pieces = self._bridge.get_downloaded_pieces() - self._announced
+        if not new_pieces.any():
+            return []
+        self._announced = self._announced | new_pieces
+        return list(new_pieces.set_indexes())
+
+    def add_request(self, message: RequestMessage) -> None:
+        if message.size > MAX_REQUEST_SIZE or len(self._requests) >= self._max_requests:
+            logger.debug(f"request was dropped: {message}, queued requests: {len(self._requests)}")
+            return
+        if message in self._requests:
+            return
+        self._requests.append(message)
+        self._update.set()
+
+    def cancel_request(self, message: CancelMessage) -> None:
+        try:
+            self._requests.remove(RequestMessage(message.piece_index, message.block_offset, message.size))
+        except ValueError:
+            pass
+
+    def clear(self) -> None:
+        self._requests.clear()
+        self._last_end = None
+
+    def notify_update(self) -> None:
+        self._update.set()
+
+    async def next_block(self) -> Optional[PieceMessage]:
+        """
+        waits until a request is queued or notify_update is called.
+        :return the block of the oldest request, None if there was no request or it could not be served.
+        the block is a FileBlock when it should be sent from its file
+        """
+        if not self._requests:
+            self._update.clear()
+            await self._update.wait()
+            if not self._requests:
+                return None
+        request = self._requests.popleft()
+        try:
+            block = await self._get_block(request)
+        except InvalidBlockRequestError as e:
+            logger.debug(f"invalid request {request}: {e}")
+            return None
+        return PieceMessage(request.piece_index, request.block_offset, block)
+
+    def close(self) -> None:
+        self._bridge.remove_stored_listener(self.notify_update)
+
+    async def _get_block(self, request: RequestMessage) -> Union[bytes, FileBlock]:
+        if self._send_from_file:
+            block_file = await self._bridge.get_block_file(request.piece_index, request.block_offset, request.size)
+            if block_file:
+                # the page cache reads ahead of sequential file reads by itself
+                return block_file
+        self._read_ahead_if_sequential(request)
+        return await self._bridge.read_block(request.piece_index, request.block_offset, request.size)
+
+    def _read_ahead_if_sequential(self, request: RequestMessage) -> None:
+        position = (request.piece_index, request.block_offset)
+        if self._last_end is not None and (
+                position == self._last_end or position == (self._last_end[0] + 1, 0)
+        ):
+            self._bridge.read_ahead(request.piece_index + 1)
+        self._last_end = (request.piece_index, request.block_offset + request.size)
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import random
+from abc import ABC, abstractmethod
+from typing import Callable, Collection, List, Optional
+
+from torrent_client.peer.peer import AbstractPeer
+
+logger = logging.getLogger(__name__)
+
+UNCHOKE_SLOTS = 4
+RECHOKE_INTERVAL_SEC = 10
+# the optimistic unchoke moves to another peer every third rechoke, every 30 seconds
+OPTIMISTIC_UNCHOKE_ROUNDS = 3
+# between rechokes free slots are given to interested peers, so new peers don't wait a whole round
+FILL_SLOTS_INTERVAL_SEC = 1
+
+PeersGetter = Callable[[], Collection[AbstractPeer]]
+
+
+class AbstractChoker(ABC):
+    @abstractmethod
+    async def run(self, get_peers: PeersGetter) -> None:
+        pass
+
+
+class Choker(AbstractChoker):
+    """
+    tit for tat: the interested peers that give us the best download rate are unchoked,
+    when we are seeding the ones we upload to the fastest are, and one more slot is given to a random peer
+    so new peers get a chance to show how fast they are
+    """
+    def __init__(self,
+                 is_seeding: Callable[[], bool],
+                 slots: int = UNCHOKE_SLOTS,
+                 interval: float = RECHOKE_INTERVAL_SEC,
+                 random_generator: random.Random = None
+                 ):
+        self._is_seeding = is_seeding
+        self._slots = slots
+        self._interval = interval
+        self._random = random_generator if random_generator else random.Random()
+        self._round = 0
+        self._optimistic: Optional[AbstractPeer] = None
+        self._unchoked: List[AbstractPeer] = []
+
+    @property
+    def unchoked(self) -> List[AbstractPeer]:
+        return list(self._unchoked)
+
+    @property
+    def optimistic(self) -> Optional[AbstractPeer]:
+        return self._optimistic
+
+    async def run(self, get_peers: PeersGetter) -> None:
+        fills_per_round = max(int(self._interval / FILL_SLOTS_INTERVAL_SEC), 1)
+        while True:
+            self.rechoke(list(get_peers()))
+            for _ in range(fills_per_round):
+                await asyncio.sleep(self._interval / fills_per_round)
+                self.fill_free_slots(list(get_peers()))
+
+    def rechoke(self, peers: List[AbstractPeer]) -> None:
+        interested = [peer for peer in peers if peer.is_peer_interested]
+        rate = self._upload_rate if self._is_seeding() else self._download_rate
+        regular = sorted(interested, key=rate, reverse=True)[:self._slots]
+        if self._round % OPTIMISTIC_UNCHOKE_ROUNDS == 0 or self._optimistic not in interested \
+                or self._optimistic in regular:
+            self._optimistic = self._pick_optimistic(interested, regular)
+        self._round += 1
+        self._set_unchoked(peers, regular + ([self._optimistic] if self._optimistic else []))
+        logger.debug(f"rechoke: {len(self._unchoked)} of {len(interested)} interested peers are unchoked")
+
+    def fill_free_slots(self, peers: List[AbstractPeer]) -> None:
+        unchoked = [peer for peer in self._unchoked if peer in peers and peer.is_peer_interested]
+        waiting = [peer for peer in peers if peer.is_peer_interested and peer not in unchoked]
+        free_slots = self._slots + 1 - len(unchoked)
+        if free_slots <= 0 or not waiting:
+            return
+        self._set_unchoked(peers, unchoked + waiting[:free_slots])
+
+    def _pick_optimistic(self, interested: List[AbstractPeer], regular: List[AbstractPeer]) -> Optional[AbstractPeer]:
+        candidates = [peer for peer in interested if peer not in regular]
+        return self._random.choice(candidates) if candidates else None
+
+    def _set_unchoked(self, peers: List[AbstractPeer], unchoked: List[AbstractPeer]) -> None:
+        self._unchoked = unchoked
+        for peer in peers:
+            peer.set_choked(peer not in unchoked)
+
+    @staticmethod
+    def _download_rate(peer: AbstractPeer) -> float:
+        return peer.download_rate
+
+    @staticmethod
+    def _upload_rate(peer: AbstractPeer) -> float:
+        return peer.upload_rate
@@ -0,0 +1,67 @@
+from abc import ABC, abstractmethod
+from typing import Tuple
+
+from torrent_client.peer.downloading.peer_bridge import PeerBridge
+from torrent_client.peer.p2p_net.buffered_tcp_client import BufferedTcpClient
+from torrent_client.peer.p2p_net.p2p_socket import P2PSocket
+from torrent_client.peer.p2p_net.rate_limiter import BandwidthLimits
+from torrent_client.peer.p2p_net.receive_buffer import ReceiveBuffer
+from torrent_client.peer.p2p_net.tcp_client import AbstractTcpClient, TcpClient
+from torrent_client.peer.peer import AbstractPeer, Peer
+
+# limits of a single peer, 0 is not limited, the peers still share the limits of the torrent
+PEER_UPLOAD_RATE = 0
+PEER_DOWNLOAD_RATE = 0
+# peers we connect to are received straight into the receive buffer of their socket
+BUFFERED_RECEIVE = True
+
+
+class AbstractPeerFactory(ABC):
+    @abstractmethod
+    def create_peer(self, ip: str, port: int) -> AbstractPeer:
+        pass
+
+    @abstractmethod
+    def create_inbound_peer(self, ip: str, port: int, client: AbstractTcpClient) -> AbstractPeer:
+        pass
+
+
+class PeerFactory(AbstractPeerFactory):
+    def __init__(self,
+                 info_hash: bytes,
+                 pieces_count: int,
+                 peer_id: str,
+                 downloader: PeerBridge,
+                 limits: BandwidthLimits = None,
+                 buffered_receive: bool = BUFFERED_RECEIVE):
+        self._info_hash = info_hash
+        self._pieces_count = pieces_count
+        self._peer_id = peer_id
+        self._downloader = downloader
+        self._limits = limits if limits else BandwidthLimits()
+        self._buffered_receive = buffered_receive
+
+    def _peer_limits(self) -> BandwidthLimits:
+        return self._limits.child(PEER_UPLOAD_RATE, PEER_DOWNLOAD_RATE)
+
+    def _create_client(self, ip: str, port: int) -> Tuple[AbstractTcpClient, ReceiveBuffer]:
+        """:return the client of an outgoing connection and the receive buffer its socket has to use"""
+        buffer = ReceiveBuffer()
+        if self._buffered_receive:
+            return BufferedTcpClient(ip, port, buffer, self._peer_limits()), buffer
+        return TcpClient(ip, port, self._peer_limits()), buffer
+
+    def create_peer(self, ip: str, port: int) -> AbstractPeer:
+        client, buffer = self._create_client(ip, port)
+        return Peer(
+            ip, port, self._info_hash, self._pieces_count, self._peer_id, self._downloader,
+            p2p_socket=P2PSocket(ip, port, self._pieces_count, client=client, receive_buffer=buffer)
+        )
+
+    def create_inbound_peer(self, ip: str, port: int, client: AbstractTcpClient) -> AbstractPeer:
+        client.set_limits(self._peer_limits())
+        return Peer(
+            ip, port, self._info_hash, self._pieces_count, self._peer_id, self._downloader,
+            p2p_socket=P2PSocket(ip, port, self._pieces_count, client=client),
+            inbound=True
+        )
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+from torrent_client.constants import PEER_DEFAULT_PORT
+from torrent_client.peer.p2p_messages_handling.p2p_codec import AbstractP2PCodec, P2PCodec
+from torrent_client.peer.p2p_messages_handling.p2p_messages import HandshakeMessage
+from torrent_client.peer.p2p_net.tcp_client import AcceptedTcpClient
+from torrent_client.swarm.swarm_manager import AbstractSwarmManager
+
+logger = logging.getLogger(__name__)
+
+# connections of all the torrents together, the ones we opened count too
+MAX_TOTAL_CONNECTIONS = 200
+HANDSHAKE_TIMEOUT_SEC = 10
+
+
+class AbstractPeerListener(ABC):
+    @abstractmethod
+    def register(self, info_hash: bytes, swarm: AbstractSwarmManager) -> None:
+        pass
+
+    @abstractmethod
+    def unregister(self, info_hash: bytes) -> None:
+        pass
+
+    @abstractmethod
+    async def serve(self, port: int = PEER_DEFAULT_PORT) -> None:
+        pass
+
+
+class PeerListener(AbstractPeerListener):
+    """
+    accepts the peers that connect to us on one port for all the torrents.
+    the handshake of the peer tells which torrent it wants, the connection is handed to the swarm of that torrent
+    """
+    def __init__(self,
+                 codec: AbstractP2PCodec = None,
+                 max_connections: int = MAX_TOTAL_CONNECTIONS,
+                 handshake_timeout: float = HANDSHAKE_TIMEOUT_SEC
+                 ):
+        self._codec = codec if codec else P2PCodec(0)
+        self._max_connections = max_connections
+        self._handshake_timeout = handshake_timeout
+        self._swarms: Dict[bytes, AbstractSwarmManager] = {}
+        # accepted connections that did not send their handshake yet
+        self._pending = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def port(self) -> Optional[int]:
+        return self._server.sockets[0].getsockname()[1] if self._server else None
+
+    @property
+    def connections_count(self) -> int:
+        return self._pending + sum(swarm.connections_count for swarm in self._swarms.values())
+
+    def register(self, info_hash: bytes, swarm: AbstractSwarmManager) -> None:
+        self._swarms[info_hash] = swarm
+
+    def unregister(self, info_hash: bytes) -> None:
+        self._swarms.pop(info_hash, None)
+
+    async def start(self, port: int = PEER_DEFAULT_PORT, host: str = None) -> None:
+        self._server = await asyncio.start_server(self._on_connection, host, port)
+        logger.info(f"listening for peers on port {self.port}")
+
+    async def serve(self, port: int = PEER_DEFAULT_PORT) -> None:
+        try:
+            await self.start(port)
+        except OSError as e:
+            # we can still download from the peers we connect to
+            logger.warning(f"failed to listen on port {port}: {e!r}")
+            return
+        try:
+            await self._server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._server:
+            self._server.close()
+
+    async def _on_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        accepted = False
+        try:
+            if self.connections_count >= self._max_connections:
+                logger.debug("too many connections, inbound peer was rejected")
+                return
+            handshake = await self._read_handshake(reader)
+            swarm = self._swarms.get(handshake.info_hash) if handshake else None
+            if not swarm:
+                logger.debug("inbound peer wants a torrent we don't have")
+                return
+            ip, port = writer.get_extra_info("peername")[:2]
+            accepted = swarm.add_inbound_peer(ip, port, AcceptedTcpClient(reader, writer))
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            logger.debug(f"inbound peer failed to send handshake: {e!r}")
+        finally:
+            if not accepted:
+                writer.close()
+
+    async def _read_handshake(self, reader: asyncio.StreamReader) -> Optional[HandshakeMessage]:
+        self._pending += 1
+        try:
+            payload = await asyncio.wait_for(reader.readexactly(self._codec.handshake_size), self._handshake_timeout)
+        finally:
+            self._pending -= 1
+        message: HandshakeMessage = self._codec.decode_handshake(payload).message
+        if message.START_INT != HandshakeMessage.START_INT or message.START_STR != HandshakeMessage.START_STR:
+            return None
+        return message
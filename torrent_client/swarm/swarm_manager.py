@@ -0,0 +1,249 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Dict, List, Set, Tuple
+
+from torrent_client.peer.downloading.peer_bridge import PeerBridge
+from torrent_client.peer.p2p_net.rate_limiter import BandwidthLimits, GLOBAL_BANDWIDTH
+from torrent_client.peer.p2p_net.tcp_client import AbstractTcpClient
+from torrent_client.peer.peer import AbstractPeer
+from torrent_client.swarm.choker import AbstractChoker, Choker
+from torrent_client.swarm.peer_factory import AbstractPeerFactory, PeerFactory
+from torrent_client.torrent_file.torrent_file import TorrentFile
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = 50
+# connections that were opened but did not finish the handshake yet
+MAX_HALF_OPEN = 8
+# time between two connect attempts, so the sockets are not opened in one burst
+CONNECT_INTERVAL_SEC = 0.05
+# peers we failed to connect to this many times are not tried again
+MAX_CONNECT_FAILURES = 2
+# while peers wait for a connection, the least productive connected peers are dropped for them this often
+REPLACE_INTERVAL_SEC = 60
+# a new peer gets this long to unchoke us and reach its rate before it can be dropped
+MIN_PEER_AGE_SEC = 60
+MAX_REPLACED_PER_ROUND = 2
+# peers that download slower than this part of the median rate are unproductive
+UNPRODUCTIVE_RATE_FRACTION = 0.25
+
+PeerAddress = Tuple[str, int]
+
+
+class AbstractSwarmManager(ABC):
+    @abstractmethod
+    async def start(self,
+                    peer_que: asyncio.Queue,
+                    peer_id: str = None,
+                    bridge: PeerBridge = None,
+                    file: TorrentFile = None) -> None:
+        pass
+
+    @abstractmethod
+    def add_inbound_peer(self, ip: str, port: int, client: AbstractTcpClient) -> bool:
+        pass
+
+    @property
+    @abstractmethod
+    def connections_count(self) -> int:
+        pass
+
+
+class SwarmManager(AbstractSwarmManager):
+    """
+    takes the peers the trackers put in the peer queue and keeps up to max_connections download sessions with them.
+    a peer that disconnects is replaced by the next peer that waits for a connection
+    """
+    def __init__(self,
+                 factory: AbstractPeerFactory = None,
+                 max_connections: int = MAX_CONNECTIONS,
+                 max_half_open: int = MAX_HALF_OPEN,
+                 connect_interval: float = CONNECT_INTERVAL_SEC,
+                 choker: AbstractChoker = None,
+                 limits: BandwidthLimits = None,
+                 replace_interval: float = REPLACE_INTERVAL_SEC,
+                 min_peer_age: float = MIN_PEER_AGE_SEC
+                 ):
+        self._factory = factory
+        self._choker = choker
+        # the limits of this torrent, shared by its peers
+        self.limits = limits if limits else GLOBAL_BANDWIDTH.child()
+        self._max_connections = max_connections
+        self._half_open = asyncio.Semaphore(max_half_open)
+        self._connect_interval = connect_interval
+        self._replace_interval = replace_interval
+        self._min_peer_age = min_peer_age
+        self._bridge = None
+        self._candidates: Deque[PeerAddress] = deque()
+        # peers that wait for a connection or are connected
+        self._known: Set[PeerAddress] = set()
+        self._connect_failures: Dict[PeerAddress, int] = {}
+        self._sessions: Dict[PeerAddress, asyncio.Task] = {}
+        # peers that finished the handshake, the choker picks which of them we upload to
+        self._peers: Dict[PeerAddress, AbstractPeer] = {}
+        self._connected_at: Dict[PeerAddress, float] = {}
+        # peers that were dropped for being unproductive are not connected again
+        self._dropped: Set[PeerAddress] = set()
+        self._state_changed = asyncio.Event()
+
+    @property
+    def connections_count(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def candidates_count(self) -> int:
+        return len(self._candidates)
+
+    async def start(self,
+                    peer_que: asyncio.Queue,
+                    peer_id: str = None,
+                    bridge: PeerBridge = None,
+                    file: TorrentFile = None) -> None:
+        self._bridge = bridge
+        self._factory = self._factory if self._factory else PeerFactory(
+            info_hash=file.info_hash,
+            pieces_count=len(file.pieces),
+            peer_id=peer_id,
+            downloader=bridge,
+            limits=self.limits
+        )
+        self._choker = self._choker if self._choker else Choker(
+            is_seeding=lambda: not bridge.get_needed_pieces().any()
+        )
+        logger.info("**************** start swarm ****************")
+        try:
+            await asyncio.gather(
+                self._collect_peers(peer_que),
+                self._connect_peers(),
+                self._choker.run(self._peers.values),
+                self._replace_unproductive_peers()
+            )
+        finally:
+            for session in list(self._sessions.values()):
+                session.cancel()
+
+    def add_inbound_peer(self, ip: str, port: int, client: AbstractTcpClient) -> bool:
+        """:return False if the peer was not taken, the caller closes its connection then"""
+        address = (ip, port)
+        if not self._factory or self._has_session_with(ip) or len(self._sessions) >= self._max_connections:
+            return False
+        self._known.add(address)
+        peer = self._factory.create_inbound_peer(ip, port, client)
+        self._sessions[address] = asyncio.create_task(self._run_inbound_session(address, peer))
+        return True
+
+    def _has_session_with(self, ip: str) -> bool:
+        # the port of an accepted connection is the ephemeral source port of the peer,
+        # so a peer we already connected to is recognized by its ip only
+        return any(session_ip == ip for session_ip, _ in self._sessions)
+
+    def add_peers(self, peers: List[Dict[str, str]]) -> None:
+        for peer in peers:
+            address = (peer["ip"], int(peer["port"]))
+            if address in self._known or address in self._dropped or \
+                    self._connect_failures.get(address, 0) >= MAX_CONNECT_FAILURES:
+                continue
+            self._known.add(address)
+            self._candidates.append(address)
+        self._state_changed.set()
+
+    async def _collect_peers(self, peer_que: asyncio.Queue) -> None:
+        while True:
+            peers = await peer_que.get()
+            logger.debug(f"got {len(peers)} peers from tracker")
+            self.add_peers(peers)
+
+    async def _connect_peers(self) -> None:
+        while True:
+            await self._wait_for_free_connection()
+            await self._half_open.acquire()
+            address = self._candidates.popleft()
+            self._sessions[address] = asyncio.create_task(self._run_session(address))
+            await asyncio.sleep(self._connect_interval)
+
+    async def _wait_for_free_connection(self) -> None:
+        while not (self._candidates and len(self._sessions) < self._max_connections):
+            self._state_changed.clear()
+            await self._state_changed.wait()
+
+    async def _replace_unproductive_peers(self) -> None:
+        while True:
+            await asyncio.sleep(self._replace_interval)
+            for address in self._pick_unproductive_peers():
+                logger.info(f"dropping unproductive peer {address} for a peer we did not try")
+                self._dropped.add(address)
+                self._sessions[address].cancel()
+
+    def _pick_unproductive_peers(self) -> List[PeerAddress]:
+        # when seeding there is nothing to get from peers, the choker decides who we serve
+        if not self._candidates or len(self._sessions) < self._max_connections or self._is_seeding():
+            return []
+        now = asyncio.get_running_loop().time()
+        old_peers = [
+            (address, peer) for address, peer in self._peers.items()
+            if now - self._connected_at[address] >= self._min_peer_age
+        ]
+        if not old_peers:
+            return []
+        rates = sorted(peer.download_rate for _, peer in old_peers)
+        slow_rate = rates[len(rates) // 2] * UNPRODUCTIVE_RATE_FRACTION
+        old_peers.sort(key=lambda item: self._score(item[1]))
+        count = min(MAX_REPLACED_PER_ROUND, len(self._candidates))
+        return [
+            address for address, peer in old_peers[:count]
+            if peer.is_snubbed or peer.download_rate <= slow_rate
+        ]
+
+    @staticmethod
+    def _score(peer: AbstractPeer) -> Tuple[bool, float, float]:
+        """lower is worse: snubbed peers first, then by download rate, then the slower to answer a request"""
+        latency = peer.block_latency
+        return not peer.is_snubbed, peer.download_rate, -latency if latency is not None else 0
+
+    def _is_seeding(self) -> bool:
+        return bool(self._bridge) and not self._bridge.get_needed_pieces().any()
+
+    async def _run_session(self, address: PeerAddress) -> None:
+        try:
+            try:
+                peer = self._factory.create_peer(*address)
+                await peer.connect()
+            finally:
+                self._half_open.release()
+            self._connect_failures.pop(address, None)
+        except Exception as e:
+            self._connect_failures[address] = self._connect_failures.get(address, 0) + 1
+            logger.info(f"failed to connect to peer {address}: {e!r}")
+            self._end_session(address)
+            return
+        logger.info(f"connected to peer {address}, {len(self._sessions)} connections are open")
+        await self._download(address, peer)
+
+    async def _run_inbound_session(self, address: PeerAddress, peer: AbstractPeer) -> None:
+        try:
+            await peer.connect()
+        except Exception as e:
+            logger.info(f"failed to answer peer {address}: {e!r}")
+            self._end_session(address)
+            return
+        logger.info(f"peer {address} connected to us, {len(self._sessions)} connections are open")
+        await self._download(address, peer)
+
+    async def _download(self, address: PeerAddress, peer: AbstractPeer) -> None:
+        self._peers[address] = peer
+        self._connected_at[address] = asyncio.get_running_loop().time()
+        try:
+            await peer.download()
+        except Exception as e:
+            logger.info(f"peer {address} session ended: {e!r}")
+        finally:
+            self._end_session(address)
+
+    def _end_session(self, address: PeerAddress) -> None:
+        self._sessions.pop(address, None)
+        self._peers.pop(address, None)
+        self._connected_at.pop(address, None)
+        self._known.discard(address)
+        self._state_changed.set()
@@ -0,0 +1,12 @@
+import asyncio
+
+from torrent_client.swarm.choker import AbstractChoker, PeersGetter
+
+
+class FakeChoker(AbstractChoker):
+    def __init__(self):
+        self.get_peers = None
+
+    async def run(self, get_peers: PeersGetter) -> None:
+        self.get_peers = get_peers
+        await asyncio.Event().wait()
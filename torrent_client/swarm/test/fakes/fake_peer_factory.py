@@ -0,0 +1,24 @@
+from typing import Dict, List, Tuple
+
+from torrent_client.peer.p2p_net.tcp_client import AbstractTcpClient
+from torrent_client.peer.test.fakes.fake_peer import FakePeer
+from torrent_client.swarm.peer_factory import AbstractPeerFactory
+
+
+class FakePeerFactory(AbstractPeerFactory):
+    def __init__(self):
+        self.created: List[FakePeer] = []
+        # peers to return for an address, a new FakePeer is created for the others
+        self.peers: Dict[Tuple[str, int], FakePeer] = {}
+
+    def create_peer(self, ip: str, port: int) -> FakePeer:
+        peer = self.peers.pop((ip, port), None)
+        if peer is None:
+            peer = FakePeer(ip, port)
+        self.created.append(peer)
+        return peer
+
+    def create_inbound_peer(self, ip: str, port: int, client: AbstractTcpClient) -> FakePeer:
+        peer = self.create_peer(ip, port)
+        peer.client = client
+        return peer
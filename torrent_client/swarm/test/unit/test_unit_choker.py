@@ -0,0 +1,69 @@
+import random
+from typing import List
+
+from torrent_client.peer.test.fakes.fake_peer import FakePeer
+from torrent_client.swarm.choker import Choker, OPTIMISTIC_UNCHOKE_ROUNDS
+
+
+def create_peers(download_rates: List[float], interested: bool = True) -> List[FakePeer]:
+    peers = []
+    for port, rate in enumerate(download_rates):
+        peer = FakePeer("1.1.1.1", port)
+        peer.download_rate_value = rate
+        peer.upload_rate_value = -rate
+        peer.interested = interested
+        peers.append(peer)
+    return peers
+
+
+def choked_ports(peers: List[FakePeer]) -> List[int]:
+    return [peer.port for peer in peers if peer.choked]
+
+
+class TestUnitChoker:
+    def test_fastest_peers_are_unchoked(self):
+        choker = Choker(lambda: False, slots=2, random_generator=random.Random(0))
+        peers = create_peers([10, 50, 30, 20])
+        choker.rechoke(peers)
+        assert peers[1] in choker.unchoked and peers[2] in choker.unchoked
+        assert choker.optimistic in (peers[0], peers[3])
+        assert len(choked_ports(peers)) == 1
+
+    def test_seeding_uses_upload_rate(self):
+        choker = Choker(lambda: True, slots=1, random_generator=random.Random(0))
+        peers = create_peers([10, 50, 30])
+        choker.rechoke(peers)
+        assert choker.unchoked[0] is peers[0]
+
+    def test_not_interested_peers_are_choked(self):
+        choker = Choker(lambda: False, slots=2)
+        peers = create_peers([10, 50], interested=False)
+        for peer in peers:
+            peer.choked = False
+        choker.rechoke(peers)
+        assert choked_ports(peers) == [0, 1]
+        assert choker.optimistic is None
+
+    def test_optimistic_unchoke_rotates(self):
+        choker = Choker(lambda: False, slots=1, random_generator=random.Random(1))
+        peers = create_peers([100] + [0] * 10)
+        choker.rechoke(peers)
+        optimistic = choker.optimistic
+        for _ in range(OPTIMISTIC_UNCHOKE_ROUNDS - 1):
+            choker.rechoke(peers)
+            assert choker.optimistic is optimistic
+        optimistics = set()
+        for _ in range(5 * OPTIMISTIC_UNCHOKE_ROUNDS):
+            choker.rechoke(peers)
+            optimistics.add(choker.optimistic.port)
+        assert len(optimistics) > 1
+
+    def test_fill_free_slots(self):
+        choker = Choker(lambda: False, slots=1)
+        peers = create_peers([10])
+        choker.rechoke(peers)
+        new_peers = create_peers([0, 0, 0])
+        choker.fill_free_slots(peers + new_peers)
+        # one regular slot and the optimistic slot
+        assert len(choker.unchoked) == 2
+        assert len(choked_ports(new_peers)) == 2
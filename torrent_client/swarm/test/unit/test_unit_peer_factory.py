@@ -0,0 +1,20 @@
+from torrent_client.peer.p2p_net.buffered_tcp_client import BufferedTcpClient
+from torrent_client.peer.p2p_net.tcp_client import TcpClient
+from torrent_client.peer.test.fakes.fake_peer_bridge import FakePeerBridge
+from torrent_client.swarm.peer_factory import PeerFactory
+
+
+def create_factory(buffered_receive: bool) -> PeerFactory:
+    return PeerFactory(b"\x00" * 20, 10, "-TC0001-000000000000", FakePeerBridge(), buffered_receive=buffered_receive)
+
+
+class TestUnitPeerFactory:
+    def test_buffered_client_shares_the_socket_buffer(self):
+        peer = create_factory(True).create_peer("1.1.1.1", 6881)
+        client = peer._p2p_socket._client
+        assert isinstance(client, BufferedTcpClient)
+        assert client._buffer is peer._p2p_socket._buff
+
+    def test_stream_client_when_not_buffered(self):
+        peer = create_factory(False).create_peer("1.1.1.1", 6881)
+        assert type(peer._p2p_socket._client) is TcpClient
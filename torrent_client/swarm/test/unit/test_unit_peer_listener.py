@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from torrent_client.peer.p2p_messages_handling.message_id import MessageID
+from torrent_client.peer.p2p_messages_handling.p2p_codec import P2PCodec
+from torrent_client.peer.p2p_messages_handling.p2p_messages import HandshakeMessage
+from torrent_client.swarm.peer_listener import PeerListener
+from torrent_client.swarm.swarm_manager import SwarmManager
+from torrent_client.swarm.test.fakes.fake_peer_factory import FakePeerFactory
+
+INFO_HASH = bytes(range(20))
+
+
+async def settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0.01)
+
+
+async def start_listener(max_connections: int = 10):
+    factory = FakePeerFactory()
+    swarm = SwarmManager(factory)
+    listener = PeerListener(max_connections=max_connections, handshake_timeout=1)
+    listener.register(INFO_HASH, swarm)
+    await listener.start(0, "127.0.0.1")
+    return listener, swarm, factory
+
+
+async def connect_with_handshake(listener: PeerListener, info_hash: bytes):
+    reader, writer = await asyncio.open_connection("127.0.0.1", listener.port)
+    writer.write(P2PCodec(0).encode(HandshakeMessage(info_hash=info_hash, peer_id=bytes(20)), MessageID.Handshake))
+    await writer.drain()
+    await settle()
+    return reader, writer
+
+
+async def assert_closed(reader: asyncio.StreamReader) -> None:
+    # the listener closes rejected connections without reading them, so the close can be a reset
+    try:
+        assert await asyncio.wait_for(reader.read(), 1) == b""
+    except ConnectionResetError:
+        pass
+
+
+class TestUnitPeerListener:
+    @pytest.mark.asyncio
+    async def test_peer_is_handed_to_its_torrent(self):
+        listener, swarm, factory = await start_listener()
+        reader, writer = await connect_with_handshake(listener, INFO_HASH)
+        assert len(factory.created) == 1
+        assert factory.created[0].client is not None
+        assert swarm.connections_count == 1
+        factory.created[0].disconnect.set()
+        writer.close()
+        listener.close()
+        await settle()
+
+    @pytest.mark.asyncio
+    async def test_unknown_torrent_is_rejected(self):
+        listener, swarm, factory = await start_listener()
+        reader, writer = await connect_with_handshake(listener, bytes(20))
+        await assert_closed(reader)
+        assert factory.created == []
+        writer.close()
+        listener.close()
+
+    @pytest.mark.asyncio
+    async def test_connections_limit(self):
+        listener, swarm, factory = await start_listener(max_connections=1)
+        first_reader, first_writer = await connect_with_handshake(listener, INFO_HASH)
+        reader, writer = await connect_with_handshake(listener, INFO_HASH)
+        await assert_closed(reader)
+        assert len(factory.created) == 1
+        factory.created[0].disconnect.set()
+        first_writer.close()
+        writer.close()
+        listener.close()
+        await settle()
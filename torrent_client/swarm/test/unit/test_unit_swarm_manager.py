@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+
+from torrent_client.peer.exceptions import PeerNotRespondingError
+from torrent_client.peer.test.fakes.fake_peer import FakePeer
+from torrent_client.swarm.swarm_manager import SwarmManager, MAX_CONNECT_FAILURES
+from torrent_client.swarm.test.fakes.fake_choker import FakeChoker
+from torrent_client.swarm.test.fakes.fake_peer_factory import FakePeerFactory
+
+
+def peers_list(*ports: int):
+    return [{"ip": "1.1.1.1", "port": port} for port in ports]
+
+
+async def settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+async def start_swarm(max_connections: int = 10, max_half_open: int = 10, choker: FakeChoker = None,
+                      factory: FakePeerFactory = None, **kwargs):
+    factory = factory if factory else FakePeerFactory()
+    choker = choker if choker else FakeChoker()
+    manager = SwarmManager(factory, max_connections, max_half_open, connect_interval=0, choker=choker, **kwargs)
+    que = asyncio.Queue()
+    task = asyncio.create_task(manager.start(que))
+    await settle()
+    return manager, factory, que, task
+
+
+async def stop_swarm(task: asyncio.Task) -> None:
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await settle()
+
+
+class TestUnitSwarmManager:
+    @pytest.mark.asyncio
+    async def test_duplicate_peers_connect_once(self):
+        manager, factory, que, task = await start_swarm()
+        await que.put(peers_list(1, 2, 1))
+        await que.put(peers_list(2))
+        await settle()
+        assert [peer.port for peer in factory.created] == [1, 2]
+        assert manager.connections_count == 2
+        await stop_swarm(task)
+
+    @pytest.mark.asyncio
+    async def test_max_connections(self):
+        manager, factory, que, task = await start_swarm(max_connections=2)
+        await que.put(peers_list(1, 2, 3))
+        await settle()
+        assert manager.connections_count == 2
+        assert manager.candidates_count == 1
+        await stop_swarm(task)
+
+    @pytest.mark.asyncio
+    async def test_disconnected_peer_is_replaced(self):
+        manager, factory, que, task = await start_swarm(max_connections=1)
+        await que.put(peers_list(1, 2))
+        await settle()
+        factory.created[0].disconnect.set()
+        await settle()
+        assert [peer.port for peer in factory.created] == [1, 2]
+        assert manager.connections_count == 1
+        # a peer that left can come back with the next announce
+        await que.put(peers_list(1))
+        factory.created[1].disconnect.set()
+        await settle()
+        assert [peer.port for peer in factory.created] == [1, 2, 1]
+        await stop_swarm(task)
+
+    @pytest.mark.asyncio
+    async def test_half_open_limit(self):
+        manager, factory, que, task = await start_swarm(max_half_open=1)
+        slow_peer = FakePeer("1.1.1.1", 1)
+        slow_peer.allow_connect.clear()
+        factory.peers[("1.1.1.1", 1)] = slow_peer
+        await que.put(peers_list(1, 2))
+        await settle()
+        assert [peer.port for peer in factory.created] == [1]
+        slow_peer.allow_connect.set()
+        await settle()
+        assert [peer.port for peer in factory.created] == [1, 2]
+        assert manager.connections_count == 2
+        await stop_swarm(task)
+
+    @pytest.mark.asyncio
+    async def test_failing_peer_is_dropped(self):
+        manager, factory, que, task = await start_swarm()
+        for _ in range(MAX_CONNECT_FAILURES + 1):
+            peer = FakePeer("1.1.1.1", 1)
+            peer.connect_error = PeerNotRespondingError()
+            factory.peers[("1.1.1.1", 1)] = peer
+            await que.put(peers_list(1))
+            await settle()
+        assert len(factory.created) == MAX_CONNECT_FAILURES
+        assert manager.connections_count == 0
+        await stop_swarm(task)
+
+    @pytest.mark.asyncio
+    async def test_inbound_peer(self):
+        manager, factory, que, task = await start_swarm(max_connections=1)
+        assert manager.add_inbound_peer("2.2.2.2", 1, None)
+        await settle()
+        assert factory.created[0].connected.is_set()
+        assert not manager.add_inbound_peer("2.2.2.2", 2, None)
+        factory.created[0].disconnect.set()
+        await settle()
+        assert manager.connections_count == 0
+        await stop_swarm(task)
+
+    @pytest.mark.asyncio
+    async def test_inbound_peer_already_connected_to_is_rejected(self):
+        manager, factory, que, task = await start_swarm()
+        await que.put(peers_list(1))
+        await settle()
+        assert manager.connections_count == 1
+        assert not manager.add_inbound_peer("1.1.1.1", 50000, None)
+        assert manager.add_inbound_peer("2.2.2.2", 50001, None)
+        assert not manager.add_inbound_peer("2.2.2.2", 50002, None)
+        assert manager.connections_count == 2
+        await stop_swarm(task)
+
+    @pytest.mark.asyncio
+    async def test_choker_gets_connected_peers(self):
+        choker = FakeChoker()
+        manager, factory, que, task = await start_swarm(choker=choker)
+        slow_peer = FakePeer("1.1.1.1", 2)
+        slow_peer.allow_connect.clear()
+        factory.peers[("1.1.1.1", 2)] = slow_peer
+        await que.put(peers_list(1, 2))
+        await settle()
+        assert [peer.port for peer in choker.get_peers()] == [1]
+        factory.created[0].disconnect.set()
+        await settle()
+        assert list(choker.get_peers()) == []
+        slow_peer.allow_connect.set()
+        await stop_swarm(task)
+
+    @pytest.mark.asyncio
+    async def test_unproductive_peers_are_replaced(self):
+        factory = FakePeerFactory()
+        snubbing_peer, fast_peer, slow_peer = FakePeer("1.1.1.1", 1), FakePeer("1.1.1.1", 2), FakePeer("1.1.1.1", 3)
+        snubbing_peer.snubbed = True
+        snubbing_peer.download_rate_value = 1000
+        fast_peer.download_rate_value = 1000
+        slow_peer.download_rate_value = 10
+        for peer in (snubbing_peer, fast_peer, slow_peer):
+            factory.peers[(peer.ip, peer.port)] = peer
+        choker = FakeChoker()
+        manager, factory, que, task = await start_swarm(
+            max_connections=3, choker=choker, factory=factory, replace_interval=0.1, min_peer_age=0
+        )
+        await que.put(peers_list(1, 2, 3, 4, 5, 6))
+        await settle()
+        assert sorted(peer.port for peer in choker.get_peers()) == [1, 2, 3]
+        await asyncio.sleep(0.15)
+        assert sorted(peer.port for peer in choker.get_peers()) == [2, 4, 5]
+        # dropped peers are not connected again
+        await que.put(peers_list(1, 3))
+        await settle()
+        assert [peer.port for peer in factory.created].count(1) == 1
+        await stop_swarm(task)
+
+    @pytest.mark.asyncio
+    async def test_new_peers_are_not_replaced(self):
+        manager, factory, que, task = await start_swarm(max_connections=2, replace_interval=0.01, min_peer_age=10)
+        await que.put(peers_list(1, 2, 3))
+        await asyncio.sleep(0.03)
+        assert [peer.port for peer in factory.created] == [1, 2]
+        await stop_swarm(task)